@@ -1,4 +1,5 @@
 use rocket;
+use rocket::fairing::AdHoc;
 use sqlx::{postgres::PgPoolOptions, Pool, Postgres};
 
 mod guards;
@@ -6,6 +7,8 @@ mod models;
 mod routes;
 mod services;
 
+use services::access_tracker::{self, AccessTracker};
+
 #[rocket::get("/")]
 fn home() -> &'static str {
     "Hello, world!"
@@ -13,8 +16,24 @@ fn home() -> &'static str {
 
 #[rocket::launch]
 async fn entrypoint() -> rocket::Rocket<rocket::Build> {
+    let tracker = AccessTracker::new();
+    let shutdown_tracker = tracker.clone();
+
     rocket::build()
         .manage(init_db_pool().await)
+        .manage(tracker.clone())
+        .attach(AdHoc::on_liftoff("Chapter access flusher", move |rocket| Box::pin(async move {
+            if let Some(pool) = rocket.state::<Pool<Postgres>>() {
+                access_tracker::spawn_flusher(tracker, pool.clone());
+            }
+        })))
+        .attach(AdHoc::on_shutdown("Chapter access final flush", move |rocket| Box::pin(async move {
+            if let Some(pool) = rocket.state::<Pool<Postgres>>() {
+                if let Err(e) = shutdown_tracker.flush(pool).await {
+                    eprintln!("Failed to flush chapter access counts: {}", e);
+                }
+            }
+        })))
         .mount("/", rocket::routes![routes::health::health_check])
         .mount("/api/v1", rocket::routes![home, routes::verse::get_verse, routes::study::get_verse_with_study, routes::study::get_verse_range, routes::health::health_check_v1])
 }
@@ -2,6 +2,11 @@ use rocket::serde::json::serde_json;
 use serde::{Deserialize, Serialize};
 use sqlx;
 
+/// Verse columns with study notes expanded from their compact storage encoding
+/// (see scripts/study_notes_codec.py), so every reader gets the scraped shape.
+pub const VERSE_COLUMNS: &str =
+    "book_num, book_name, chapter, verse_num, verse_text, expand_study_notes(study_notes) AS study_notes";
+
 #[derive(sqlx::FromRow, Serialize, Deserialize, Debug)]
 pub struct BibleVerse {
     pub book_num: i32,
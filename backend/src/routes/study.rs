@@ -1,6 +1,7 @@
 use crate::guards::db_guard::DbGuard;
 use crate::guards::auth_guard::AuthGuard;
 use crate::services::study_services;
+use crate::services::access_tracker::AccessTracker;
 use crate::models::study_content::VerseRange;
 use rocket::serde::json::{Json, serde_json, Value};
 use rocket::{get, State};
@@ -15,9 +16,11 @@ pub async fn get_verse_with_study(
     fields: Option<String>,
     limit: Option<usize>,
     fetch: Option<bool>,
+    access: &State<AccessTracker>,
     _auth_guard: AuthGuard,
     _db_guard: DbGuard<'_>,
 ) -> Result<Json<Value>, rocket::response::status::NotFound<String>> {
+    access.record(book, chapter);
     let force_fetch = fetch.unwrap_or(false);
     match study_services::get_verse_with_study(pool, book, chapter, verse, force_fetch).await {
         Ok(Some(verse_with_study)) => {
@@ -45,9 +48,11 @@ pub async fn get_verse_range(
     book: i32,
     chapter: i32,
     verse_range: String,
+    access: &State<AccessTracker>,
     _auth_guard: AuthGuard,
     _db_guard: DbGuard<'_>,
 ) -> Result<Json<VerseRange>, rocket::response::status::NotFound<String>> {
+    access.record(book, chapter);
     // Parse verse range (e.g., "19-20")
     if !verse_range.contains('-') {
         return Err(rocket::response::status::NotFound("Invalid range format. Use format like '19-20'".to_string()));
@@ -1,15 +1,19 @@
 use rocket;
 
 use crate::{guards::db_guard::DbGuard, guards::auth_guard::AuthGuard, services};
+use crate::services::access_tracker::AccessTracker;
 
 #[rocket::get("/verse/<book>/<chapter>/<verse>")]
 pub async fn get_verse(
     book: i32,
     chapter: i32,
     verse: i32,
+    access: &rocket::State<AccessTracker>,
     _auth_guard: AuthGuard,
     db: DbGuard<'_>,
 ) -> Result<String, String> {
+    access.record(book, chapter);
+
     let verse = match services::verse_services::get_verse_from_table(
         book, chapter, verse, &db.pool,
     )
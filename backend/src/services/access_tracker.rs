@@ -0,0 +1,101 @@
+use std::collections::HashMap;
+use std::sync::{Arc, Mutex};
+use std::time::Duration;
+use sqlx::{Pool, Postgres};
+
+// How often buffered hit counts are written to chapter_access
+const FLUSH_INTERVAL: Duration = Duration::from_secs(60);
+
+// A chapter's score halves after a week without hits
+const HALF_LIFE_SECONDS: f64 = 7.0 * 24.0 * 60.0 * 60.0;
+
+// Decays the stored score to now before adding the new hits (see scripts/chapter_popularity.py)
+const FLUSH_SQL: &str = "
+    INSERT INTO chapter_access (book_num, chapter, hits, score, last_access)
+    SELECT book_num, chapter, hits, hits::float8, now()
+      FROM UNNEST($1::int4[], $2::int4[], $3::int8[]) AS t(book_num, chapter, hits)
+    ON CONFLICT (book_num, chapter) DO UPDATE
+       SET hits = chapter_access.hits + EXCLUDED.hits,
+           score = chapter_access.score
+                   * power(0.5::float8, extract(epoch FROM now() - chapter_access.last_access)::float8 / $4)
+                   + EXCLUDED.score,
+           last_access = now()";
+
+/// Per-chapter hit counters kept in memory and flushed to the database periodically,
+/// so recording a hit never costs a query on the request path.
+#[derive(Clone, Default)]
+pub struct AccessTracker {
+    hits: Arc<Mutex<HashMap<(i32, i32), i64>>>,
+}
+
+impl AccessTracker {
+    pub fn new() -> Self {
+        Self::default()
+    }
+
+    pub fn record(&self, book: i32, chapter: i32) {
+        if let Ok(mut hits) = self.hits.lock() {
+            *hits.entry((book, chapter)).or_insert(0) += 1;
+        }
+    }
+
+    fn take(&self) -> HashMap<(i32, i32), i64> {
+        match self.hits.lock() {
+            Ok(mut hits) => std::mem::take(&mut *hits),
+            Err(_) => HashMap::new(),
+        }
+    }
+
+    fn restore(&self, pending: HashMap<(i32, i32), i64>) {
+        if let Ok(mut hits) = self.hits.lock() {
+            for (chapter, count) in pending {
+                *hits.entry(chapter).or_insert(0) += count;
+            }
+        }
+    }
+
+    /// Write buffered hits to chapter_access. Counts are kept for the next flush if the write fails.
+    pub async fn flush(&self, pool: &Pool<Postgres>) -> Result<usize, sqlx::Error> {
+        let pending = self.take();
+        if pending.is_empty() {
+            return Ok(0);
+        }
+
+        let mut books = Vec::with_capacity(pending.len());
+        let mut chapters = Vec::with_capacity(pending.len());
+        let mut counts = Vec::with_capacity(pending.len());
+        for (&(book, chapter), &count) in pending.iter() {
+            books.push(book);
+            chapters.push(chapter);
+            counts.push(count);
+        }
+
+        let result = sqlx::query(FLUSH_SQL)
+            .bind(&books)
+            .bind(&chapters)
+            .bind(&counts)
+            .bind(HALF_LIFE_SECONDS)
+            .execute(pool)
+            .await;
+
+        match result {
+            Ok(_) => Ok(pending.len()),
+            Err(e) => {
+                self.restore(pending);
+                Err(e)
+            }
+        }
+    }
+}
+
+pub fn spawn_flusher(tracker: AccessTracker, pool: Pool<Postgres>) {
+    rocket::tokio::spawn(async move {
+        let mut interval = rocket::tokio::time::interval(FLUSH_INTERVAL);
+        loop {
+            interval.tick().await;
+            if let Err(e) = tracker.flush(&pool).await {
+                eprintln!("Failed to flush chapter access counts: {}", e);
+            }
+        }
+    });
+}
@@ -1,2 +1,3 @@
 pub mod verse_services;
 pub mod study_services;
+pub mod access_tracker;
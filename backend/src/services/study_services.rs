@@ -1,4 +1,4 @@
-use crate::models::bible_verse::BibleVerse;
+use crate::models::bible_verse::{BibleVerse, VERSE_COLUMNS};
 use crate::models::study_content::{StudyContent, VerseWithStudy, VerseRange};
 use rocket::serde::json::serde_json;
 use sqlx::{Pool, Postgres, Row};
@@ -26,10 +26,28 @@ pub async fn get_verse_with_study(
             .bind(chapter)
             .execute(pool)
             .await?;
+
+        // Drop the materialized documents so they can't outlive the content they were built from
+        // (ignored if the document tables haven't been created yet)
+        let _ = sqlx::query("DELETE FROM verse_documents WHERE book_num = $1 AND chapter = $2")
+            .bind(book)
+            .bind(chapter)
+            .execute(pool)
+            .await;
+        let _ = sqlx::query("DELETE FROM chapter_arrays WHERE book_num = $1 AND chapter = $2")
+            .bind(book)
+            .bind(chapter)
+            .execute(pool)
+            .await;
+    } else if let Some(verse_with_study) = get_verse_document(pool, book, chapter, verse).await {
+        // Fast path: the precomputed document already combines the verse and its study content
+        return Ok(Some(verse_with_study));
     }
 
+    let verse_query = format!("SELECT {} FROM verses WHERE book_num = $1 AND chapter = $2 AND verse_num = $3", VERSE_COLUMNS);
+
     // Get the verse
-    let verse_row = sqlx::query("SELECT * FROM verses WHERE book_num = $1 AND chapter = $2 AND verse_num = $3")
+    let verse_row = sqlx::query(&verse_query)
         .bind(book)
         .bind(chapter)
         .bind(verse)
@@ -98,7 +116,7 @@ pub async fn get_verse_with_study(
         // If we force_fetch, we need to re-query the verse to get updated study_notes
         let bible_verse = if force_fetch {
             // Re-query the verse after scraping to get updated study_notes
-            let updated_verse_row = sqlx::query("SELECT * FROM verses WHERE book_num = $1 AND chapter = $2 AND verse_num = $3")
+            let updated_verse_row = sqlx::query(&verse_query)
                 .bind(book)
                 .bind(chapter)
                 .bind(verse)
@@ -135,7 +153,7 @@ pub async fn get_verse_with_study(
         
         if scrape_verse_content(book, chapter, verse).await {
             // Retry the verse query after scraping
-            let verse_row = sqlx::query("SELECT * FROM verses WHERE book_num = $1 AND chapter = $2 AND verse_num = $3")
+            let verse_row = sqlx::query(&verse_query)
                 .bind(book)
                 .bind(chapter)
                 .bind(verse)
@@ -185,6 +203,30 @@ pub async fn get_verse_with_study(
     }
 }
 
+async fn get_verse_document(
+    pool: &Pool<Postgres>,
+    book: i32,
+    chapter: i32,
+    verse: i32,
+) -> Option<VerseWithStudy> {
+    // Any failure here (missing table, stale document shape) falls back to the regular queries
+    let row = sqlx::query("SELECT document FROM verse_documents WHERE book_num = $1 AND chapter = $2 AND verse_num = $3")
+        .bind(book)
+        .bind(chapter)
+        .bind(verse)
+        .fetch_optional(pool)
+        .await
+        .ok()??;
+
+    let document: serde_json::Value = row.try_get("document").ok()?;
+    let verse_with_study: VerseWithStudy = serde_json::from_value(document).ok()?;
+
+    // Documents built before the chapter's study content existed must not skip the on-demand scrape
+    verse_with_study.study_content.as_ref()?;
+
+    Some(verse_with_study)
+}
+
 async fn scrape_verse_content(book: i32, chapter: i32, verse: i32) -> bool {
     // Use the same scraper that handles both verses and study content
     let output = Command::new("python3")
@@ -234,6 +276,57 @@ async fn scrape_study_content(book: i32, chapter: i32) -> bool {
     }
 }
 
+async fn get_chapter_array_range(
+    pool: &Pool<Postgres>,
+    book: i32,
+    chapter: i32,
+    start_verse: i32,
+    end_verse: i32,
+) -> Option<Option<VerseRange>> {
+    // Any failure here (missing table, chapter not materialized yet) falls back to the per-verse query.
+    // verse_texts[n] is verse n; note_offsets[n] counts the note paragraphs before verse n.
+    let row = sqlx::query(
+        "SELECT book_name,
+                array_to_string(verse_texts[$3:$4], ' ') AS combined_text,
+                note_texts[note_offsets[GREATEST($3, 1)] + 1 : note_offsets[LEAST($4, cardinality(verse_texts)) + 1]] AS study_notes,
+                cardinality(array_remove(verse_texts[$3:$4], NULL)) AS verse_count
+           FROM chapter_arrays
+          WHERE book_num = $1 AND chapter = $2",
+    )
+    .bind(book)
+    .bind(chapter)
+    .bind(start_verse)
+    .bind(end_verse)
+    .fetch_optional(pool)
+    .await
+    .ok()??;
+
+    // No verse of the range exists, the same answer the per-verse query would give
+    let verse_count: Option<i32> = row.try_get("verse_count").ok()?;
+    if verse_count.unwrap_or(0) == 0 {
+        return Some(None);
+    }
+
+    let book_name: String = row.try_get("book_name").ok()?;
+    let combined_text: String = row.try_get("combined_text").ok()?;
+    let study_notes: Option<Vec<String>> = row.try_get("study_notes").ok()?;
+
+    let verse_range_str = if start_verse == end_verse {
+        start_verse.to_string()
+    } else {
+        format!("{}-{}", start_verse, end_verse)
+    };
+
+    Some(Some(VerseRange {
+        book_num: book,
+        book_name,
+        chapter,
+        verse_range: verse_range_str,
+        combined_text,
+        study_notes: study_notes.unwrap_or_default(),
+    }))
+}
+
 pub async fn get_verse_range(
     pool: &Pool<Postgres>,
     book: i32,
@@ -241,8 +334,13 @@ pub async fn get_verse_range(
     start_verse: i32,
     end_verse: i32,
 ) -> Result<Option<VerseRange>, sqlx::Error> {
+    // Fast path: one chapter_arrays row, sliced to the range in the query
+    if let Some(verse_range) = get_chapter_array_range(pool, book, chapter, start_verse, end_verse).await {
+        return Ok(verse_range);
+    }
+
     // Get all verses in the range
-    let verse_rows = sqlx::query("SELECT * FROM verses WHERE book_num = $1 AND chapter = $2 AND verse_num >= $3 AND verse_num <= $4 ORDER BY verse_num")
+    let verse_rows = sqlx::query(&format!("SELECT {} FROM verses WHERE book_num = $1 AND chapter = $2 AND verse_num >= $3 AND verse_num <= $4 ORDER BY verse_num", VERSE_COLUMNS))
         .bind(book)
         .bind(chapter)
         .bind(start_verse)
@@ -1,6 +1,6 @@
 use sqlx;
 
-use crate::models::bible_verse::BibleVerse;
+use crate::models::bible_verse::{BibleVerse, VERSE_COLUMNS};
 
 pub async fn get_verse_from_table(
     book: i32,
@@ -8,9 +8,11 @@ pub async fn get_verse_from_table(
     verse: i32,
     pool: &sqlx::PgPool,
 ) -> Result<BibleVerse, sqlx::Error> {
-    let verse: BibleVerse = sqlx::query_as(
-        "SELECT * FROM verses WHERE book_num = $1 AND chapter = $2 AND verse_num = $3",
-    )
+    let query = format!(
+        "SELECT {} FROM verses WHERE book_num = $1 AND chapter = $2 AND verse_num = $3",
+        VERSE_COLUMNS
+    );
+    let verse: BibleVerse = sqlx::query_as(&query)
     .bind(book)
     .bind(chapter)
     .bind(verse)
@@ -8,7 +8,8 @@ CREATE TABLE IF NOT EXISTS verses (
     chapter INTEGER NOT NULL,
     verse_num INTEGER NOT NULL,
     verse_text TEXT NOT NULL,
-    study_notes JSONB
+    study_notes JSONB,
+    study_notes_scraped_at TIMESTAMPTZ
 );
 
 CREATE TABLE IF NOT EXISTS study_content (
@@ -17,9 +18,102 @@ CREATE TABLE IF NOT EXISTS study_content (
     chapter INTEGER NOT NULL, 
     outline TEXT[],
     study_articles JSONB,
-    cross_references JSONB
+    cross_references JSONB,
+    scraped_at TIMESTAMPTZ DEFAULT now(),
+    source_hash TEXT,
+    scraper_version TEXT
 );
 
+-- Denormalized, ready-to-serve study documents (see scripts/materialize_documents.py)
+CREATE TABLE IF NOT EXISTS verse_documents (
+    book_num INTEGER NOT NULL,
+    chapter INTEGER NOT NULL,
+    verse_num INTEGER NOT NULL,
+    document JSONB NOT NULL,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (book_num, chapter, verse_num)
+);
+
+-- Verse and study note texts of a chapter as arrays, for one-row verse range reads
+CREATE TABLE IF NOT EXISTS chapter_arrays (
+    book_num INTEGER NOT NULL,
+    chapter INTEGER NOT NULL,
+    book_name TEXT NOT NULL,
+    verse_texts TEXT[] NOT NULL,
+    note_texts TEXT[] NOT NULL,
+    note_offsets INTEGER[] NOT NULL,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (book_num, chapter)
+);
+
+-- Chapters waiting to be scraped in the background (see scripts/prefetch_queue.py)
+CREATE TABLE IF NOT EXISTS scrape_queue (
+    book_num INTEGER NOT NULL,
+    chapter INTEGER NOT NULL,
+    language TEXT NOT NULL DEFAULT 'en',
+    edition TEXT NOT NULL DEFAULT 'nwtsty',
+    priority INTEGER NOT NULL DEFAULT 100,
+    reason TEXT,
+    refresh BOOLEAN NOT NULL DEFAULT false,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    not_before TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (book_num, chapter, language)
+);
+
+CREATE INDEX IF NOT EXISTS scrape_queue_next ON scrape_queue (priority, enqueued_at);
+
+-- Decayed per-chapter hit counts flushed by the API (see scripts/chapter_popularity.py)
+CREATE TABLE IF NOT EXISTS chapter_access (
+    book_num INTEGER NOT NULL,
+    chapter INTEGER NOT NULL,
+    hits BIGINT NOT NULL DEFAULT 0,
+    score DOUBLE PRECISION NOT NULL DEFAULT 0,
+    last_access TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (book_num, chapter)
+);
+
+-- Interned study note link targets and the reader for compactly encoded study notes
+-- (see scripts/study_notes_codec.py)
+CREATE TABLE IF NOT EXISTS study_note_links (
+    id SERIAL PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+
+CREATE OR REPLACE FUNCTION expand_study_notes(notes JSONB) RETURNS JSONB
+LANGUAGE sql STABLE PARALLEL SAFE AS $$
+    SELECT CASE WHEN jsonb_typeof(notes) = 'object' THEN (
+        SELECT COALESCE(jsonb_agg(jsonb_build_object('content', (
+                   SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                              'text', p.text,
+                              'links', (
+                                  SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                                             'text', CASE WHEN jsonb_typeof(s.span -> 0) = 'string'
+                                                          THEN s.span ->> 0
+                                                          ELSE substr(p.text, (s.span ->> 0)::int + 1,
+                                                                      (s.span ->> 1)::int) END,
+                                             'url', urls.map -> (s.span ->> -1)
+                                         ) ORDER BY s.ord), '[]'::jsonb)
+                                    FROM jsonb_array_elements(p.spans) WITH ORDINALITY AS s (span, ord)
+                              )
+                          ) ORDER BY p.ord), '[]'::jsonb)
+                     FROM jsonb_array_elements(n.note) WITH ORDINALITY AS e (paragraph, ord)
+                    CROSS JOIN LATERAL (
+                        SELECT e.ord,
+                               CASE WHEN jsonb_typeof(e.paragraph) = 'string' THEN e.paragraph #>> '{}'
+                                    ELSE e.paragraph ->> 0 END AS text,
+                               CASE WHEN jsonb_typeof(e.paragraph) = 'array' THEN e.paragraph -> 1
+                                    ELSE '[]'::jsonb END AS spans
+                    ) p
+               )) ORDER BY n.ord), '[]'::jsonb)
+          FROM jsonb_array_elements(notes -> 'n') WITH ORDINALITY AS n (note, ord),
+               (SELECT jsonb_object_agg(l.id, CASE WHEN left(l.path, 1) = '/' THEN 'https://wol.jw.org' || l.path
+                                                   ELSE l.path END) AS map
+                  FROM study_note_links l
+                 WHERE l.id = ANY (SELECT (jsonb_path_query(notes, '$.n[*][*][1][*][last]') #>> '{}')::int)) urls
+    ) ELSE notes END
+$$;
+
 -- Check if verses table is empty and needs to be populated
 DO $$
 BEGIN
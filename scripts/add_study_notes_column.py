@@ -1,16 +1,10 @@
 #!/usr/bin/env python3
-import psycopg2
+from db_connection import connect
 
 def add_study_notes_column():
     """Add study_notes column to verses table"""
     try:
-        conn = psycopg2.connect(
-            host="localhost",
-            port=5432,
-            database="wol-api",
-            user="postgres",
-            password="postgres"
-        )
+        conn = connect()
         cur = conn.cursor()
         
         # Add study_notes column as JSONB
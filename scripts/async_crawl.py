@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Async Crawl
+Backfills study content for many chapters with fetch, parse and store
+overlapped. Each of --concurrency workers fetches a chapter (through the
+shared fetch controller, in a thread), parses it off the event loop and
+stores it through async_store.py's pipelined writes, so while one chapter is
+being stored the next ones are already downloading and parsing.
+
+    python3 async_crawl.py [--docker] [--concurrency N] [--language <lang>] [--edition <edition>]
+                           [--missing] [--memprofile] [<book_num> [<chapter_num>]]
+
+Without a book it crawls the whole Bible; --missing skips chapters that are
+already stored. Upstream load is still bounded by WOL_FETCH_RATE, whatever
+the concurrency.
+"""
+import sys
+import time
+import asyncio
+import argparse
+from collections import Counter
+
+from db_connection import use_docker_host
+from async_store import AsyncStore
+from memprofile import MemoryProfiler
+from scrape_with_study_notes import EnhancedStudyExtractor
+from verse_data import BOOK_CHAPTER_COUNTS
+from wol_languages import DEFAULT_LANGUAGE, DEFAULT_EDITION
+
+DEFAULT_CONCURRENCY = 4
+
+
+def chapters_to_crawl(book_num=None, chapter_num=None):
+    """(book_num, chapter) pairs for one chapter, one book or the whole Bible"""
+    if book_num and chapter_num:
+        return [(book_num, chapter_num)]
+    books = [book_num] if book_num else sorted(BOOK_CHAPTER_COUNTS)
+    return [(book, chapter) for book in books for chapter in range(1, BOOK_CHAPTER_COUNTS[book] + 1)]
+
+
+async def crawl(chapters, language=DEFAULT_LANGUAGE, edition=DEFAULT_EDITION,
+                concurrency=DEFAULT_CONCURRENCY, missing_only=False):
+    """Crawl and store chapters. Returns a Counter of outcomes."""
+    stats = Counter()
+    queue = asyncio.Queue()
+
+    async with AsyncStore(size=concurrency) as store:
+        if missing_only:
+            stored = await store.stored_chapters(language)
+            chapters = [chapter for chapter in chapters if chapter not in stored]
+
+        for chapter in chapters:
+            queue.put_nowait(chapter)
+        total = len(chapters)
+        print(f"🕸️  Crawling {total} chapters ({language}) with {concurrency} workers...")
+
+        async def worker():
+            # One extractor (and HTTP session) per worker
+            extractor = EnhancedStudyExtractor(language, edition)
+            while True:
+                try:
+                    book_num, chapter_num = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                content = await asyncio.to_thread(extractor.fetch_chapter, book_num, chapter_num)
+                if content is None:
+                    stats["failed"] += 1
+                    continue
+
+                chapter_study_data, verse_study_notes = await asyncio.to_thread(
+                    extractor.parse_chapter_content, content, book_num, chapter_num)
+                try:
+                    outcome, verses_updated, _ = await store.store_chapter(
+                        book_num, chapter_num, language, chapter_study_data, verse_study_notes)
+                except Exception as e:
+                    print(f"❌ Error storing {book_num}:{chapter_num} - {e}")
+                    stats["failed"] += 1
+                    continue
+
+                stats[outcome or "no study content"] += 1
+                stats["verses"] += verses_updated
+                done = sum(count for key, count in stats.items() if key != "verses")
+                if done % 25 == 0 or done == total:
+                    print(f"   {done}/{total} chapters")
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl study content with fetch, parse and store overlapped")
+    parser.add_argument("--docker", action="store_true", help="connect to the 'db' host instead of localhost")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="chapters in flight")
+    parser.add_argument("--language", default=DEFAULT_LANGUAGE)
+    parser.add_argument("--edition", default=DEFAULT_EDITION)
+    parser.add_argument("--missing", action="store_true", help="skip chapters that are already stored")
+    parser.add_argument("--memprofile", action="store_true",
+                        help="report memory (tracemalloc, peak RSS) and the top allocators")
+    parser.add_argument("book_num", type=int, nargs="?")
+    parser.add_argument("chapter_num", type=int, nargs="?")
+    args = parser.parse_args()
+
+    if args.docker:
+        use_docker_host()
+
+    profiler = MemoryProfiler(args.memprofile)
+    started = time.time()
+    try:
+        with profiler.stage("crawl"):
+            stats = asyncio.run(crawl(chapters_to_crawl(args.book_num, args.chapter_num), args.language,
+                                      args.edition, max(1, args.concurrency), args.missing))
+    except Exception as e:
+        print(f"❌ Crawl failed: {e}")
+        sys.exit(1)
+    finally:
+        profiler.report()
+
+    elapsed = time.time() - started
+    chapters = sum(count for key, count in stats.items() if key != "verses")
+    print(f"✅ Crawled {chapters} chapters in {elapsed:.1f}s "
+          f"({stats['inserted']} new, {stats['updated']} updated, {stats['unchanged']} unchanged, "
+          f"{stats['no study content']} without study content, {stats['failed']} failed); "
+          f"{stats['verses']:,} verses updated")
+    sys.exit(1 if stats["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
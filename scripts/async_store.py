@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Async Store
+asyncio store path for scraped chapters, on psycopg 3. A chapter's writes go
+out in pipeline mode: the study content upsert, one UPDATE per verse with
+study notes and the English document rebuild are sent back to back, inside
+the same pipeline as BEGIN and COMMIT, without waiting on each reply. A chapter
+whose link ids are all cached costs one round trip; one with new link paths
+costs two (the lookup, then the rest), instead of one per statement. Against
+a remote database that makes the store bound by bandwidth rather than latency.
+If the document rebuild fails, the chapter is stored again without it.
+
+The upsert folds the old existence check into the statement (a CTE that
+touches, updates or inserts), and verse notes that didn't change keep their
+stored value, matching scrape_with_study_notes.py. Notes are stored in the
+compact encoding (study_notes_codec.py); link ids already interned are
+cached per store, so most chapters need no lookup.
+
+Needs psycopg 3 (pip install "psycopg[binary]"); the synchronous scripts keep
+using psycopg2. Used by async_crawl.py.
+"""
+import asyncio
+
+try:
+    import psycopg
+    from psycopg import sql
+    from psycopg.types.json import Jsonb
+except ImportError:
+    psycopg = None
+
+from change_feed import CHANNEL, change_payload
+from db_connection import POOL_MAX, connect, connection_params
+from language_partitions import ensure_language_partition
+from materialize_documents import (CHAPTER_FILTER, DELETE_EMPTY_CHAPTER_ARRAYS_SQL,
+                                   INSERT_VERSE_DOCUMENTS_SQL, STUDY_CONTENT_JSON, UPSERT_CHAPTER_ARRAYS_SQL)
+from scrape_metadata import SCRAPER_VERSION, content_hash
+from study_notes_codec import INTERN_LINKS_SQL, encode_study_notes, ensure_study_notes_codec, link_paths
+from wol_languages import DEFAULT_LANGUAGE
+
+# Touch, update or insert the chapter's study content in one statement; returns the outcome and
+# queues the change feed notification for it (delivered on commit)
+UPSERT_STUDY_CONTENT_SQL = """
+    WITH existing AS (
+        SELECT id, source_hash FROM {study}
+         WHERE book_num = %(book_num)s AND chapter = %(chapter)s
+         ORDER BY id
+         LIMIT 1
+    ), touched AS (
+        UPDATE {study} s
+           SET scraped_at = now(), scraper_version = %(version)s
+          FROM existing e
+         WHERE s.id = e.id AND e.source_hash = %(hash)s
+        RETURNING 'unchanged'::text AS outcome
+    ), changed AS (
+        UPDATE {study} s
+           SET outline = %(outline)s, study_articles = %(study_articles)s, cross_references = %(cross_references)s,
+               scraped_at = now(), source_hash = %(hash)s, scraper_version = %(version)s
+          FROM existing e
+         WHERE s.id = e.id AND e.source_hash IS DISTINCT FROM %(hash)s
+        RETURNING 'updated'::text AS outcome
+    ), inserted AS (
+        INSERT INTO {study} (book_num, chapter, outline, study_articles, cross_references,
+                             scraped_at, source_hash, scraper_version)
+        SELECT %(book_num)s, %(chapter)s, %(outline)s, %(study_articles)s, %(cross_references)s,
+               now(), %(hash)s, %(version)s
+         WHERE NOT EXISTS (SELECT 1 FROM existing)
+        RETURNING 'inserted'::text AS outcome
+    ), outcomes AS (
+        SELECT outcome FROM touched
+        UNION ALL SELECT outcome FROM changed
+        UNION ALL SELECT outcome FROM inserted
+    )
+    SELECT outcome, pg_notify(%(channel)s, CASE outcome WHEN 'unchanged' THEN %(revalidated)s ELSE %(changed)s END)
+      FROM outcomes
+"""
+
+# Assigning the column to itself keeps the stored (TOASTed) notes when they didn't change
+UPDATE_STUDY_NOTES_SQL = """
+    UPDATE {verses}
+       SET study_notes = CASE WHEN study_notes = %(notes)s THEN study_notes ELSE %(notes)s END,
+           study_notes_scraped_at = now()
+     WHERE book_num = %(book_num)s AND chapter = %(chapter)s AND verse_num = %(verse_num)s
+"""
+
+
+def _async_params():
+    """db_connection's settings in psycopg 3's spelling"""
+    params = connection_params()
+    params["dbname"] = params.pop("database")
+    return params
+
+
+class AsyncStore:
+    """A few psycopg 3 async connections; each store_chapter() call borrows one"""
+
+    def __init__(self, size=POOL_MAX):
+        if psycopg is None:
+            raise RuntimeError('psycopg 3 is not installed (pip install "psycopg[binary]")')
+        self.size = size
+        self._connections = asyncio.Queue()
+        self._opened = []
+        self._partitions = {DEFAULT_LANGUAGE: ("verses", "study_content")}
+        self._link_ids = {}
+
+    async def open(self):
+        await asyncio.to_thread(_ensure_codec)
+        params = _async_params()
+        for _ in range(self.size):
+            # Autocommit: a chapter's pipelined statements form one implicit transaction (see _store)
+            conn = await psycopg.AsyncConnection.connect(**params, autocommit=True)
+            self._opened.append(conn)
+            self._connections.put_nowait(conn)
+        return self
+
+    async def close(self):
+        for conn in self._opened:
+            await conn.close()
+        self._opened = []
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def stored_chapters(self, language=DEFAULT_LANGUAGE):
+        """Set of (book_num, chapter) that already have study content"""
+        _, study_table = await self._tables(language)
+        conn = await self._connections.get()
+        try:
+            cur = await conn.execute(sql.SQL("SELECT book_num, chapter FROM {}").format(sql.Identifier(study_table)))
+            stored = set(await cur.fetchall())
+            return stored
+        finally:
+            self._connections.put_nowait(conn)
+
+    async def _tables(self, language):
+        """A language's (verses, study_content) tables, creating the partitions once per process"""
+        if language not in self._partitions:
+            # The DDL helpers are psycopg2 code; it runs once per language, off the event loop
+            self._partitions[language] = await asyncio.to_thread(_ensure_partition, language)
+        return self._partitions[language]
+
+    async def store_chapter(self, book_num, chapter_num, language, chapter_study_data, verse_study_notes):
+        """Store one chapter's scrape. Returns (outcome, verses_updated, verse_documents);
+        outcome is "inserted", "updated", "unchanged" or None when there was no study content."""
+        verses_table, study_table = await self._tables(language)
+        conn = await self._connections.get()
+        try:
+            try:
+                return await self._store(conn, book_num, chapter_num, language, verses_table, study_table,
+                                         chapter_study_data, verse_study_notes)
+            except psycopg.Error as e:
+                if language != DEFAULT_LANGUAGE:
+                    raise
+                # The document rebuild shares the chapter's transaction; if anything failed, store the
+                # content on its own so a document problem never discards the scrape
+                print(f"Warning: could not refresh documents for {book_num}:{chapter_num} - {e}")
+                return await self._store(conn, book_num, chapter_num, language, verses_table, study_table,
+                                         chapter_study_data, verse_study_notes, documents=False)
+        finally:
+            self._connections.put_nowait(conn)
+
+    async def _store(self, conn, book_num, chapter_num, language, verses_table, study_table,
+                     chapter_study_data, verse_study_notes, documents=True):
+        source_hash = content_hash(chapter_study_data, verse_study_notes)
+        upsert = notes = verse_documents = None
+
+        # On an autocommit connection, the statements between two pipeline syncs run as one implicit
+        # transaction: it commits at the sync, or rolls back entirely if any statement fails. So the
+        # chapter needs no BEGIN/COMMIT (which psycopg would sync on), only the sync at the pipeline's end.
+        # Uncached link paths add one round trip for the lookup (a flush, not a sync), in the same transaction.
+        async with conn.pipeline():
+            link_ids = await self._intern_links(conn, verse_study_notes)
+            if chapter_study_data:
+                upsert = conn.cursor()
+                await upsert.execute(sql.SQL(UPSERT_STUDY_CONTENT_SQL).format(study=sql.Identifier(study_table)), {
+                    "book_num": book_num,
+                    "chapter": chapter_num,
+                    "outline": chapter_study_data['outline'],
+                    "study_articles": Jsonb(chapter_study_data['study_articles']),
+                    "cross_references": Jsonb(chapter_study_data['cross_references']),
+                    "hash": source_hash,
+                    "version": SCRAPER_VERSION,
+                    "channel": CHANNEL,
+                    "revalidated": change_payload("revalidated", book_num, chapter_num, language),
+                    "changed": change_payload("study", book_num, chapter_num, language),
+                })
+            elif verse_study_notes:
+                await conn.execute("SELECT pg_notify(%s, %s)",
+                                   (CHANNEL, change_payload("study", book_num, chapter_num, language)))
+
+            if verse_study_notes:
+                notes = conn.cursor()
+                await notes.executemany(sql.SQL(UPDATE_STUDY_NOTES_SQL).format(verses=sql.Identifier(verses_table)), [
+                    {
+                        "notes": Jsonb(encode_study_notes(verse_data['study_notes'], link_ids)),
+                        "book_num": verse_data['book_num'],
+                        "chapter": verse_data['chapter_num'],
+                        "verse_num": verse_data['verse_num'],
+                    }
+                    for verse_data in verse_study_notes
+                ])
+
+            # Rebuild the ready-to-serve documents (the API serves English). No savepoint here: one would
+            # force a sync of its own, so store_chapter() retries without the rebuild instead.
+            if documents and language == DEFAULT_LANGUAGE:
+                params = (book_num, chapter_num)
+                await conn.execute("DELETE FROM verse_documents WHERE book_num = %s AND chapter = %s", params)
+                verse_documents = await conn.execute(INSERT_VERSE_DOCUMENTS_SQL.format(
+                    study_content=STUDY_CONTENT_JSON, where=CHAPTER_FILTER), params)
+                await conn.execute(UPSERT_CHAPTER_ARRAYS_SQL.format(where=CHAPTER_FILTER), params)
+                await conn.execute(DELETE_EMPTY_CHAPTER_ARRAYS_SQL.format(
+                    where="WHERE a.book_num = %s AND a.chapter = %s"), params)
+
+        outcome = (await upsert.fetchone())[0] if upsert else None
+
+        # Only ids from a committed transaction are safe to reuse in later chapters
+        self._link_ids.update(link_ids)
+        verses_updated = notes.rowcount if notes else 0
+        return outcome, verses_updated, verse_documents.rowcount if verse_documents else 0
+
+    async def _intern_links(self, conn, verse_study_notes):
+        """Link ids for a chapter's notes, from the cache or one lookup for the paths not cached yet"""
+        paths = set().union(*(link_paths(verse_data['study_notes']) for verse_data in verse_study_notes))
+        link_ids = {path: self._link_ids[path] for path in paths if path in self._link_ids}
+        while paths - set(link_ids):
+            cur = await conn.execute(INTERN_LINKS_SQL, (sorted(paths - set(link_ids)),))
+            link_ids.update((path, link_id) for link_id, path in await cur.fetchall())
+        return link_ids
+
+
+def _ensure_codec():
+    conn = connect()
+    try:
+        ensure_study_notes_codec(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _ensure_partition(language):
+    conn = connect()
+    try:
+        tables = ensure_language_partition(conn.cursor(), language)
+        conn.commit()
+        return tables
+    finally:
+        conn.close()
+
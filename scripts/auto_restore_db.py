@@ -1,25 +1,23 @@
 #!/usr/bin/env python3
 """
 Auto Database Restore Script
-Automatically restores the WOL API database if tables are missing or empty.
+Automatically restores the WOL API database if tables are missing or empty,
+and reloads just the chapters whose verses are missing or incomplete.
 This script runs periodically to ensure database integrity.
 """
 import os
 import sys
 import time
 import subprocess
-import psycopg2
 from psycopg2 import sql
+from db_connection import advisory_lock, connect, use_docker_host
+from db_snapshot import RESTORE_LOCK, restore_latest_snapshot
+from verse_manifest import repair_all_languages
 
 def check_database_health():
     """Check if database tables exist and have data"""
     try:
-        conn = psycopg2.connect(
-            host="db",
-            database="wol-api",
-            user="postgres",
-            password="postgres"
-        )
+        conn = connect()
         cur = conn.cursor()
         
         # Check if verses table exists and has data
@@ -46,13 +44,54 @@ def check_database_health():
         return False, 0
 
 def restore_database():
-    """Restore database using the database manager"""
+    """Restore the database, unless another restore (e.g. the health monitor's) is already running"""
+    try:
+        with advisory_lock(RESTORE_LOCK) as acquired:
+            if not acquired:
+                print("⏳ Another restore is in progress, skipping")
+                return False
+            return restore_from_snapshot_or_setup()
+    except Exception as e:
+        print(f"❌ Error during database restore: {e}")
+        return False
+
+def repair_missing_verses():
+    """Reload only the chapters whose verses are missing or incomplete"""
+    try:
+        with advisory_lock(RESTORE_LOCK) as acquired:
+            if not acquired:
+                print("⏳ Another restore is in progress, skipping the gap check")
+                return False
+            conn = connect()
+            cur = conn.cursor()
+            repaired = repair_all_languages(cur)
+            conn.commit()
+            cur.close()
+            conn.close()
+        
+        for language, chapters, inserted in repaired:
+            print(f"🩹 Reloaded {inserted:,} missing {language} verses in {chapters} chapters")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error repairing missing verses: {e}")
+        return False
+
+def restore_from_snapshot_or_setup():
+    """Restore database from the latest snapshot, falling back to the auto setup script"""
     try:
         print("🔧 Auto-restoring database...")
         
+        # Snapshots keep scraped study content and restore in seconds
+        if restore_latest_snapshot():
+            print("✅ Database restored from snapshot!")
+            return True
+        
+        print("⚠️  Snapshot restore unavailable, reloading verses.json...")
+        
         # Run the database setup script
         result = subprocess.run([
-            "python3", "/home/appuser/scripts/db_manager.py", "--auto-setup"
+            "python3", "/home/appuser/scripts/auto_setup_db.py"
         ], capture_output=True, text=True, cwd="/home/appuser")
         
         if result.returncode == 0:
@@ -69,6 +108,7 @@ def restore_database():
 def main():
     """Main auto-restore logic"""
     print("🔍 Checking database health...")
+    use_docker_host()
     
     table_exists, verse_count = check_database_health()
     
@@ -79,7 +119,8 @@ def main():
         print("⚠️  Tables exist but empty! Auto-restoring data...")
         restore_database()
     else:
-        print(f"✅ Database healthy - {verse_count:,} verses found")
+        print(f"✅ Database has {verse_count:,} verses, checking for missing chapters...")
+        repair_missing_verses()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -10,14 +10,25 @@ import os
 # Add the current directory to path so we can import the db_manager
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from db_manager_docker import DatabaseManager
+from db_connection import use_docker_host
+from db_manager import DatabaseManager
+from memprofile import MemoryProfiler, memprofile_from_argv
+from materialize_documents import ensure_document_tables, refresh_all_documents
+from language_partitions import ensure_language_partitions
+from prefetch_queue import ensure_scrape_queue
+from chapter_popularity import ensure_chapter_access
+from scrape_metadata import ensure_scrape_metadata
+from verse_data import find_verses_file
+from parallel_load import languages_with_files, load_verses, print_result
 
-def auto_setup():
+def auto_setup(profiler=None):
     """Automatically setup database without user interaction"""
+    profiler = profiler or MemoryProfiler()
     print("🔧 Auto-setting up WOL API Database...")
     
-    # Use Docker database host
-    db_manager = DatabaseManager(host="db")
+    # Use the Docker database host unless WOL_DB_HOST says otherwise
+    use_docker_host()
+    db_manager = DatabaseManager()
     
     # Test connection
     print("🔌 Connecting to database...")
@@ -57,51 +68,44 @@ def auto_setup():
             );
         """)
         
+        ensure_document_tables(cur)
+        ensure_language_partitions(cur)
+        ensure_scrape_metadata(cur)
+        ensure_scrape_queue(cur)
+        ensure_chapter_access(cur)
+        
         db_manager.conn.commit()
         print("✅ Tables created successfully.")
         
-        # Check if we need to load data
+        # Load every chapter that is missing or incomplete: everything on first run,
+        # just the gaps after a partial loss or a half-finished load
         cur.execute("SELECT COUNT(*) FROM verses")
         verse_count = cur.fetchone()[0]
+        print(f"📖 Database has {verse_count:,} verses, checking for missing chapters...")
+        if verse_count == 0 and not find_verses_file():
+            print("❌ verses.json not found")
+            return False
         
-        if verse_count == 0:
-            print("📖 Loading verses from verses.json...")
-            
-            # Load the verses data
-            verses_path = '/home/appuser/data/verses.json'
-            if not os.path.exists(verses_path):
-                print(f"❌ Verses file not found at {verses_path}")
-                return False
-                
-            import json
-            with open(verses_path, 'r') as f:
-                verses_data = json.load(f)
-            
-            print(f"💾 Inserting {len(verses_data)} verses...")
-            
-            # Insert verses one by one to match the original format
-            insert_query = """
-                INSERT INTO verses (book_num, book_name, chapter, verse_num, verse_text, study_notes)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            
-            for i, verse in enumerate(verses_data):
-                cur.execute(insert_query, (
-                    verse['book_num'],
-                    verse['book_name'], 
-                    verse['chapter'],
-                    verse['verse_num'],
-                    verse['verse_text'],
-                    None  # study_notes initially null
-                ))
-                
-                if (i + 1) % 1000 == 0:
-                    print(f"📖 Inserted {i + 1} verses...")
-                
-            db_manager.conn.commit()
-            print(f"✅ Database setup complete! Loaded {len(verses_data):,} verses.")
+        # Book partitions load concurrently on pooled connections; this session must not hold a snapshot
+        # open meanwhile, or the concurrent index builds at the end would wait for it
+        db_manager.conn.commit()
+        with profiler.stage("load verses"):
+            result = load_verses(languages_with_files())
+        if result["partitions"] or result["failed"]:
+            print_result(result)
         else:
-            print(f"✅ Database already contains {verse_count:,} verses.")
+            print("✅ Every chapter is complete.")
+        if result["failed"]:
+            return False
+        
+        # Build the ready-to-serve study documents on first run or after a reload
+        cur.execute("SELECT EXISTS (SELECT 1 FROM verse_documents)")
+        if not cur.fetchone()[0]:
+            print("📄 Building study documents...")
+            with profiler.stage("build documents"):
+                verse_documents, chapter_arrays = refresh_all_documents(cur)
+            db_manager.conn.commit()
+            print(f"✅ Built {verse_documents:,} verse documents and {chapter_arrays:,} chapter arrays.")
             
         cur.close()
         return True
@@ -113,7 +117,9 @@ def auto_setup():
         return False
     finally:
         db_manager.disconnect()
+        profiler.report()
 
 if __name__ == "__main__":
-    success = auto_setup()
+    # --memprofile reports memory per stage (loading verses, building documents)
+    success = auto_setup(memprofile_from_argv()[0])
     sys.exit(0 if success else 1)
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Change Feed
+Postgres LISTEN/NOTIFY feed of chapter changes. Every store path calls
+notify_change() / notify_changes() inside its transaction, and Postgres
+delivers the notifications when (and only if) the transaction commits, so a
+listener never hears of content it can't read yet.
+
+Payloads on the wol_chapter_changes channel are compact text:
+
+    <kind>:<language>:<book>:<chapter>      study:en:40:24
+    <kind>:<language>:*:*                   verses:es:*:*   (every chapter of a language)
+    reset:*:*:*                             the whole database was replaced
+
+Kinds:
+
+- verses       verse text was loaded or changed (gap repairs, parallel loads,
+               scrape_verses.py --store, verse_cleaner.py reclean)
+- study        study content or verse study notes were stored or changed
+- revalidated  a re-scrape found the stored content unchanged (timestamps only)
+- reset        a snapshot restore (or dropping the tables) replaced everything
+
+ChangeListener batches the notifications for WOL_CHANGE_WINDOW seconds
+(default 1.0), collapses duplicates and fans each batch out to its handlers.
+Handlers are callables taking a list of ChapterChange; those with a `kinds`
+attribute only see those kinds. NOTIFY isn't durable, so after a lost
+connection the listener hands its handlers a reset. Shipped handlers rebuild
+the static export (export_static.py) and POST each batch to a webhook, e.g. a
+CDN or cache purge endpoint.
+
+    listen [--docker] [--window 1.0] [--export <dir>] [--webhook <url>]
+    notify [--docker] <kind> <book> <chapter> [<language>]
+"""
+import os
+import sys
+import time
+import select
+import argparse
+from collections import namedtuple
+from datetime import datetime
+
+import psycopg2
+import requests
+
+from db_connection import connect, use_docker_host
+from wol_languages import DEFAULT_LANGUAGE
+
+CHANNEL = "wol_chapter_changes"
+KINDS = ("verses", "study", "revalidated", "reset")
+CONTENT_KINDS = ("verses", "study", "reset")
+
+BATCH_WINDOW = float(os.environ.get("WOL_CHANGE_WINDOW", "1.0"))
+MAX_BATCH = 1000
+RECONNECT_DELAY = 5
+
+# A load touching more chapters than this announces the whole language instead of every chapter
+BULK_NOTIFY_LIMIT = 500
+
+WEBHOOK_URL = os.environ.get("WOL_CHANGE_WEBHOOK")
+EXPORT_DIR = os.environ.get("WOL_STATIC_EXPORT_DIR")
+
+NOTIFY_SQL = "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload"
+
+ChapterChange = namedtuple("ChapterChange", ["kind", "language", "book_num", "chapter"])
+
+
+def log(message):
+    """Log with timestamp"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+
+def change_payload(kind, book_num=None, chapter_num=None, language=DEFAULT_LANGUAGE):
+    """The NOTIFY payload of one change; book_num None means every chapter of the language"""
+    if book_num is None:
+        return f"{kind}:{language}:*:*"
+    return f"{kind}:{language}:{book_num}:{chapter_num}"
+
+
+def parse_payload(payload):
+    """The ChapterChange of a payload, or None if it isn't one"""
+    parts = payload.split(":")
+    if len(parts) != 4 or parts[0] not in KINDS:
+        return None
+    kind, language, book, chapter = parts
+    if book == "*":
+        return ChapterChange(kind, None if language == "*" else language, None, None)
+    try:
+        return ChapterChange(kind, language, int(book), int(chapter))
+    except ValueError:
+        return None
+
+
+def notify_changes(cur, kind, chapters, language=DEFAULT_LANGUAGE):
+    """Announce changes to (book_num, chapter) pairs when the caller's transaction commits.
+
+    chapters=None, or more than BULK_NOTIFY_LIMIT of them, announces the whole language.
+    """
+    chapters = None if chapters is None else sorted(set(chapters))
+    if chapters is not None and not chapters:
+        return
+    if chapters is None or len(chapters) > BULK_NOTIFY_LIMIT:
+        payloads = [change_payload(kind, language=language)]
+    else:
+        payloads = [change_payload(kind, book_num, chapter_num, language) for book_num, chapter_num in chapters]
+    cur.execute(NOTIFY_SQL, (CHANNEL, payloads))
+
+
+def notify_change(cur, kind, book_num, chapter_num, language=DEFAULT_LANGUAGE):
+    """Announce a change to one chapter when the caller's transaction commits"""
+    notify_changes(cur, kind, [(book_num, chapter_num)], language)
+
+
+def notify_reset(cur):
+    """Announce that everything may have changed when the caller's transaction commits"""
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, change_payload("reset", language="*")))
+
+
+def announce_reset(host=None):
+    """notify_reset() on a connection of its own, e.g. after a snapshot restore. Never raises."""
+    try:
+        conn = connect(host=host)
+        try:
+            notify_reset(conn.cursor())
+            conn.commit()
+        finally:
+            conn.close()
+    except psycopg2.Error as e:
+        print(f"⚠️  Could not announce the reset to change feed listeners: {e}")
+
+
+def coalesce(changes):
+    """Drop duplicates and chapter changes covered by a language-wide change or a reset"""
+    changes = set(changes)
+    if any(change.kind == "reset" for change in changes):
+        return [ChapterChange("reset", None, None, None)]
+    wide = {(change.kind, change.language) for change in changes if change.book_num is None}
+    return sorted((change for change in changes
+                   if change.book_num is None or (change.kind, change.language) not in wide),
+                  key=lambda change: (change.kind, change.language or "", change.book_num or 0, change.chapter or 0))
+
+
+class ChangeListener:
+    """LISTENs on the change channel and hands batches of changes to its handlers"""
+
+    def __init__(self, handlers=(), window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.handlers = list(handlers)
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+
+    def add_handler(self, handler):
+        self.handlers.append(handler)
+        return handler
+
+    def dispatch(self, changes):
+        """Coalesce a batch and call every handler interested in it; a failing handler doesn't stop the others"""
+        changes = coalesce(changes)
+        if not changes:
+            return
+        self.batches += 1
+        for handler in self.handlers:
+            kinds = getattr(handler, "kinds", None)
+            selected = [change for change in changes if kinds is None or change.kind in kinds]
+            if not selected:
+                continue
+            try:
+                handler(selected)
+            except Exception as e:
+                log(f"❌ {getattr(handler, '__name__', type(handler).__name__)} failed: {e}")
+
+    def _listen(self, conn, should_stop):
+        pending, first_at = [], None
+
+        while not should_stop():
+            timeout = self.window if first_at is None else max(0.0, first_at + self.window - time.monotonic())
+            if select.select([conn], [], [], timeout)[0]:
+                conn.poll()
+                while conn.notifies:
+                    change = parse_payload(conn.notifies.pop(0).payload)
+                    if change:
+                        pending.append(change)
+                        first_at = first_at or time.monotonic()
+
+            if pending and (len(pending) >= self.max_batch or time.monotonic() - first_at >= self.window):
+                batch, pending, first_at = pending, [], None
+                self.dispatch(batch)
+
+        if pending:
+            self.dispatch(pending)
+
+    def run(self, should_stop=lambda: False):
+        """Listen until should_stop() returns true, reconnecting after connection failures"""
+        connected_before = False
+        while not should_stop():
+            try:
+                conn = connect(statement_timeout=0)
+            except psycopg2.OperationalError as e:
+                log(f"⚠️  Could not connect ({e}); retrying in {RECONNECT_DELAY}s")
+                time.sleep(RECONNECT_DELAY)
+                continue
+
+            try:
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                log(f"👂 Listening on {CHANNEL}")
+                # Notifications sent while we were disconnected are lost; assume anything changed.
+                # LISTEN comes first, so changes committed while the handlers run are queued, not lost.
+                if connected_before:
+                    self.dispatch([ChapterChange("reset", None, None, None)])
+                connected_before = True
+                self._listen(conn, should_stop)
+            except psycopg2.Error as e:
+                log(f"⚠️  Lost the listening connection ({e}); reconnecting in {RECONNECT_DELAY}s")
+                time.sleep(RECONNECT_DELAY)
+            finally:
+                conn.close()
+
+
+def log_changes(changes):
+    """Handler that logs each batch"""
+    shown = ", ".join(change_payload(change.kind, change.book_num, change.chapter, change.language or "*")
+                      for change in changes[:10])
+    log(f"🔔 {len(changes)} changes: {shown}{' ...' if len(changes) > 10 else ''}")
+
+
+class StaticExportHandler:
+    """Re-exports the static files of changed English chapters (the export holds the API's payloads)"""
+
+    kinds = CONTENT_KINDS
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+
+    def __call__(self, changes):
+        from export_static import export_static
+
+        changes = [change for change in changes if change.kind == "reset" or change.language == DEFAULT_LANGUAGE]
+        if not changes:
+            return
+        everything = any(change.book_num is None for change in changes)
+        chapters = None if everything else {(change.book_num, change.chapter) for change in changes}
+
+        conn = connect()
+        try:
+            conn.set_session(readonly=True)
+            written, unchanged = export_static(conn, self.out_dir, chapters=chapters)
+        finally:
+            conn.close()
+        log(f"📦 Static export: {written:,} chapters written, {unchanged:,} unchanged")
+
+
+class WebhookHandler:
+    """POSTs each batch as JSON to a URL, e.g. a cache or CDN purge endpoint"""
+
+    kinds = CONTENT_KINDS
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def __call__(self, changes):
+        response = self.session.post(self.url, timeout=self.timeout, json={
+            "changes": [change._asdict() for change in changes],
+        })
+        response.raise_for_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Listen for or announce chapter changes")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    listen_parser = subcommands.add_parser("listen", help="batch change notifications and run the handlers")
+    listen_parser.add_argument("--window", type=float, default=BATCH_WINDOW, help="seconds to batch notifications for")
+    listen_parser.add_argument("--export", default=EXPORT_DIR, help="re-export changed chapters into this directory")
+    listen_parser.add_argument("--webhook", default=WEBHOOK_URL, help="POST every batch of changes to this URL")
+    notify_parser = subcommands.add_parser("notify", help="announce a change by hand")
+    notify_parser.add_argument("kind", choices=KINDS)
+    notify_parser.add_argument("book", type=int)
+    notify_parser.add_argument("chapter", type=int)
+    notify_parser.add_argument("language", nargs="?", default=DEFAULT_LANGUAGE)
+    for subparser in (listen_parser, notify_parser):
+        subparser.add_argument("--docker", action="store_true", help="connect to the 'db' host instead of localhost")
+    args = parser.parse_args()
+
+    if args.docker:
+        use_docker_host()
+
+    if args.command == "notify":
+        try:
+            conn = connect()
+            notify_change(conn.cursor(), args.kind, args.book, args.chapter, args.language)
+            conn.commit()
+            conn.close()
+        except psycopg2.Error as e:
+            print(f"❌ Error sending the notification: {e}")
+            sys.exit(1)
+        print(f"🔔 Sent {change_payload(args.kind, args.book, args.chapter, args.language)}")
+        return
+
+    listener = ChangeListener([log_changes], window=args.window)
+    if args.export:
+        listener.add_handler(StaticExportHandler(args.export))
+    if args.webhook:
+        listener.add_handler(WebhookHandler(args.webhook))
+    try:
+        listener.run()
+    except KeyboardInterrupt:
+        log("👋 Change listener stopped")
+
+
+if __name__ == "__main__":
+    main()
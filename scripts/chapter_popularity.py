@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Chapter Popularity
+The API counts chapter hits in memory and flushes them every minute into
+chapter_access, with a score that decays by half every week without hits.
+This module reads those scores so backfill and refresh work can go where it
+saves readers the most latency.
+
+    warm [<limit>]   queue missing chapters for the scrape worker, most popular first
+    top [<limit>]    print the most popular chapters
+
+The API writes the table; it is created here, by auto_setup_db.py and by
+db-init/init.sql.
+"""
+import sys
+
+from db_connection import configure_from_argv, connect
+from verse_data import BOOK_NAMES
+from prefetch_queue import enqueue_chapters, ensure_scrape_queue
+
+HALF_LIFE_SECONDS = 7 * 24 * 60 * 60
+
+# Warming ranks behind on-demand neighbor prefetches (priority 100 + distance)
+WARM_PRIORITY_BASE = 1000
+
+CHAPTER_ACCESS_SQL = """
+    CREATE TABLE IF NOT EXISTS chapter_access (
+        book_num INTEGER NOT NULL,
+        chapter INTEGER NOT NULL,
+        hits BIGINT NOT NULL DEFAULT 0,
+        score DOUBLE PRECISION NOT NULL DEFAULT 0,
+        last_access TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (book_num, chapter)
+    );
+"""
+
+# Score decayed to the current time, matching the API's flush
+CURRENT_SCORE_SQL = (
+    "a.score * power(0.5::float8, extract(epoch FROM now() - a.last_access)::float8 / {half_life})"
+).format(half_life=HALF_LIFE_SECONDS)
+
+
+def ensure_chapter_access(cur):
+    """Create the chapter access table if it doesn't exist"""
+    cur.execute(CHAPTER_ACCESS_SQL)
+
+
+def popular_chapters(cur, limit=None, missing_only=False):
+    """Return (book_num, chapter, hits, score) ordered by decayed score, most popular first.
+
+    With missing_only, only chapters without stored study content are returned.
+    """
+    missing = """
+        AND NOT EXISTS (SELECT 1 FROM study_content s WHERE s.book_num = a.book_num AND s.chapter = a.chapter)
+    """ if missing_only else ""
+    cur.execute(f"""
+        SELECT a.book_num, a.chapter, a.hits, {CURRENT_SCORE_SQL} AS current_score
+          FROM chapter_access a
+         WHERE true {missing}
+         ORDER BY current_score DESC, a.book_num, a.chapter
+         LIMIT %s
+    """, (limit,))
+    return cur.fetchall()
+
+
+def warm_popular_chapters(cur, limit=None):
+    """Queue the most popular chapters that aren't stored yet. Returns the number queued."""
+    chapters = popular_chapters(cur, limit, missing_only=True)
+    return enqueue_chapters(
+        cur,
+        ((book_num, chapter, WARM_PRIORITY_BASE + rank) for rank, (book_num, chapter, _, _) in enumerate(chapters)),
+        reason="popular"
+    )
+
+
+def main():
+    args = configure_from_argv()
+
+    if not args or args[0] not in ("warm", "top") or len(args) > 2:
+        print("Usage: python3 chapter_popularity.py [--docker] warm | top [<limit>]")
+        sys.exit(1)
+
+    limit = int(args[1]) if len(args) > 1 else None
+
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        ensure_chapter_access(cur)
+        ensure_scrape_queue(cur)
+
+        if args[0] == "warm":
+            queued = warm_popular_chapters(cur, limit)
+            print(f"✅ Queued {queued} popular chapters for the scrape worker")
+        else:
+            for book_num, chapter, hits, score in popular_chapters(cur, limit or 20):
+                book_name = BOOK_NAMES.get(book_num, f"Book {book_num}")
+                print(f"  {book_name} {chapter}: score {score:,.1f} ({hits:,} hits)")
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error reading chapter popularity: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Database Connection
+One place for every script's PostgreSQL settings, so no script hard-codes a
+host and the same file works locally and inside the backend container.
+
+    WOL_DB_HOST               host or socket directory (default localhost; docker-compose sets db)
+    WOL_DB_PORT               port (default 5432)
+    WOL_DB_NAME               database (default wol-api)
+    WOL_DB_USER               user (default postgres)
+    WOL_DB_PASSWORD           password (default postgres)
+    WOL_DB_POOL_MIN           idle connections the pool keeps open (default 2)
+    WOL_DB_POOL_MAX           connections the pool opens at most (default 4)
+    WOL_DB_POOL_TIMEOUT       seconds to wait for a free pooled connection (default 30)
+    WOL_DB_STATEMENT_TIMEOUT  statement timeout in milliseconds, 0 for none (default 0)
+    WOL_DB_CONNECT_TIMEOUT    connect timeout in seconds (default 10)
+
+connect() opens a one-off connection. Long-running processes (the scrape
+worker, the health monitor) use pooled_connection(), which hands out warm
+connections from a thread-safe pool and waits when all are in use, raising
+PoolError if none comes back within WOL_DB_POOL_TIMEOUT. Every
+connection is tagged with an application_name derived from the script, so
+pg_stat_activity shows who is holding what. advisory_lock() serializes work
+across processes, such as database restores.
+"""
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+DOCKER_HOST = "db"
+
+DB_SETTINGS = {
+    "host": os.environ.get("WOL_DB_HOST", "localhost"),
+    "port": int(os.environ.get("WOL_DB_PORT", "5432")),
+    "database": os.environ.get("WOL_DB_NAME", "wol-api"),
+    "user": os.environ.get("WOL_DB_USER", "postgres"),
+    "password": os.environ.get("WOL_DB_PASSWORD", "postgres"),
+}
+
+POOL_MIN = int(os.environ.get("WOL_DB_POOL_MIN", "2"))
+POOL_MAX = int(os.environ.get("WOL_DB_POOL_MAX", "4"))
+POOL_TIMEOUT = float(os.environ.get("WOL_DB_POOL_TIMEOUT", "30"))
+STATEMENT_TIMEOUT_MS = int(os.environ.get("WOL_DB_STATEMENT_TIMEOUT", "0"))
+CONNECT_TIMEOUT = int(os.environ.get("WOL_DB_CONNECT_TIMEOUT", "10"))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def default_application_name():
+    """wol-<script name>, e.g. wol-scrape_worker"""
+    script = os.path.splitext(os.path.basename(sys.argv[0] if sys.argv else ""))[0]
+    return f"wol-{script}" if script not in ("", "-", "-c") else "wol-scripts"
+
+
+def configure(**settings):
+    """Override connection settings for this process (e.g. host="db"). Closes any open pool."""
+    DB_SETTINGS.update({key: value for key, value in settings.items() if value is not None})
+    close_pool()
+
+
+def use_docker_host():
+    """Connect to the docker-compose database service, unless WOL_DB_HOST says otherwise"""
+    if "WOL_DB_HOST" not in os.environ:
+        configure(host=DOCKER_HOST)
+
+
+def configure_from_argv(argv=None):
+    """Handle the scripts' --docker flag. Returns the arguments without it."""
+    argv = sys.argv[1:] if argv is None else argv
+    if "--docker" in argv:
+        use_docker_host()
+    return [arg for arg in argv if arg != "--docker"]
+
+
+def connection_params(application_name=None, statement_timeout=None, **overrides):
+    """Keyword arguments for psycopg2.connect with the configured settings"""
+    params = dict(DB_SETTINGS)
+    params.update({key: value for key, value in overrides.items() if value is not None})
+    params.setdefault("connect_timeout", CONNECT_TIMEOUT)
+    params["application_name"] = application_name or default_application_name()
+
+    timeout = STATEMENT_TIMEOUT_MS if statement_timeout is None else statement_timeout
+    if timeout:
+        params["options"] = f"-c statement_timeout={int(timeout)}"
+    return params
+
+
+def connect(application_name=None, statement_timeout=None, **overrides):
+    """Open a new connection. The caller closes it."""
+    return psycopg2.connect(**connection_params(application_name, statement_timeout, **overrides))
+
+
+class _BlockingPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool raises when exhausted; this one waits up to `timeout` seconds for a connection to come back"""
+
+    def __init__(self, minconn, maxconn, *args, timeout=None, **kwargs):
+        self._available = threading.BoundedSemaphore(maxconn)
+        self.timeout = timeout
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        # A caller borrowing a second connection while holding one would otherwise wait forever on a full pool
+        if not self._available.acquire(timeout=self.timeout):
+            raise PoolError(f"no pooled connection came back within {self.timeout:g}s ({self.maxconn} in use)")
+        try:
+            conn = super().getconn(key)
+            # Drop connections the server closed while they sat idle
+            while conn.closed:
+                super().putconn(conn, close=True)
+                conn = super().getconn(key)
+            return conn
+        except Exception:
+            self._available.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._available.release()
+
+
+def ensure_pool_size(size):
+    """Let the pool open at least `size` connections (e.g. one per loader worker). Closes a smaller open pool."""
+    global POOL_MAX
+    if size > POOL_MAX:
+        POOL_MAX = size
+        close_pool()
+
+
+def get_pool():
+    """The process-wide pool, created on first use (and again after a fork)"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = _BlockingPool(max(0, min(POOL_MIN, POOL_MAX)), max(1, POOL_MAX), timeout=POOL_TIMEOUT,
+                                  **connection_params())
+            _pool_pid = os.getpid()
+        return _pool
+
+
+@contextmanager
+def pooled_connection():
+    """Borrow a pooled connection: commits on success, rolls back on error, then returns it to the pool"""
+    pool = get_pool()
+    conn = pool.getconn()
+    discard = False
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            discard = True
+        raise
+    finally:
+        pool.putconn(conn, close=discard or bool(conn.closed))
+
+
+@contextmanager
+def advisory_lock(name, wait=False):
+    """Hold a session-level advisory lock on its own connection for the duration of the block.
+
+    Yields True once the lock is held, or False straight away if another
+    session holds it (unless wait). The lock connection touches no tables, so
+    it never blocks the DDL a restore runs.
+    """
+    conn = connect()
+    conn.autocommit = True
+    try:
+        cur = conn.cursor()
+        if wait:
+            cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (name,))
+            acquired = True
+        else:
+            cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (name,))
+            acquired = cur.fetchone()[0]
+        yield acquired
+    finally:
+        # Ending the session releases the lock
+        conn.close()
+
+
+def close_pool():
+    """Close every pooled connection (the pool is recreated on next use)"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        # A pool inherited through fork belongs to the parent; leave its sockets alone
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+        _pool_pid = None
@@ -1,15 +1,19 @@
 #!/usr/bin/env python3
 """
 Database Health Monitor
-Continuously monitors database health and auto-restores if needed.
+Continuously monitors database health and auto-restores if needed. Every
+few minutes it also compares per-chapter verse counts with the corpus
+manifest (see verse_manifest.py) and reloads chapters that lost verses.
 This runs as a background process in the backend container.
 """
 import time
 import sys
 import os
 import subprocess
-import psycopg2
 from datetime import datetime
+from db_connection import advisory_lock, pooled_connection, use_docker_host
+from db_snapshot import RESTORE_LOCK, create_snapshot, restore_latest_snapshot, snapshot_age_seconds
+from verse_manifest import repair_all_languages
 
 def log(message):
     """Log with timestamp"""
@@ -19,31 +23,25 @@ def log(message):
 def check_database_health():
     """Check if database tables exist and have data"""
     try:
-        conn = psycopg2.connect(
-            host="db",
-            database="wol-api",
-            user="postgres",
-            password="postgres",
-            connect_timeout=5
-        )
-        cur = conn.cursor()
-        
-        # Check if verses table exists and has data
-        cur.execute("""
-            SELECT COUNT(*) 
-            FROM information_schema.tables 
-            WHERE table_name = 'verses'
-        """)
-        table_exists = cur.fetchone()[0] > 0
-        
-        if table_exists:
-            cur.execute("SELECT COUNT(*) FROM verses")
-            verse_count = cur.fetchone()[0]
-        else:
-            verse_count = 0
+        # One warm pooled connection serves every check instead of reconnecting each minute
+        with pooled_connection() as conn:
+            cur = conn.cursor()
             
-        cur.close()
-        conn.close()
+            # Check if verses table exists and has data
+            cur.execute("""
+                SELECT COUNT(*) 
+                FROM information_schema.tables 
+                WHERE table_name = 'verses'
+            """)
+            table_exists = cur.fetchone()[0] > 0
+            
+            if table_exists:
+                cur.execute("SELECT COUNT(*) FROM verses")
+                verse_count = cur.fetchone()[0]
+            else:
+                verse_count = 0
+                
+            cur.close()
         
         return True, table_exists, verse_count
         
@@ -52,10 +50,46 @@ def check_database_health():
         return False, False, 0
 
 def restore_database():
-    """Restore database using the auto setup script"""
+    """Restore the database, unless another restore (e.g. auto_restore_db.py's) is already running"""
+    try:
+        with advisory_lock(RESTORE_LOCK) as acquired:
+            if not acquired:
+                log("⏳ Another restore is in progress, skipping")
+                return False
+            return restore_from_snapshot_or_setup()
+    except Exception as e:
+        log(f"❌ Error during database restore: {e}")
+        return False
+
+def repair_missing_verses():
+    """Reload only the chapters whose verses are missing or incomplete"""
+    try:
+        with advisory_lock(RESTORE_LOCK) as acquired:
+            if not acquired:
+                return
+            with pooled_connection() as conn:
+                cur = conn.cursor()
+                repaired = repair_all_languages(cur)
+                cur.close()
+        
+        for language, chapters, inserted in repaired:
+            log(f"🩹 Reloaded {inserted:,} missing {language} verses in {chapters} chapters")
+            
+    except Exception as e:
+        log(f"❌ Error repairing missing verses: {e}")
+
+def restore_from_snapshot_or_setup():
+    """Restore database from the latest snapshot, falling back to the auto setup script"""
     try:
         log("🔧 Auto-restoring database...")
         
+        # Snapshots keep scraped study content and restore in seconds
+        if restore_latest_snapshot():
+            log("✅ Database restored from snapshot!")
+            return True
+        
+        log("⚠️  Snapshot restore unavailable, reloading verses.json...")
+        
         # Run the auto setup script
         result = subprocess.run([
             "python3", "/home/appuser/scripts/auto_setup_db.py"
@@ -72,12 +106,34 @@ def restore_database():
         log(f"❌ Error during database restore: {e}")
         return False
 
+def snapshot_if_due(snapshot_interval, last_attempt):
+    """Take a snapshot of a healthy database when the last one is too old.
+    Returns the time of the latest snapshot attempt."""
+    age = snapshot_age_seconds()
+    if age is not None and age < snapshot_interval:
+        return last_attempt
+    
+    # Don't retry a failing dump every check interval
+    if time.time() - last_attempt < snapshot_interval:
+        return last_attempt
+    
+    log("📸 Taking database snapshot...")
+    snapshot = create_snapshot()
+    if snapshot:
+        log(f"✅ Snapshot written to {snapshot}")
+    return time.time()
+
 def main():
     """Main monitoring loop"""
     log("🔍 Starting database health monitor...")
+    use_docker_host()
     
     # Initial check
     check_interval = 60  # Check every 60 seconds
+    snapshot_interval = 6 * 60 * 60  # Snapshot every 6 hours
+    gap_check_interval = 10 * 60  # Compare verse counts with the manifest every 10 minutes
+    last_gap_check = 0
+    last_snapshot_attempt = 0
     consecutive_failures = 0
     max_failures = 3
     
@@ -109,6 +165,12 @@ def main():
                     log(f"✅ Database health restored - {verse_count:,} verses found")
                 consecutive_failures = 0
                 
+                if time.time() - last_gap_check >= gap_check_interval:
+                    last_gap_check = time.time()
+                    repair_missing_verses()
+                
+                last_snapshot_attempt = snapshot_if_due(snapshot_interval, last_snapshot_attempt)
+                
             # Sleep before next check
             time.sleep(check_interval)
             
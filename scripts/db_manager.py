@@ -8,10 +8,41 @@ import psycopg2
 from psycopg2.extras import execute_values
 import sys
 import os
-from typing import Optional
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+import db_connection
+from change_feed import notify_changes, notify_reset
+from materialize_documents import ensure_document_tables, refresh_all_documents
+from language_partitions import ensure_language_partitions
+from prefetch_queue import ensure_scrape_queue
+from chapter_popularity import ensure_chapter_access
+from scrape_metadata import ensure_scrape_metadata
+import query_profiler
+
+# Rows shown by run_custom_query, and rows per round trip while paging the rest
+QUERY_DISPLAY_ROWS = 50
+QUERY_PAGE_SIZE = 2000
+
+EXPORT_DIR = os.environ.get("WOL_EXPORT_DIR", "data/exports")
+
+
+class _CountingWriter:
+    """File wrapper for copy_expert that counts the bytes written"""
+    
+    def __init__(self, f):
+        self.f = f
+        self.bytes_written = 0
+    
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.bytes_written += len(data)
+        return self.f.write(data)
 
 class DatabaseManager:
-    def __init__(self, host="localhost", port=5432, database="wol-api", user="postgres", password="postgres"):
+    def __init__(self, host=None, port=None, database=None, user=None, password=None):
+        """Settings left as None come from the WOL_DB_* environment (see db_connection.py)"""
         self.connection_params = {
             "host": host,
             "port": port,
@@ -24,7 +55,7 @@ class DatabaseManager:
     def connect(self) -> bool:
         """Establish database connection"""
         try:
-            self.conn = psycopg2.connect(**self.connection_params)
+            self.conn = db_connection.connect(**self.connection_params)
             return True
         except psycopg2.Error as e:
             print(f"❌ Database connection failed: {e}")
@@ -93,6 +124,12 @@ class DatabaseManager:
                 );
             """)
             
+            ensure_document_tables(cur)
+            ensure_language_partitions(cur)
+            ensure_scrape_metadata(cur)
+            ensure_scrape_queue(cur)
+            ensure_chapter_access(cur)
+            
             print("✅ Tables created successfully.")
             
             # Load and insert verse data
@@ -127,6 +164,10 @@ class DatabaseManager:
                 page_size=1000
             )
             
+            print("📄 Building study documents...")
+            refresh_all_documents(cur)
+            notify_changes(cur, "verses", None)
+            
             self.conn.commit()
             
             # Get final counts
@@ -161,8 +202,14 @@ class DatabaseManager:
             cur = self.conn.cursor()
             
             print("🗑️  Dropping tables...")
+            cur.execute("DROP TABLE IF EXISTS verse_documents CASCADE;")
+            cur.execute("DROP TABLE IF EXISTS scrape_queue CASCADE;")
+            cur.execute("DROP TABLE IF EXISTS chapter_access CASCADE;")
+            cur.execute("DROP TABLE IF EXISTS study_content_by_language CASCADE;")
+            cur.execute("DROP TABLE IF EXISTS verses_by_language CASCADE;")
             cur.execute("DROP TABLE IF EXISTS study_content CASCADE;")
             cur.execute("DROP TABLE IF EXISTS verses CASCADE;")
+            notify_reset(cur)
             
             self.conn.commit()
             cur.close()
@@ -174,21 +221,14 @@ class DatabaseManager:
             if self.conn:
                 self.conn.rollback()
     
-    def run_custom_query(self):
-        """Execute a custom SQL query"""
-        print("\n🔍 Custom SQL Query")
-        print("Enter your SQL query (type 'EXIT' to cancel):")
-        print("Examples:")
-        print("  SELECT COUNT(*) FROM verses;")
-        print("  SELECT book_name, COUNT(*) FROM verses GROUP BY book_name LIMIT 5;")
-        print("  SELECT * FROM verses WHERE book_num = 40 AND chapter = 24 LIMIT 3;")
-        
+    def _read_query(self) -> Optional[str]:
+        """Prompt for a SQL query terminated by a semicolon. Returns None if cancelled."""
         query_lines = []
         while True:
             line = input("SQL> " if not query_lines else "  -> ").strip()
             if line.upper() == 'EXIT':
                 print("❌ Query cancelled.")
-                return
+                return None
             
             query_lines.append(line)
             
@@ -200,7 +240,7 @@ class DatabaseManager:
         
         if not query.strip():
             print("❌ No query provided.")
-            return
+            return None
         
         # Safety check for destructive operations
         query_upper = query.upper()
@@ -210,23 +250,41 @@ class DatabaseManager:
                 "high"
             ):
                 print("❌ Query cancelled.")
-                return
+                return None
+        
+        return query
+    
+    def run_custom_query(self):
+        """Execute a custom SQL query"""
+        print("\n🔍 Custom SQL Query")
+        print("Enter your SQL query (type 'EXIT' to cancel):")
+        print("Examples:")
+        print("  SELECT COUNT(*) FROM verses;")
+        print("  SELECT book_name, COUNT(*) FROM verses GROUP BY book_name LIMIT 5;")
+        print("  SELECT * FROM verses WHERE book_num = 40 AND chapter = 24 LIMIT 3;")
+        
+        query = self._read_query()
+        if not query:
+            return
+        query_upper = query.upper()
         
         try:
-            cur = self.conn.cursor()
-            
             print(f"\n🔍 Executing: {query}")
-            cur.execute(query)
             
             # Handle different query types
             if query_upper.strip().startswith('SELECT'):
-                results = cur.fetchall()
-                if results:
+                # A named (server-side) cursor pages through the result, so a large
+                # SELECT never has to fit in this process's memory
+                cur = self.conn.cursor(name="custom_query")
+                cur.execute(query.strip().rstrip(';'))
+                
+                rows = cur.fetchmany(QUERY_DISPLAY_ROWS)
+                if rows:
                     # Get column names
                     columns = [desc[0] for desc in cur.description]
                     
                     # Print results in a table format
-                    print(f"\n📊 Results ({len(results)} rows):")
+                    print("\n📊 Results:")
                     print("-" * 80)
                     
                     # Print header
@@ -235,27 +293,132 @@ class DatabaseManager:
                     print("-" * len(header))
                     
                     # Print rows (limit to first 50 for readability)
-                    for i, row in enumerate(results[:50]):
+                    for row in rows:
                         row_str = " | ".join(f"{str(val):<15}" for val in row)
                         print(row_str)
                     
-                    if len(results) > 50:
-                        print(f"... and {len(results) - 50} more rows")
+                    # Count the rest page by page without keeping it
+                    remaining = 0
+                    while True:
+                        page = cur.fetchmany(QUERY_PAGE_SIZE)
+                        if not page:
+                            break
+                        remaining += len(page)
+                    
+                    if remaining:
+                        print(f"... and {remaining:,} more rows")
+                    print(f"📊 {len(rows) + remaining:,} rows")
                 else:
                     print("📊 No results returned.")
+                
+                cur.close()
+                self.conn.commit()
             else:
+                cur = self.conn.cursor()
+                cur.execute(query)
+                
                 # For non-SELECT queries, show affected rows
                 affected = cur.rowcount
                 print(f"✅ Query executed successfully. Rows affected: {affected}")
                 self.conn.commit()
-            
-            cur.close()
+                cur.close()
             
         except Exception as e:
             print(f"❌ Query failed: {e}")
             if self.conn:
                 self.conn.rollback()
     
+    def export_query(self, query: str, path: str, export_format: str = "csv") -> Tuple[int, int]:
+        """Stream a query's results to a CSV or NDJSON file with COPY. Returns (rows, bytes).
+        
+        Rows go straight from the server to the file, so the result never has to fit in memory.
+        """
+        query = query.strip().rstrip(';')
+        
+        if export_format == "csv":
+            copy_sql = f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+        elif export_format == "ndjson":
+            # One JSON object per row. CSV format with control characters as quote and
+            # delimiter writes the JSON verbatim: JSON escapes those characters itself,
+            # so nothing is ever quoted, unlike text format, which escapes backslashes.
+            copy_sql = (f"COPY (SELECT row_to_json(q) FROM ({query}) q) TO STDOUT "
+                        f"WITH (FORMAT csv, QUOTE e'\\x01', DELIMITER e'\\x02')")
+        else:
+            raise ValueError(f"Unknown export format '{export_format}' (expected csv or ndjson)")
+        
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        cur = self.conn.cursor()
+        try:
+            with open(path + ".partial", "wb") as f:
+                writer = _CountingWriter(f)
+                cur.copy_expert(copy_sql, writer)
+            os.replace(path + ".partial", path)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            if os.path.exists(path + ".partial"):
+                os.remove(path + ".partial")
+            raise
+        finally:
+            cur.close()
+        
+        return cur.rowcount, writer.bytes_written
+    
+    def export_query_results(self):
+        """Export a query's results to a CSV or NDJSON file"""
+        print("\n📤 Export Query Results")
+        print("Enter a SELECT query to export (type 'EXIT' to cancel):")
+        print("Example:")
+        print("  SELECT * FROM verses WHERE book_num = 40;")
+        
+        query = self._read_query()
+        if not query:
+            return
+        
+        export_format = input("Format (csv/ndjson) [csv]: ").strip().lower() or "csv"
+        if export_format not in ("csv", "ndjson"):
+            print("❌ Format must be csv or ndjson.")
+            return
+        
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        default_path = os.path.join(EXPORT_DIR, f"query-{timestamp}.{export_format}")
+        path = input(f"Output file [{default_path}]: ").strip() or default_path
+        
+        try:
+            print(f"\n📤 Exporting to {path}...")
+            started = time.monotonic()
+            rows, size = self.export_query(query, path, export_format)
+            elapsed = time.monotonic() - started
+            print(f"✅ Exported {rows:,} rows ({size / (1024 * 1024):.1f} MB) in {elapsed:.1f}s")
+        except Exception as e:
+            print(f"❌ Export failed: {e}")
+    
+    def profile_queries(self, samples: int = 50, save_baseline: Optional[bool] = None):
+        """Profile the API's query shapes and compare them with the saved baseline"""
+        print("\n📈 Query Plan Profiler")
+        try:
+            print(f"🔍 Running EXPLAIN ANALYZE for {len(query_profiler.QUERY_SHAPES)} query shapes...")
+            report = query_profiler.profile(self.conn, samples)
+        except Exception as e:
+            print(f"❌ Profiling failed: {e}")
+            if self.conn:
+                self.conn.rollback()
+            return
+        
+        query_profiler.print_report(report)
+        
+        baseline = query_profiler.load_baseline()
+        if baseline:
+            query_profiler.print_diff(baseline, report)
+        else:
+            print(f"\nℹ️  No baseline at {query_profiler.BASELINE_PATH} yet.")
+        
+        if save_baseline is None:
+            save_baseline = input("\nSave this run as the new baseline? (y/N): ").strip().lower() == "y"
+        if save_baseline:
+            query_profiler.save_baseline(report)
+            print(f"💾 Baseline saved to {query_profiler.BASELINE_PATH}")
+    
     def _find_verses_file(self) -> Optional[str]:
         """Find the verses.json file in common locations"""
         possible_paths = [
@@ -291,16 +454,14 @@ class DatabaseManager:
         }
 
 def main():
-    print("🗄️  WOL API Database Manager")
+    db_connection.configure_from_argv()
+    docker = db_connection.DB_SETTINGS["host"] == db_connection.DOCKER_HOST
+    print("🐳 WOL API Database Manager (Docker)" if docker else "🗄️  WOL API Database Manager")
     print("=" * 50)
     
-    # Determine environment and connection settings
-    if len(sys.argv) > 1 and sys.argv[1] == "--docker":
-        print("🐳 Docker environment detected")
-        db_manager = DatabaseManager(host="db")
-    else:
-        print("💻 Local environment")
-        db_manager = DatabaseManager(host="localhost")
+    # Connection settings come from WOL_DB_* (or --docker)
+    print(f"{'🐳 Docker' if docker else '💻 Local'} environment ({db_connection.DB_SETTINGS['host']})")
+    db_manager = DatabaseManager()
     
     # Test connection
     print("\n🔌 Connecting to database...")
@@ -310,6 +471,13 @@ def main():
     
     print("✅ Connected successfully!")
     
+    # Non-interactive profiling: db_manager.py [--docker] --profile [--samples N] [--save-baseline]
+    if "--profile" in sys.argv:
+        samples = int(sys.argv[sys.argv.index("--samples") + 1]) if "--samples" in sys.argv else 50
+        db_manager.profile_queries(samples, save_baseline="--save-baseline" in sys.argv)
+        db_manager.disconnect()
+        return
+    
     try:
         while True:
             print("\n" + "=" * 50)
@@ -317,9 +485,11 @@ def main():
             print("1️⃣  Setup Database (create tables & load data)")
             print("2️⃣  Delete Database (remove all tables & data)")
             print("3️⃣  Run Custom Query (execute SQL)")
-            print("4️⃣  Exit")
+            print("4️⃣  Export Query Results (CSV/NDJSON)")
+            print("5️⃣  Profile API Queries (EXPLAIN ANALYZE)")
+            print("6️⃣  Exit")
             
-            choice = input("\nSelect option (1-4): ").strip()
+            choice = input("\nSelect option (1-6): ").strip()
             
             if choice == "1":
                 db_manager.setup_database()
@@ -328,10 +498,14 @@ def main():
             elif choice == "3":
                 db_manager.run_custom_query()
             elif choice == "4":
+                db_manager.export_query_results()
+            elif choice == "5":
+                db_manager.profile_queries()
+            elif choice == "6":
                 print("\n👋 Goodbye!")
                 break
             else:
-                print("❌ Invalid choice. Please select 1-4.")
+                print("❌ Invalid choice. Please select 1-6.")
                 
     except KeyboardInterrupt:
         print("\n\n👋 Interrupted by user. Goodbye!")
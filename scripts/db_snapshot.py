@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Database Snapshot Manager
+Takes periodic pg_dump snapshots of the full WOL API database (including scraped
+study notes and study content) and restores them with parallel jobs.
+
+Snapshots use pg_dump's directory format, so both the dump and the restore can
+run one job per table. The restore loads the schema, then the data, and only
+then builds indexes and constraints, which is much faster than indexing
+row by row during the load.
+"""
+import os
+import sys
+import shutil
+import subprocess
+from datetime import datetime
+
+from change_feed import announce_reset
+from db_connection import DB_SETTINGS, advisory_lock, use_docker_host
+
+SNAPSHOT_DIR = os.environ.get("WOL_SNAPSHOT_DIR", "/home/appuser/data/snapshots")
+SNAPSHOT_PREFIX = "wol-api-"
+SNAPSHOTS_TO_KEEP = 3
+PARALLEL_JOBS = max(2, min(8, os.cpu_count() or 2))
+
+# Advisory lock held for the whole of any restore or repair, so two never run at once
+RESTORE_LOCK = "wol-api-restore"
+
+
+def _pg_args(host=None):
+    return ["-h", host or DB_SETTINGS["host"], "-p", str(DB_SETTINGS["port"]), "-U", DB_SETTINGS["user"]]
+
+
+def _pg_env():
+    env = os.environ.copy()
+    env.setdefault("PGPASSWORD", DB_SETTINGS["password"])
+    return env
+
+
+def list_snapshots(snapshot_dir=SNAPSHOT_DIR):
+    """Return completed snapshot paths, newest first"""
+    if not os.path.isdir(snapshot_dir):
+        return []
+
+    snapshots = [
+        os.path.join(snapshot_dir, name)
+        for name in os.listdir(snapshot_dir)
+        if name.startswith(SNAPSHOT_PREFIX) and not name.endswith(".partial")
+    ]
+    return sorted(snapshots, reverse=True)
+
+
+def latest_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """Return the newest completed snapshot, or None"""
+    snapshots = list_snapshots(snapshot_dir)
+    return snapshots[0] if snapshots else None
+
+
+def snapshot_age_seconds(snapshot_dir=SNAPSHOT_DIR):
+    """Seconds since the newest snapshot was taken, or None if there is none"""
+    snapshot = latest_snapshot(snapshot_dir)
+    if not snapshot:
+        return None
+    return datetime.now().timestamp() - os.path.getmtime(snapshot)
+
+
+def create_snapshot(host=None, snapshot_dir=SNAPSHOT_DIR, jobs=PARALLEL_JOBS, keep=SNAPSHOTS_TO_KEEP):
+    """Dump the database to a new snapshot directory and prune old snapshots.
+
+    The dump is written to a .partial directory and renamed when complete, so
+    a crash mid-dump never leaves a snapshot that looks restorable.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    name = SNAPSHOT_PREFIX + datetime.now().strftime("%Y%m%d-%H%M%S")
+    final_path = os.path.join(snapshot_dir, name)
+    partial_path = final_path + ".partial"
+
+    shutil.rmtree(partial_path, ignore_errors=True)
+    result = subprocess.run(
+        ["pg_dump", *_pg_args(host), "-d", DB_SETTINGS["database"],
+         "--format=directory", f"--jobs={jobs}", "--compress=6", "--no-owner",
+         "-f", partial_path],
+        capture_output=True, text=True, env=_pg_env()
+    )
+
+    if result.returncode != 0:
+        shutil.rmtree(partial_path, ignore_errors=True)
+        print(f"❌ Snapshot failed: {result.stderr.strip()}")
+        return None
+
+    os.rename(partial_path, final_path)
+
+    for old_snapshot in list_snapshots(snapshot_dir)[keep:]:
+        shutil.rmtree(old_snapshot, ignore_errors=True)
+
+    return final_path
+
+
+def restore_snapshot(snapshot_path, host=None, jobs=PARALLEL_JOBS):
+    """Restore a snapshot over the current database.
+
+    Runs pg_restore once per section: schema first, then the table data in
+    parallel, then indexes and constraints in parallel.
+    """
+    sections = [
+        ("pre-data", ["--clean", "--if-exists"]),
+        ("data", [f"--jobs={jobs}"]),
+        ("post-data", [f"--jobs={jobs}"]),
+    ]
+
+    for section, extra_args in sections:
+        result = subprocess.run(
+            ["pg_restore", *_pg_args(host), "-d", DB_SETTINGS["database"],
+             "--no-owner", f"--section={section}", *extra_args, snapshot_path],
+            capture_output=True, text=True, env=_pg_env()
+        )
+        if result.returncode != 0:
+            print(f"❌ Snapshot restore failed during {section}: {result.stderr.strip()}")
+            return False
+
+    # Every chapter may differ from what caches and exports hold
+    announce_reset(host)
+    return True
+
+
+def restore_latest_snapshot(host=None, snapshot_dir=SNAPSHOT_DIR, jobs=PARALLEL_JOBS):
+    """Restore the newest snapshot. Returns False if there is none or it fails."""
+    snapshot = latest_snapshot(snapshot_dir)
+    if not snapshot:
+        print("ℹ️  No database snapshot available")
+        return False
+
+    print(f"📦 Restoring snapshot {os.path.basename(snapshot)} with {jobs} jobs...")
+    started = datetime.now()
+    if not restore_snapshot(snapshot, host=host, jobs=jobs):
+        return False
+
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"✅ Snapshot restored in {elapsed:.1f}s")
+    return True
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != "--local"]
+    if "--local" not in sys.argv:
+        use_docker_host()
+    command = args[0] if args else "create"
+
+    if command == "create":
+        print("📸 Creating database snapshot...")
+        snapshot = create_snapshot()
+        if not snapshot:
+            sys.exit(1)
+        print(f"✅ Snapshot written to {snapshot}")
+
+    elif command == "restore":
+        with advisory_lock(RESTORE_LOCK) as acquired:
+            if not acquired:
+                print("⏳ Another restore is in progress; try again later")
+                sys.exit(1)
+            if len(args) > 1:
+                print(f"📦 Restoring snapshot {args[1]}...")
+                success = restore_snapshot(args[1])
+            else:
+                success = restore_latest_snapshot()
+        sys.exit(0 if success else 1)
+
+    elif command == "list":
+        snapshots = list_snapshots()
+        if not snapshots:
+            print("No snapshots found.")
+        for snapshot in snapshots:
+            taken = datetime.fromtimestamp(os.path.getmtime(snapshot)).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"{os.path.basename(snapshot)}  ({taken})")
+
+    else:
+        print("Usage: python3 db_snapshot.py [--local] [create | restore [<snapshot_path>] | list]")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
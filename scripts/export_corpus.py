@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Corpus Exporter
+Streams the verses and study_content tables out of Postgres into portable
+artifacts that can be queried without a Postgres instance:
+
+    <out>/parquet/verses.parquet         columnar copy for analytics
+    <out>/parquet/study_content.parquet
+    <out>/wol-api.sqlite                 single-file database for edge nodes
+
+Rows are read through server-side cursors in fixed-size batches, so memory use
+stays flat no matter how large the tables get. JSONB columns are exported as
+JSON text to keep the schema stable, with study notes expanded to their
+scraped shape (see study_notes_codec.py).
+
+Parquet output needs pyarrow (pip install pyarrow); the SQLite export only
+uses the standard library.
+"""
+import os
+import sys
+import json
+import sqlite3
+import argparse
+
+from db_connection import connect, use_docker_host
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+BATCH_SIZE = 5000
+
+VERSES_QUERY = """
+    SELECT book_num, book_name, chapter, verse_num, verse_text, expand_study_notes(study_notes)::text
+      FROM verses
+     ORDER BY book_num, chapter, verse_num
+"""
+
+STUDY_CONTENT_QUERY = """
+    SELECT id, book_num, chapter, outline, study_articles::text, cross_references::text
+      FROM study_content
+     ORDER BY book_num, chapter
+"""
+
+VERSE_COLUMNS = ["book_num", "book_name", "chapter", "verse_num", "verse_text", "study_notes"]
+STUDY_CONTENT_COLUMNS = ["id", "book_num", "chapter", "outline", "study_articles", "cross_references"]
+
+SQLITE_SCHEMA = """
+    CREATE TABLE verses (
+        book_num INTEGER NOT NULL,
+        book_name TEXT NOT NULL,
+        chapter INTEGER NOT NULL,
+        verse_num INTEGER NOT NULL,
+        verse_text TEXT NOT NULL,
+        study_notes TEXT
+    );
+
+    CREATE TABLE study_content (
+        id INTEGER PRIMARY KEY,
+        book_num INTEGER NOT NULL,
+        chapter INTEGER NOT NULL,
+        outline TEXT,
+        study_articles TEXT,
+        cross_references TEXT
+    );
+"""
+
+# The lookups the API performs: verse / verse range by reference, study content by chapter
+SQLITE_INDEXES = """
+    CREATE INDEX idx_verses_reference ON verses (book_num, chapter, verse_num);
+    CREATE INDEX idx_study_content_chapter ON study_content (book_num, chapter);
+"""
+
+
+def parquet_schemas():
+    """Stable Parquet schemas for the exported tables"""
+    verses = pa.schema([
+        ("book_num", pa.int32()),
+        ("book_name", pa.string()),
+        ("chapter", pa.int32()),
+        ("verse_num", pa.int32()),
+        ("verse_text", pa.string()),
+        ("study_notes", pa.string()),
+    ])
+    study_content = pa.schema([
+        ("id", pa.int32()),
+        ("book_num", pa.int32()),
+        ("chapter", pa.int32()),
+        ("outline", pa.list_(pa.string())),
+        ("study_articles", pa.string()),
+        ("cross_references", pa.string()),
+    ])
+    return verses, study_content
+
+
+def stream_batches(conn, name, query, batch_size=BATCH_SIZE):
+    """Yield lists of rows from a server-side cursor"""
+    with conn.cursor(name=name) as cur:
+        cur.itersize = batch_size
+        cur.execute(query)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+
+
+class ParquetSink:
+    """Writes row batches to a Parquet file, one row group per batch"""
+
+    def __init__(self, path, schema, columns):
+        self.path = path
+        self.schema = schema
+        self.columns = columns
+        self.writer = pq.ParquetWriter(path + ".partial", schema, compression="zstd")
+
+    def write(self, rows):
+        table = pa.Table.from_pydict(
+            {column: [row[i] for row in rows] for i, column in enumerate(self.columns)},
+            schema=self.schema
+        )
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+        os.replace(self.path + ".partial", self.path)
+
+
+class SqliteSink:
+    """Writes row batches to a fresh SQLite database, building indexes at the end"""
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(path + ".partial"):
+            os.remove(path + ".partial")
+        self.conn = sqlite3.connect(path + ".partial")
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.executescript(SQLITE_SCHEMA)
+
+    def write_verses(self, rows):
+        self.conn.executemany("INSERT INTO verses VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def write_study_content(self, rows):
+        self.conn.executemany(
+            "INSERT INTO study_content VALUES (?, ?, ?, ?, ?, ?)",
+            [(row[0], row[1], row[2], _json_list(row[3]), row[4], row[5]) for row in rows]
+        )
+
+    def close(self):
+        self.conn.executescript(SQLITE_INDEXES)
+        self.conn.commit()
+        self.conn.execute("ANALYZE")
+        self.conn.close()
+        os.replace(self.path + ".partial", self.path)
+
+
+def _json_list(values):
+    return json.dumps(values) if values is not None else None
+
+
+def export_corpus(conn, out_dir, parquet=True, sqlite=True, batch_size=BATCH_SIZE):
+    """Export verses and study_content. Returns (verse_rows, study_content_rows)."""
+    os.makedirs(out_dir, exist_ok=True)
+    verse_sinks = []
+    study_sinks = []
+
+    if parquet:
+        parquet_dir = os.path.join(out_dir, "parquet")
+        os.makedirs(parquet_dir, exist_ok=True)
+        verse_schema, study_schema = parquet_schemas()
+        verses_parquet = ParquetSink(os.path.join(parquet_dir, "verses.parquet"), verse_schema, VERSE_COLUMNS)
+        study_parquet = ParquetSink(os.path.join(parquet_dir, "study_content.parquet"), study_schema, STUDY_CONTENT_COLUMNS)
+        verse_sinks.append(verses_parquet.write)
+        study_sinks.append(study_parquet.write)
+
+    if sqlite:
+        sqlite_sink = SqliteSink(os.path.join(out_dir, "wol-api.sqlite"))
+        verse_sinks.append(sqlite_sink.write_verses)
+        study_sinks.append(sqlite_sink.write_study_content)
+
+    verse_rows = 0
+    for rows in stream_batches(conn, "export_verses", VERSES_QUERY, batch_size):
+        for sink in verse_sinks:
+            sink(rows)
+        verse_rows += len(rows)
+        print(f"📖 Exported {verse_rows:,} verses...")
+
+    study_rows = 0
+    for rows in stream_batches(conn, "export_study_content", STUDY_CONTENT_QUERY, batch_size):
+        for sink in study_sinks:
+            sink(rows)
+        study_rows += len(rows)
+
+    if parquet:
+        verses_parquet.close()
+        study_parquet.close()
+    if sqlite:
+        sqlite_sink.close()
+
+    return verse_rows, study_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the WOL API corpus to Parquet and SQLite")
+    parser.add_argument("--docker", action="store_true", help="connect to the 'db' host instead of localhost")
+    parser.add_argument("--out", default="/home/appuser/data/export", help="output directory")
+    parser.add_argument("--no-parquet", action="store_true", help="skip the Parquet dataset")
+    parser.add_argument("--no-sqlite", action="store_true", help="skip the SQLite database")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    parquet = not args.no_parquet
+    if parquet and pa is None:
+        print("❌ Parquet export needs pyarrow (pip install pyarrow), or pass --no-parquet.")
+        sys.exit(1)
+
+    if args.docker:
+        use_docker_host()
+
+    try:
+        conn = connect()
+        conn.set_session(readonly=True)
+
+        print(f"📦 Exporting corpus to {args.out}...")
+        verse_rows, study_rows = export_corpus(
+            conn, args.out, parquet=parquet, sqlite=not args.no_sqlite, batch_size=args.batch_size
+        )
+        conn.close()
+
+        print(f"✅ Export complete!")
+        print(f"   📖 Verses: {verse_rows:,}")
+        print(f"   📚 Study content: {study_rows:,}")
+
+    except Exception as e:
+        print(f"❌ Export failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
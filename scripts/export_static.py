@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Static JSON Exporter
+Renders the API's read payloads into static files a CDN can serve in front of
+the Rust API:
+
+    <out>/<book>/<chapter>.json       one file per chapter
+    <out>/<book>/<chapter>.json.gz    gzip variant
+    <out>/<book>/<chapter>.json.br    brotli variant (needs the brotli package)
+    <out>/manifest.json               content hash and sizes for every chapter
+
+Each chapter file holds a slice per verse with the exact payloads of
+/api/v1/verse (plain text) and /api/v1/study (the verse document):
+
+    {"book_num": 40, "chapter": 24, "verses": {"14": {"verse": "...", "study": {...}}}}
+
+Payloads come from the materialized verse_documents table. Rebuilds are
+incremental: a chapter whose rendered content hash matches the previous
+manifest is not rewritten or recompressed.
+"""
+import os
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+from itertools import groupby
+
+from db_connection import connect, use_docker_host
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+DOCUMENTS_QUERY = """
+    SELECT book_num, chapter, verse_num, document
+      FROM verse_documents
+     {where}
+     ORDER BY book_num, chapter, verse_num
+"""
+
+CHAPTERS_FILTER = "WHERE (book_num, chapter) IN (SELECT * FROM unnest(%s::int[], %s::int[]))"
+
+# Field order of the Rust BibleVerse / StudyContent models, so files match the API byte for byte
+VERSE_FIELDS = ["book_num", "book_name", "chapter", "verse_num", "verse_text", "study_notes"]
+STUDY_CONTENT_FIELDS = ["id", "book_num", "chapter", "outline", "study_articles", "cross_references"]
+
+
+def _ordered(obj, fields):
+    return {field: obj.get(field) for field in fields}
+
+
+def render_study_payload(document):
+    """Reorder a verse document into the field order the study endpoint emits"""
+    study_content = document.get("study_content")
+    return {
+        "verse": _ordered(document["verse"], VERSE_FIELDS),
+        "study_content": _ordered(study_content, STUDY_CONTENT_FIELDS) if study_content else None,
+    }
+
+
+def render_chapter(book_num, chapter_num, rows):
+    """Render a chapter file from its (verse_num, document) rows. Returns the encoded bytes."""
+    verses = {}
+    for verse_num, document in rows:
+        verses[str(verse_num)] = {
+            "verse": document["verse"]["verse_text"],
+            "study": render_study_payload(document),
+        }
+
+    payload = {"book_num": book_num, "chapter": chapter_num, "verses": verses}
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _write_atomic(path, data):
+    with open(path + ".partial", "wb") as f:
+        f.write(data)
+    os.replace(path + ".partial", path)
+
+
+def write_chapter_files(out_dir, book_num, chapter_num, body):
+    """Write the chapter file and its compressed variants. Returns the manifest entry sizes."""
+    book_dir = os.path.join(out_dir, str(book_num))
+    os.makedirs(book_dir, exist_ok=True)
+    path = os.path.join(book_dir, f"{chapter_num}.json")
+
+    sizes = {"bytes": len(body)}
+    _write_atomic(path, body)
+
+    gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+    _write_atomic(path + ".gz", gzipped)
+    sizes["gzip_bytes"] = len(gzipped)
+
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=11)
+        _write_atomic(path + ".br", compressed)
+        sizes["br_bytes"] = len(compressed)
+
+    return sizes
+
+
+def load_manifest(out_dir):
+    """Load the previous manifest, or an empty one"""
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "chapters": {}}
+
+
+def _files_present(out_dir, entry):
+    path = os.path.join(out_dir, entry["path"])
+    if not (os.path.exists(path) and os.path.exists(path + ".gz")):
+        return False
+    return "br_bytes" not in entry or os.path.exists(path + ".br")
+
+
+def _remove_chapter_files(out_dir, entry):
+    path = os.path.join(out_dir, entry["path"])
+    for variant in (path, path + ".gz", path + ".br"):
+        if os.path.exists(variant):
+            os.remove(variant)
+
+
+def export_static(conn, out_dir, force=False, chapters=None):
+    """Render every chapter, rewriting only changed ones. Returns (written, unchanged).
+
+    With `chapters`, a set of (book_num, chapter), only those are rendered (e.g. by
+    the change feed listener); the rest of the manifest is kept as it was.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    previous = load_manifest(out_dir)["chapters"]
+    written = unchanged = 0
+
+    if chapters is None:
+        query, params, exported = DOCUMENTS_QUERY.format(where=""), None, {}
+    else:
+        chapters = sorted(set(chapters))
+        query = DOCUMENTS_QUERY.format(where=CHAPTERS_FILTER)
+        params = ([b for b, _ in chapters], [c for _, c in chapters])
+        requested = {f"{book_num}/{chapter_num}" for book_num, chapter_num in chapters}
+        exported = {key: entry for key, entry in previous.items() if key not in requested}
+
+    with conn.cursor(name="export_static_documents") as cur:
+        cur.itersize = 2000
+        cur.execute(query, params)
+
+        for (book_num, chapter_num), rows in groupby(cur, key=lambda row: (row[0], row[1])):
+            body = render_chapter(book_num, chapter_num, ((row[2], row[3]) for row in rows))
+            key = f"{book_num}/{chapter_num}"
+            content_hash = hashlib.sha256(body).hexdigest()
+            entry = previous.get(key)
+
+            needs_brotli = brotli is not None and entry is not None and "br_bytes" not in entry
+            if (not force and entry and entry["sha256"] == content_hash
+                    and not needs_brotli and _files_present(out_dir, entry)):
+                exported[key] = entry
+                unchanged += 1
+                continue
+
+            sizes = write_chapter_files(out_dir, book_num, chapter_num, body)
+            exported[key] = {"path": f"{book_num}/{chapter_num}.json", "sha256": content_hash, **sizes}
+            written += 1
+
+    if chapters is not None:
+        # Requested chapters without documents any more are gone from the API too
+        for key in requested - set(exported):
+            if key in previous:
+                _remove_chapter_files(out_dir, previous[key])
+
+    manifest = {"version": MANIFEST_VERSION, "chapters": exported}
+    _write_atomic(os.path.join(out_dir, MANIFEST_NAME),
+                  json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8"))
+
+    return written, unchanged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export chapter payloads as static, precompressed JSON")
+    parser.add_argument("--docker", action="store_true", help="connect to the 'db' host instead of localhost")
+    parser.add_argument("--out", default="/home/appuser/data/static", help="output directory")
+    parser.add_argument("--force", action="store_true", help="rewrite every chapter even if unchanged")
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("⚠️  brotli is not installed (pip install brotli); writing gzip variants only.")
+
+    if args.docker:
+        use_docker_host()
+
+    try:
+        conn = connect()
+        conn.set_session(readonly=True)
+
+        print(f"📦 Exporting static chapter files to {args.out}...")
+        written, unchanged = export_static(conn, args.out, force=args.force)
+        conn.close()
+
+        print(f"✅ Static export complete! {written:,} chapters written, {unchanged:,} unchanged.")
+
+    except Exception as e:
+        print(f"❌ Static export failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Extractor Benchmark
+Times the page extractors over a fixed set of recorded chapter pages and
+measures their allocations with tracemalloc, then diffs both against a saved
+baseline. Run it before and after a parser change; it exits non-zero on a
+regression.
+
+    record                                  save the benchmark pages (skips those already recorded)
+    run [--repeat 5] [--only <function>] [--save-baseline]
+
+The pages are a small chapter (Psalm 117), a huge one (Psalm 119) and a
+note-heavy one (John 1), recorded into fixtures/extractor_pages/ (laid out
+like upstream_standin.py's recordings) and committed with the baseline in
+fixtures/extractor_bench_baseline.json, so every checkout benchmarks the same
+HTML. The baseline stores a hash of every page, so a run against different
+recordings is reported rather than compared. Timings only compare on the same
+machine; re-save the baseline (WOL_EXTRACTOR_BASELINE points elsewhere) when
+comparing on another one.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import hashlib
+import argparse
+import statistics
+import tracemalloc
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "scrape-verses"))
+
+from populate_study_content import StudyContentExtractor
+from scrape_verses import BibleExtractor
+from scrape_with_study_notes import EnhancedStudyExtractor
+from upstream_standin import page_path, record
+from verse_cleaner import VERSE_ID
+from wol_languages import DEFAULT_LANGUAGE, DEFAULT_EDITION
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PAGES_DIR = os.path.join(FIXTURES_DIR, "extractor_pages")
+BASELINE_PATH = os.environ.get("WOL_EXTRACTOR_BASELINE", os.path.join(FIXTURES_DIR, "extractor_bench_baseline.json"))
+
+BENCH_PAGES = {
+    "small": (19, 117),
+    "huge": (19, 119),
+    "note_heavy": (43, 1),
+}
+
+# Each round runs a function until at least this long has passed, so fast extractors get many calls
+MIN_ROUND_SECONDS = 0.2
+
+REGRESSION_RATIO = 1.25
+REGRESSION_MIN_MS = 0.5
+REGRESSION_MIN_KIB = 64
+
+
+def load_pages(pages_dir=PAGES_DIR):
+    """{name: (book, chapter, html)} for the recorded benchmark pages; exits if any is missing"""
+    pages, missing = {}, []
+    for name, (book_num, chapter_num) in BENCH_PAGES.items():
+        path = page_path(pages_dir, DEFAULT_LANGUAGE, DEFAULT_EDITION, book_num, chapter_num)
+        try:
+            with open(path, "rb") as f:
+                pages[name] = (book_num, chapter_num, f.read())
+        except OSError:
+            missing.append(f"{book_num}:{chapter_num}")
+    if missing:
+        print(f"❌ Benchmark pages not recorded: {', '.join(missing)} (run: extractor_bench.py record)")
+        sys.exit(1)
+    return pages
+
+
+def benchmarks(book_num, chapter_num, html):
+    """(function name, zero-argument callable) for every extractor on one page"""
+    notes = EnhancedStudyExtractor()
+    study = StudyContentExtractor()
+    verses = BibleExtractor()
+
+    soup = BeautifulSoup(html, "html.parser")
+    study_discover = soup.find(id="studyDiscover") or soup
+    verse_ids = [VERSE_ID.match(element["id"]) for element in soup.find_all(id=VERSE_ID)]
+    last_verse = max((int(match.group(3)) for match in verse_ids), default=1)
+
+    return [
+        ("parse", lambda: BeautifulSoup(html, "html.parser")),
+        ("extract_verse_study_notes", lambda: notes.extract_verse_study_notes(soup, book_num, chapter_num)),
+        ("extract_outline", lambda: notes.extract_outline(study_discover)),
+        ("extract_research_guide_articles", lambda: notes.extract_research_guide_articles(study_discover)),
+        ("extract_study_articles", lambda: study.extract_study_articles(study_discover)),
+        ("extract_cross_references", lambda: study.extract_cross_references(study_discover)),
+        # The crawl's verse text path: one parse and DOM walk for the whole chapter
+        ("extract_chapter_from_html", lambda: verses.extract_chapter_from_html(book_num, chapter_num, last_verse, html)),
+    ]
+
+
+def time_call(function, repeat):
+    """Median and best milliseconds per call over `repeat` rounds"""
+    started = time.perf_counter()
+    function()
+    number = max(1, int(MIN_ROUND_SECONDS / max(time.perf_counter() - started, 1e-6)))
+
+    per_call = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                function()
+            per_call.append((time.perf_counter() - started) * 1000 / number)
+    finally:
+        gc.enable()
+    return statistics.median(per_call), min(per_call)
+
+
+def measure_allocations(function):
+    """(peak KiB while running, KiB and blocks still held by the result) for one call"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline_size = tracemalloc.get_traced_memory()[0]
+        result = function()
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    # The first snapshot's own objects are not the function's
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    blocks = sum(stat.count_diff for stat in after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "filename")
+                 if stat.count_diff > 0)
+    del result
+    return (peak - baseline_size) / 1024, (current - baseline_size) / 1024, blocks
+
+
+def run(pages, repeat=5, only=None):
+    """Benchmark every extractor on every page. Returns the report dict."""
+    results = {}
+    for page_name, (book_num, chapter_num, html) in pages.items():
+        for function_name, function in benchmarks(book_num, chapter_num, html):
+            if only and function_name not in only:
+                continue
+            median_ms, best_ms = time_call(function, repeat)
+            peak_kib, retained_kib, blocks = measure_allocations(function)
+            results[f"{page_name}/{function_name}"] = {
+                "median_ms": round(median_ms, 4),
+                "best_ms": round(best_ms, 4),
+                "peak_kib": round(peak_kib, 1),
+                "retained_kib": round(retained_kib, 1),
+                "blocks": blocks,
+            }
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "pages": {name: {"chapter": f"{book_num}:{chapter_num}", "bytes": len(html),
+                         "sha1": hashlib.sha1(html).hexdigest()}
+                  for name, (book_num, chapter_num, html) in pages.items()},
+        "results": results,
+    }
+
+
+def print_report(report):
+    """Print time and allocations per page and extractor"""
+    pages = ", ".join(f"{name} {page['chapter']} ({page['bytes'] / 1024:,.0f} KiB)" for name, page in report["pages"].items())
+    print(f"\n⏱️  Extractors over {pages}")
+    print("-" * 100)
+    print(f"{'page/function':<44} {'median ms':>10} {'best ms':>10} {'peak KiB':>10} {'kept KiB':>10} {'kept blocks':>12}")
+    print("-" * 100)
+    for name, result in report["results"].items():
+        print(f"{name:<44} {result['median_ms']:>10.3f} {result['best_ms']:>10.3f} {result['peak_kib']:>10,.1f} "
+              f"{result['retained_kib']:>10,.1f} {result['blocks']:>12,}")
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Load a saved report, or None"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(report, path=BASELINE_PATH):
+    """Save a report as the baseline future runs are compared with"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def diff_reports(baseline, report):
+    """Compare a report with the baseline. Returns a list of (name, message, is_regression)."""
+    changes = []
+    for name, result in report["results"].items():
+        before = baseline["results"].get(name)
+        page = name.split("/", 1)[0]
+        if not before or baseline["pages"].get(page, {}).get("sha1") != report["pages"][page]["sha1"]:
+            continue
+
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else 1.0
+        regression = ratio >= REGRESSION_RATIO and result["median_ms"] - before["median_ms"] >= REGRESSION_MIN_MS
+        changes.append((name, f"{before['median_ms']:.3f} -> {result['median_ms']:.3f} ms ({ratio:.2f}x)", regression))
+
+        if result["peak_kib"] > before["peak_kib"] * REGRESSION_RATIO and \
+                result["peak_kib"] - before["peak_kib"] >= REGRESSION_MIN_KIB:
+            changes.append((name, f"peak {before['peak_kib']:,.1f} -> {result['peak_kib']:,.1f} KiB", True))
+    return changes
+
+
+def print_diff(baseline, report):
+    """Print the comparison with the baseline. Returns True if anything regressed."""
+    print(f"\n🔁 Compared with baseline from {baseline['created']} (Python {baseline['python']}):")
+    for page, info in report["pages"].items():
+        if baseline["pages"].get(page, {}).get("sha1") != info["sha1"]:
+            print(f"   ⚠️  {page} {info['chapter']} is a different recording; not compared")
+    changes = diff_reports(baseline, report)
+    for name, message, regression in changes:
+        print(f"   {'❌' if regression else '  '} {name:<44} {message}")
+    regressed = any(regression for _, _, regression in changes)
+    if not regressed:
+        print("✅ No regressions")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the page extractors against a saved baseline")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    record_parser = subcommands.add_parser("record", help="save the benchmark pages")
+    record_parser.add_argument("--pages", default=PAGES_DIR, help="directory of recorded pages")
+    run_parser = subcommands.add_parser("run", help="benchmark the extractors")
+    run_parser.add_argument("--pages", default=PAGES_DIR, help="directory of recorded pages")
+    run_parser.add_argument("--repeat", type=int, default=5, help="timed rounds per function")
+    run_parser.add_argument("--only", action="append", help="benchmark only this function (repeatable)")
+    run_parser.add_argument("--save-baseline", action="store_true", help=f"save this run as {BASELINE_PATH}")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        chapters = [chapter for chapter in BENCH_PAGES.values()
+                    if not os.path.exists(page_path(args.pages, DEFAULT_LANGUAGE, DEFAULT_EDITION, *chapter))]
+        saved = record(chapters, pages_dir=args.pages) if chapters else 0
+        print(f"✅ {len(BENCH_PAGES) - len(chapters) + saved}/{len(BENCH_PAGES)} benchmark pages recorded")
+        sys.exit(0 if saved == len(chapters) else 1)
+
+    report = run(load_pages(args.pages), max(1, args.repeat), args.only)
+    print_report(report)
+
+    regressed = False
+    baseline = load_baseline()
+    if args.save_baseline:
+        save_baseline(report)
+        print(f"\n💾 Saved baseline to {BASELINE_PATH}")
+    elif baseline:
+        regressed = print_diff(baseline, report)
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Fetch Controller
+Politeness and flow control shared by every extractor that talks to wol.jw.org.
+
+All fetches in a process go through one FetchController, which layers:
+
+- RequestBudget: a global token bucket, so crawling several languages (or
+  chapters) concurrently never exceeds one request rate towards upstream.
+- AIMD concurrency: the number of requests in flight grows additively while
+  responses are fast and healthy, and is cut multiplicatively on 429s, 5xx,
+  timeouts or latency above target.
+- Retries with jittered exponential backoff that honor Retry-After.
+- A circuit breaker that fails fast once upstream keeps failing. Its state is
+  kept in a small file so the one-shot scraper processes the API spawns also
+  stop hammering a struggling upstream.
+"""
+import os
+import time
+import random
+import tempfile
+import threading
+from email.utils import parsedate_to_datetime
+
+import requests
+
+DEFAULT_REQUESTS_PER_SECOND = float(os.environ.get("WOL_FETCH_RATE", "5"))
+BREAKER_STATE_FILE = os.environ.get(
+    "WOL_FETCH_BREAKER_FILE", os.path.join(tempfile.gettempdir(), "wol-fetch-breaker")
+)
+
+RETRYABLE_EXCEPTIONS = (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of fetching while the circuit breaker is open"""
+
+
+class RequestBudget:
+    """Thread-safe token bucket: `rate` requests per second with bursts up to `burst`"""
+
+    def __init__(self, rate=DEFAULT_REQUESTS_PER_SECOND, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class FetchController:
+    """Adaptive (AIMD) concurrency limiter with retries and a circuit breaker"""
+
+    def __init__(self, budget=None, min_concurrency=1, max_concurrency=16, initial_concurrency=4,
+                 decrease_factor=0.5, latency_target=3.0, timeout=20, max_retries=4,
+                 backoff_base=0.5, backoff_cap=30.0, deadline=60.0,
+                 breaker_threshold=5, breaker_cooldown=60.0, breaker_file=BREAKER_STATE_FILE):
+        self.budget = budget or RequestBudget()
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.deadline = deadline
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.breaker_file = breaker_file
+
+        self.limit = float(initial_concurrency)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._last_decrease = 0.0
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "server_errors": 0,
+                      "network_errors": 0, "breaker_trips": 0}
+
+    # --- concurrency window -------------------------------------------------
+
+    def _acquire_slot(self, deadline_at):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise requests.exceptions.Timeout("Timed out waiting for a fetch slot")
+                self._cond.wait(remaining)
+            self.in_flight += 1
+
+    def _release_slot(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def _on_success(self, latency):
+        with self._cond:
+            self._consecutive_failures = 0
+            if latency > self.latency_target:
+                self._decrease()
+            else:
+                # Additive increase: about +1 per window of successful requests
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / max(self.limit, 1.0))
+            self._cond.notify_all()
+        self._clear_breaker_file()
+
+    def _on_congestion(self):
+        with self._cond:
+            self._consecutive_failures += 1
+            self._decrease()
+            if self._consecutive_failures >= self.breaker_threshold:
+                self._trip(self.breaker_cooldown)
+
+    def _decrease(self):
+        # At most one multiplicative decrease per latency target, so a burst of
+        # failures from the same window doesn't collapse the limit to the floor
+        now = time.monotonic()
+        if now - self._last_decrease >= self.latency_target:
+            self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+            self._last_decrease = now
+
+    # --- circuit breaker ----------------------------------------------------
+
+    def _trip(self, cooldown):
+        self._open_until = max(self._open_until, time.monotonic() + cooldown)
+        self._consecutive_failures = 0
+        self.stats["breaker_trips"] += 1
+        try:
+            with open(self.breaker_file, "w") as f:
+                f.write(str(time.time() + cooldown))
+        except OSError:
+            pass
+
+    def _clear_breaker_file(self):
+        if os.path.exists(self.breaker_file):
+            try:
+                os.remove(self.breaker_file)
+            except OSError:
+                pass
+
+    def breaker_open(self):
+        """True while fetches should fail fast"""
+        if time.monotonic() < self._open_until:
+            return True
+        try:
+            with open(self.breaker_file, "r") as f:
+                return time.time() < float(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return False
+
+    # --- fetching -----------------------------------------------------------
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(response):
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, session, url, **kwargs):
+        """GET through the controller.
+
+        Retries 429s, 5xx responses and timeouts. Returns the final response,
+        which may still be an error status once retries are used up. Raises
+        CircuitOpenError while the breaker is open, and re-raises the last
+        network error if no attempt got a response.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        deadline_at = time.monotonic() + self.deadline
+        response = None
+        error = None
+
+        for attempt in range(self.max_retries + 1):
+            if self.breaker_open():
+                raise CircuitOpenError(f"Upstream circuit breaker open, not fetching {url}")
+
+            self._acquire_slot(deadline_at)
+            try:
+                self.budget.acquire()
+                self.stats["requests"] += 1
+                started = time.monotonic()
+                response = session.get(url, **kwargs)
+                latency = time.monotonic() - started
+                error = None
+            except RETRYABLE_EXCEPTIONS as e:
+                response, error = None, e
+                self.stats["network_errors"] += 1
+            finally:
+                self._release_slot()
+
+            if error is None and response.status_code != 429 and response.status_code < 500:
+                self._on_success(latency)
+                return response
+
+            self._on_congestion()
+            wait = self._backoff(attempt)
+            if response is not None:
+                if response.status_code == 429:
+                    self.stats["throttled"] += 1
+                else:
+                    self.stats["server_errors"] += 1
+                retry_after = self._retry_after(response)
+                if retry_after is not None:
+                    wait = retry_after
+
+            if attempt == self.max_retries:
+                break
+            if time.monotonic() + wait > deadline_at:
+                # Waiting that long would stall the caller; stop sending until upstream recovers
+                if response is not None and response.status_code == 429:
+                    with self._cond:
+                        self._trip(wait)
+                break
+
+            self.stats["retries"] += 1
+            time.sleep(wait)
+
+        if response is None and error is not None:
+            raise error
+        return response
+
+
+_default_controller = None
+_default_controller_lock = threading.Lock()
+
+
+def default_controller():
+    """The process-wide controller shared by all extractors"""
+    global _default_controller
+    with _default_controller_lock:
+        if _default_controller is None:
+            _default_controller = FetchController()
+        return _default_controller
+
+
+def set_default_controller(controller):
+    """Replace the process-wide controller, e.g. to give a background process a smaller budget"""
+    global _default_controller
+    with _default_controller_lock:
+        _default_controller = controller
+    return controller
+
+
+def default_budget():
+    """The process-wide request budget shared by all extractors"""
+    return default_controller().budget
+
+
+def polite_get(session, url, **kwargs):
+    """session.get() through the shared fetch controller"""
+    return default_controller().get(session, url, **kwargs)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Language Partitions
+Stores verses and study content partitioned by language, so each language
+loads, indexes and vacuums on its own.
+
+    verses_by_language          partitioned by LIST (language)
+        verses                  English (the table the API reads)
+        verses_es, verses_fr... one partition per additional language
+    study_content_by_language
+        study_content           English
+        study_content_es, ...
+
+Existing databases are converted in place: the current verses and
+study_content tables gain a language column and are attached as the English
+partitions, so nothing is copied and the API keeps querying the same tables.
+"""
+import sys
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from change_feed import notify_changes
+from db_connection import configure_from_argv, connect
+from memprofile import MemoryProfiler, memprofile_from_argv
+from verse_data import find_verses_file, iter_verse_records
+from wol_languages import DEFAULT_LANGUAGE, LANGUAGES, get_language
+
+PARTITIONED_TABLES = {
+    "verses": "verses_by_language",
+    "study_content": "study_content_by_language",
+}
+
+# Per-partition indexes on the lookups the API performs
+PARTITION_INDEXES = {
+    "verses": "(book_num, chapter, verse_num)",
+    "study_content": "(book_num, chapter)",
+}
+
+
+def partition_name(table, language=DEFAULT_LANGUAGE):
+    """Name of a language's partition of verses or study_content"""
+    get_language(language)
+    return table if language == DEFAULT_LANGUAGE else f"{table}_{language}"
+
+
+def is_partitioned(cur):
+    """True once the language-partitioned parents exist"""
+    cur.execute("SELECT to_regclass('verses_by_language') IS NOT NULL")
+    return cur.fetchone()[0]
+
+
+def ensure_language_partitions(cur):
+    """Attach the existing English tables to language-partitioned parents (idempotent).
+
+    The parent is created with LIKE the English table, so its columns always
+    match and ATTACH PARTITION can't fail on extra legacy columns. The CHECK
+    constraint lets Postgres skip the validation scan while attaching.
+    """
+    for table, parent in PARTITIONED_TABLES.items():
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT 1 FROM pg_inherits
+                 WHERE inhrelid = to_regclass(%s) AND inhparent = to_regclass(%s)
+            )
+        """, (table, parent))
+        if cur.fetchone()[0]:
+            continue
+
+        cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS language TEXT NOT NULL DEFAULT 'en'")
+                    .format(sql.Identifier(table)))
+
+        check_name = f"{table}_language_check"
+        cur.execute("SELECT 1 FROM pg_constraint WHERE conname = %s", (check_name,))
+        if not cur.fetchone():
+            cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} CHECK (language = 'en')")
+                        .format(sql.Identifier(table), sql.Identifier(check_name)))
+
+        cur.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} (LIKE {} INCLUDING DEFAULTS) PARTITION BY LIST (language)")
+                    .format(sql.Identifier(parent), sql.Identifier(table)))
+        cur.execute(sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES IN ('en')")
+                    .format(sql.Identifier(parent), sql.Identifier(table)))
+
+
+def ensure_language_partition(cur, language, indexes=True):
+    """Create a language's verses and study_content partitions if they don't exist.
+
+    With indexes=False the partitions' reference indexes are left for the
+    caller to build after loading (see parallel_load.build_reference_indexes).
+    """
+    tables = partition_name("verses", language), partition_name("study_content", language)
+
+    # Skip the DDL (and its exclusive locks) on the common path where both already exist
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL AND to_regclass(%s) IS NOT NULL", tables)
+    if cur.fetchone()[0]:
+        return tables
+
+    ensure_language_partitions(cur)
+
+    for table, parent in PARTITIONED_TABLES.items():
+        partition = partition_name(table, language)
+        cur.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES IN ({})")
+                    .format(sql.Identifier(partition), sql.Identifier(parent), sql.Literal(language)))
+
+        if language != DEFAULT_LANGUAGE:
+            # Inserts that don't name a language must land in this partition, not the parent's 'en' default
+            cur.execute(sql.SQL("ALTER TABLE {} ALTER COLUMN language SET DEFAULT {}")
+                        .format(sql.Identifier(partition), sql.Literal(language)))
+        if language != DEFAULT_LANGUAGE and indexes:
+            cur.execute(sql.SQL("CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} " + PARTITION_INDEXES[table])
+                        .format(sql.Identifier(f"{partition}_reference"), sql.Identifier(partition)))
+
+    return tables
+
+
+def load_language_verses(cur, language, verses_path, page_size=1000, profiler=None):
+    """Load a language's verses.json into its own partition and analyze just that partition"""
+    profiler = profiler or MemoryProfiler()
+    verses_table, _ = ensure_language_partition(cur, language)
+
+    with profiler.stage("read records"):
+        verse_records = [
+            (book_num, book_name, chapter_num, verse_num, verse_text, language)
+            for book_num, book_name, chapter_num, verse_num, verse_text in iter_verse_records(verses_path)
+        ]
+    with profiler.stage("insert"):
+        execute_values(
+            cur,
+            sql.SQL("INSERT INTO {} (book_num, book_name, chapter, verse_num, verse_text, language) "
+                    "VALUES %s ON CONFLICT DO NOTHING").format(sql.Identifier(verses_table)).as_string(cur),
+            verse_records,
+            page_size=page_size
+        )
+    notify_changes(cur, "verses", None, language)
+    cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(verses_table)))
+    return len(verse_records)
+
+
+def main():
+    profiler, args = memprofile_from_argv(configure_from_argv())
+    usage = ("Usage: python3 language_partitions.py [--docker] migrate\n"
+             "       python3 language_partitions.py [--docker] [--memprofile] load <language> [<verses file>]")
+
+    if not args or args[0] not in ("migrate", "load") or (args[0] == "load" and len(args) < 2):
+        print(usage)
+        print(f"Languages: {', '.join(LANGUAGES)}")
+        sys.exit(1)
+
+    try:
+        conn = connect()
+        cur = conn.cursor()
+
+        if args[0] == "migrate":
+            print("🔧 Partitioning verses and study_content by language...")
+            ensure_language_partitions(cur)
+            print("✅ English tables attached as language partitions")
+        else:
+            language = args[1]
+            verses_path = args[2] if len(args) > 2 else find_verses_file(language)
+            if not verses_path:
+                print(f"❌ Could not find a verses file for language '{language}'.")
+                sys.exit(1)
+
+            print(f"📖 Loading {get_language(language)['name']} verses from {verses_path}...")
+            verse_count = load_language_verses(cur, language, verses_path, profiler=profiler)
+            print(f"✅ Loaded {verse_count:,} verses into {partition_name('verses', language)}")
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error managing language partitions: {e}")
+        sys.exit(1)
+    finally:
+        profiler.report()
+
+
+if __name__ == "__main__":
+    main()
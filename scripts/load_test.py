@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Load Test
+Replays a mix of verse, study and verse-range requests against the API at a
+target rate and reports latency percentiles, throughput and error rates per
+endpoint, with each chapter's first request in the run (the cold miss that
+may trigger a scrape) reported apart from repeat requests.
+
+    python3 load_test.py [--base-url http://localhost:8000] [--rate 20] [--duration 60]
+                         [--mix verse=60,study=30,range=10] [--zipf 1.1] [--concurrency 64]
+                         [--seed 1] [--user <user> --password <password>] [--save-baseline]
+
+Chapters are drawn from a Zipf distribution over a seeded random ordering of
+the whole Bible, so a few chapters are hot and the long tail stays cold, and
+the same seed replays the same requests. Arrivals are open-loop (Poisson at
+--rate): latency is measured from when a request was due, so a slow server
+shows up as latency instead of silently lowering the offered load.
+
+Run it against a local stack whose upstream is the recorded-page stand-in
+(docker-compose.loadtest.yml, upstream_standin.py), never against wol.jw.org.
+Runs are compared with data/load_test_baseline.json when it exists.
+"""
+import os
+import sys
+import json
+import time
+import random
+import bisect
+import argparse
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from verse_data import BOOK_CHAPTER_COUNTS, find_verses_file
+from verse_manifest import load_manifest
+from wol_languages import DEFAULT_LANGUAGE
+
+BASELINE_PATH = os.environ.get("WOL_LOAD_TEST_BASELINE", "data/load_test_baseline.json")
+CREDENTIALS_PATH = "credentials.txt"
+
+DEFAULT_MIX = "verse=60,study=30,range=10"
+ENDPOINTS = ("verse", "study", "range")
+
+# Without a verse manifest only verses every chapter has are requested (Psalm 117 has two)
+FALLBACK_VERSE_COUNT = 2
+MAX_RANGE_LENGTH = 6
+
+REGRESSION_RATIO = 1.25
+REGRESSION_MIN_MS = 5.0
+
+
+def parse_mix(mix):
+    """'verse=60,study=30,range=10' -> {"verse": 0.6, "study": 0.3, "range": 0.1}"""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint '{name}' (expected one of: {', '.join(ENDPOINTS)})")
+        weights[name.strip()] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("the mix needs at least one positive weight")
+    return {name: weight / total for name, weight in weights.items() if weight > 0}
+
+
+def verse_counts():
+    """Verses per (book, chapter) from the verse manifest, or None without a verses file"""
+    verses_path = find_verses_file(DEFAULT_LANGUAGE)
+    if not verses_path:
+        return None
+    counts = {}
+    for key, count in load_manifest(verses_path)["chapters"].items():
+        book_num, chapter_num = key.split(":")
+        counts[(int(book_num), int(chapter_num))] = count
+    return counts
+
+
+class RequestPlan:
+    """Seeded stream of (endpoint, book, chapter, path) with Zipf-distributed chapters"""
+
+    def __init__(self, mix, zipf=1.1, seed=1, counts=None):
+        self.random = random.Random(seed)
+        self.counts = counts or {}
+        self.chapters = [(book, chapter) for book in sorted(BOOK_CHAPTER_COUNTS)
+                         for chapter in range(1, BOOK_CHAPTER_COUNTS[book] + 1)]
+        self.random.shuffle(self.chapters)
+
+        total = 0.0
+        self.cumulative = []
+        for rank in range(1, len(self.chapters) + 1):
+            total += 1.0 / rank ** zipf
+            self.cumulative.append(total)
+
+        self.endpoints = list(mix)
+        self.endpoint_weights = [mix[name] for name in self.endpoints]
+
+    def next(self):
+        book_num, chapter_num = self.chapters[
+            bisect.bisect_left(self.cumulative, self.random.random() * self.cumulative[-1])]
+        verses = self.counts.get((book_num, chapter_num), FALLBACK_VERSE_COUNT)
+        endpoint = self.random.choices(self.endpoints, self.endpoint_weights)[0]
+        start = self.random.randint(1, verses)
+
+        if endpoint == "verse":
+            path = f"/api/v1/verse/{book_num}/{chapter_num}/{start}"
+        elif endpoint == "study":
+            path = f"/api/v1/study/{book_num}/{chapter_num}/{start}"
+        else:
+            start = min(start, max(1, verses - 1))
+            end = min(verses, start + self.random.randint(1, MAX_RANGE_LENGTH - 1))
+            path = f"/api/v1/study/{book_num}/{chapter_num}/{start}-{end}"
+        return endpoint, book_num, chapter_num, path
+
+
+def default_credentials():
+    """(user, password) from WOL_API_USER/WOL_API_PASSWORD or the first line of credentials.txt"""
+    if os.environ.get("WOL_API_USER"):
+        return os.environ["WOL_API_USER"], os.environ.get("WOL_API_PASSWORD", "")
+    try:
+        with open(CREDENTIALS_PATH, "r") as f:
+            for line in f:
+                if ":" in line and not line.startswith("#"):
+                    user, password = line.strip().split(":", 1)
+                    return user, password
+    except OSError:
+        pass
+    return None
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(base_url, mix, rate, duration, zipf=1.1, seed=1, concurrency=64, auth=None, timeout=30):
+    """Offer `rate` requests per second for `duration` seconds. Returns the report dict."""
+    plan = RequestPlan(mix, zipf, seed, verse_counts())
+    if not plan.counts:
+        print(f"⚠️  No verse manifest; requesting verses 1-{FALLBACK_VERSE_COUNT} only")
+
+    results = []
+    results_lock = threading.Lock()
+    sessions = threading.local()
+    arrivals = random.Random(seed + 1)
+    seen_chapters = set()
+
+    def send(endpoint, path, cold, due):
+        session = getattr(sessions, "session", None)
+        if session is None:
+            session = sessions.session = requests.Session()
+            session.auth = auth
+        started = time.monotonic()
+        try:
+            status = str(session.get(base_url + path, timeout=timeout).status_code)
+        except requests.exceptions.Timeout:
+            status = "timeout"
+        except requests.exceptions.RequestException:
+            status = "connection error"
+        finished = time.monotonic()
+        with results_lock:
+            results.append((endpoint, cold, status, (finished - due) * 1000, (started - due) * 1000))
+
+    print(f"🚦 {rate:g} requests/s for {duration:g}s against {base_url} "
+          f"({', '.join(f'{name} {share:.0%}' for name, share in mix.items())}, zipf {zipf:g})")
+    started = time.monotonic()
+    due = started
+    sent = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            due += arrivals.expovariate(rate)
+            if due - started > duration:
+                break
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            endpoint, book_num, chapter_num, path = plan.next()
+            cold = (book_num, chapter_num) not in seen_chapters
+            seen_chapters.add((book_num, chapter_num))
+            pool.submit(send, endpoint, path, cold, due)
+            sent += 1
+    elapsed = time.monotonic() - started
+
+    groups = defaultdict(list)
+    for endpoint, cold, status, latency_ms, lag_ms in results:
+        groups[(endpoint, "cold" if cold else "warm")].append((status, latency_ms))
+        groups[(endpoint, "all")].append((status, latency_ms))
+        groups[("total", "all")].append((status, latency_ms))
+
+    summary = {}
+    for (endpoint, temperature), rows in sorted(groups.items()):
+        latencies = [latency_ms for _, latency_ms in rows]
+        errors = Counter(status for status, _ in rows if status != "200")
+        summary[f"{endpoint}/{temperature}"] = {
+            "requests": len(rows),
+            "errors": dict(errors),
+            "error_rate": sum(errors.values()) / len(rows),
+            "throughput": len(rows) / elapsed,
+            "p50_ms": round(_percentile(latencies, 0.50), 1),
+            "p90_ms": round(_percentile(latencies, 0.90), 1),
+            "p99_ms": round(_percentile(latencies, 0.99), 1),
+            "max_ms": round(max(latencies), 1),
+        }
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "base_url": base_url,
+        "rate": rate,
+        "duration": duration,
+        "mix": mix,
+        "zipf": zipf,
+        "seed": seed,
+        "sent": sent,
+        "elapsed": round(elapsed, 2),
+        "chapters": len(seen_chapters),
+        # How late requests started because every worker was busy; if this grows, raise --concurrency
+        "max_start_lag_ms": round(max((lag_ms for *_, lag_ms in results), default=0.0), 1),
+        "groups": summary,
+    }
+
+
+def print_report(report):
+    """Print per-endpoint latency, throughput and errors"""
+    print(f"\n📈 {report['sent']:,} requests in {report['elapsed']:.1f}s over {report['chapters']} chapters "
+          f"({report['sent'] / report['elapsed']:.1f}/s offered)")
+    print("-" * 100)
+    print(f"{'endpoint':<16} {'requests':>9} {'req/s':>8} {'err %':>7} {'p50 ms':>9} {'p90 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}  errors")
+    print("-" * 100)
+    for name, group in report["groups"].items():
+        errors = ", ".join(f"{count} {status}" for status, count in sorted(group["errors"].items()))
+        print(f"{name:<16} {group['requests']:>9,} {group['throughput']:>8.1f} {group['error_rate'] * 100:>6.1f}% "
+              f"{group['p50_ms']:>9.1f} {group['p90_ms']:>9.1f} {group['p99_ms']:>9.1f} {group['max_ms']:>9.1f}  {errors}")
+
+    if report["max_start_lag_ms"] > 100:
+        print(f"\n⚠️  Requests started up to {report['max_start_lag_ms']:.0f}ms late because every worker was busy; "
+              "the latencies include that wait (raise --concurrency to separate it)")
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Load a saved report, or None"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(report, path=BASELINE_PATH):
+    """Save a report as the baseline future runs are compared with"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def diff_reports(baseline, report):
+    """Compare a report with the baseline. Returns a list of (group, message, is_regression)."""
+    changes = []
+    for name, group in report["groups"].items():
+        before = baseline["groups"].get(name)
+        if not before:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            ratio = group[key] / before[key] if before[key] else 1.0
+            regression = ratio >= REGRESSION_RATIO and group[key] - before[key] >= REGRESSION_MIN_MS
+            changes.append((name, f"{key[:3]} {before[key]:.1f} -> {group[key]:.1f} ms ({ratio:.2f}x)", regression))
+        if group["error_rate"] > before["error_rate"] + 0.01:
+            changes.append((name, f"errors {before['error_rate']:.1%} -> {group['error_rate']:.1%}", True))
+    return changes
+
+
+def print_diff(baseline, report):
+    """Print the comparison with the baseline"""
+    print(f"\n🔁 Compared with baseline from {baseline['created']}:")
+    if (baseline["rate"], baseline["mix"], baseline["zipf"], baseline["seed"]) != \
+            (report["rate"], report["mix"], report["zipf"], report["seed"]):
+        print("   ⚠️  The baseline used a different rate, mix, zipf or seed")
+    changes = diff_reports(baseline, report)
+    for name, message, regression in changes:
+        print(f"   {'❌' if regression else '  '} {name:<16} {message}")
+    if not any(regression for _, _, regression in changes):
+        print("✅ No regressions")
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the verse, study and verse-range endpoints")
+    parser.add_argument("--base-url", default=os.environ.get("WOL_API_URL", "http://localhost:8000"))
+    parser.add_argument("--rate", type=float, default=20.0, help="requests per second offered")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"default {DEFAULT_MIX}")
+    parser.add_argument("--zipf", type=float, default=1.1, help="exponent of the chapter distribution")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at most")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--user")
+    parser.add_argument("--password")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--save-baseline", action="store_true", help=f"save this run as {BASELINE_PATH}")
+    args = parser.parse_args()
+
+    auth = (args.user, args.password or "") if args.user else default_credentials()
+    if auth is None:
+        print("⚠️  No credentials (--user/--password, WOL_API_USER or credentials.txt); expect 401s")
+
+    try:
+        report = run(args.base_url.rstrip("/"), args.mix, args.rate, args.duration, args.zipf, args.seed,
+                     max(1, args.concurrency), auth, args.timeout)
+    except KeyboardInterrupt:
+        sys.exit(1)
+
+    print_report(report)
+    if args.json:
+        save_baseline(report, args.json)
+
+    regressions = False
+    baseline = load_baseline()
+    if args.save_baseline:
+        save_baseline(report)
+        print(f"\n💾 Saved baseline to {BASELINE_PATH}")
+    elif baseline:
+        regressions = any(regression for _, _, regression in print_diff(baseline, report))
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
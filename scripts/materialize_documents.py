@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Study Document Materializer
+Builds denormalized, ready-to-serve JSONB documents so the API can answer a
+study request from a single indexed row instead of joining verses and
+study_content at request time.
+
+verse_documents   - one row per verse, shaped exactly like the /study response
+chapter_arrays    - one row per chapter with the verse texts and study note
+                    texts as arrays, so a verse range is one row and a slice
+
+In chapter_arrays, verse_texts[n] is verse n (NULL where a verse is missing),
+note_texts holds every study note paragraph of the chapter in verse order,
+and note_offsets[n] counts the paragraphs before verse n (with the total as
+the last element), so the notes of verses a..b are
+note_texts[note_offsets[a] + 1 : note_offsets[b + 1]].
+"""
+import sys
+import psycopg2
+
+from db_connection import configure_from_argv, connect
+from study_notes_codec import ensure_study_notes_codec
+
+DOCUMENT_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS verse_documents (
+        book_num INTEGER NOT NULL,
+        chapter INTEGER NOT NULL,
+        verse_num INTEGER NOT NULL,
+        document JSONB NOT NULL,
+        refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (book_num, chapter, verse_num)
+    );
+
+    -- Per-chapter documents had no reader once ranges were served from chapter_arrays
+    DROP TABLE IF EXISTS chapter_documents;
+
+    CREATE TABLE IF NOT EXISTS chapter_arrays (
+        book_num INTEGER NOT NULL,
+        chapter INTEGER NOT NULL,
+        book_name TEXT NOT NULL,
+        verse_texts TEXT[] NOT NULL,
+        note_texts TEXT[] NOT NULL,
+        note_offsets INTEGER[] NOT NULL,
+        refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (book_num, chapter)
+    );
+"""
+
+# Same shape as the Rust StudyContent model
+STUDY_CONTENT_JSON = """
+    (SELECT jsonb_build_object(
+                'id', s.id,
+                'book_num', s.book_num,
+                'chapter', s.chapter,
+                'outline', COALESCE(to_jsonb(s.outline), '[]'::jsonb),
+                'study_articles', s.study_articles,
+                'cross_references', s.cross_references
+            )
+       FROM study_content s
+      WHERE s.book_num = v.book_num AND s.chapter = v.chapter
+      ORDER BY s.id
+      LIMIT 1)
+"""
+
+# Same shape as the Rust VerseWithStudy model
+INSERT_VERSE_DOCUMENTS_SQL = """
+    INSERT INTO verse_documents (book_num, chapter, verse_num, document)
+    SELECT v.book_num, v.chapter, v.verse_num,
+           jsonb_build_object(
+               'verse', jsonb_build_object(
+                   'book_num', v.book_num,
+                   'book_name', v.book_name,
+                   'chapter', v.chapter,
+                   'verse_num', v.verse_num,
+                   'verse_text', v.verse_text,
+                   'study_notes', expand_study_notes(v.study_notes)
+               ),
+               'study_content', {study_content}
+           )
+      FROM verses v
+     {where}
+    ON CONFLICT DO NOTHING
+"""
+
+# Upserts, so a re-scraped chapter's row is replaced in place
+UPSERT_CHAPTER_ARRAYS_SQL = """
+    WITH verse_notes AS (
+        SELECT v.book_num, v.chapter, v.verse_num, v.book_name, v.verse_text,
+               ARRAY(SELECT p.paragraph ->> 'text'
+                       FROM jsonb_array_elements(COALESCE(expand_study_notes(v.study_notes), '[]'::jsonb))
+                            WITH ORDINALITY AS n (note, ord),
+                            jsonb_array_elements(n.note -> 'content') WITH ORDINALITY AS p (paragraph, ord)
+                      ORDER BY n.ord, p.ord) AS notes
+          FROM verses v
+         {where}
+    ), slots AS (
+        -- One slot per verse number up to the chapter's last verse, so array index = verse number
+        SELECT c.book_num, c.chapter, s.verse_num, c.book_name, vn.verse_text,
+               COALESCE(vn.notes, '{{}}'::text[]) AS notes
+          FROM (SELECT book_num, chapter, min(book_name) AS book_name, max(verse_num) AS last_verse
+                  FROM verse_notes GROUP BY book_num, chapter) c
+         CROSS JOIN LATERAL generate_series(1, c.last_verse) AS s (verse_num)
+          LEFT JOIN verse_notes vn
+                 ON vn.book_num = c.book_num AND vn.chapter = c.chapter AND vn.verse_num = s.verse_num
+    ), counted AS (
+        SELECT slots.*,
+               COALESCE(sum(cardinality(notes)) OVER (PARTITION BY book_num, chapter ORDER BY verse_num
+                                                      ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0)::int
+                   AS notes_before
+          FROM slots
+    )
+    INSERT INTO chapter_arrays (book_num, chapter, book_name, verse_texts, note_texts, note_offsets, refreshed_at)
+    SELECT book_num, chapter, min(book_name),
+           array_agg(verse_text ORDER BY verse_num),
+           ARRAY(SELECT t FROM counted c2, unnest(c2.notes) WITH ORDINALITY AS u (t, ord)
+                  WHERE c2.book_num = counted.book_num AND c2.chapter = counted.chapter
+                  ORDER BY c2.verse_num, u.ord),
+           array_agg(notes_before ORDER BY verse_num) || sum(cardinality(notes))::int,
+           now()
+      FROM counted
+     GROUP BY book_num, chapter
+    ON CONFLICT (book_num, chapter) DO UPDATE
+       SET book_name = EXCLUDED.book_name, verse_texts = EXCLUDED.verse_texts, note_texts = EXCLUDED.note_texts,
+           note_offsets = EXCLUDED.note_offsets, refreshed_at = EXCLUDED.refreshed_at
+"""
+
+# The upsert can't see chapters whose verses are all gone
+DELETE_EMPTY_CHAPTER_ARRAYS_SQL = """
+    DELETE FROM chapter_arrays a
+     {where}
+       AND NOT EXISTS (SELECT 1 FROM verses v WHERE v.book_num = a.book_num AND v.chapter = a.chapter)
+"""
+
+CHAPTER_FILTER = "WHERE v.book_num = %s AND v.chapter = %s"
+CHAPTERS_FILTER = "WHERE (v.book_num, v.chapter) IN (SELECT * FROM unnest(%s::int[], %s::int[]))"
+
+
+def ensure_document_tables(cur):
+    """Create the materialized document tables (and the study notes reader they use) if they don't exist"""
+    cur.execute(DOCUMENT_TABLES_SQL)
+    ensure_study_notes_codec(cur)
+
+
+def refresh_chapter_documents(cur, book_num, chapter_num):
+    """Rebuild the verse documents and chapter arrays for a single chapter.
+
+    Runs inside the caller's transaction under a savepoint, so a failure here
+    never discards the scraped content it is being called for.
+    """
+    cur.execute("SAVEPOINT refresh_documents")
+    try:
+        params = (book_num, chapter_num)
+        cur.execute("DELETE FROM verse_documents WHERE book_num = %s AND chapter = %s", params)
+        cur.execute(INSERT_VERSE_DOCUMENTS_SQL.format(study_content=STUDY_CONTENT_JSON, where=CHAPTER_FILTER), params)
+        verse_documents = cur.rowcount
+        cur.execute(UPSERT_CHAPTER_ARRAYS_SQL.format(where=CHAPTER_FILTER), params)
+        cur.execute(DELETE_EMPTY_CHAPTER_ARRAYS_SQL.format(where="WHERE a.book_num = %s AND a.chapter = %s"), params)
+        cur.execute("RELEASE SAVEPOINT refresh_documents")
+        return verse_documents
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT refresh_documents")
+        print(f"Warning: could not refresh documents for {book_num}:{chapter_num} - {e}")
+        return 0
+
+
+def refresh_all_documents(cur):
+    """Rebuild every verse document and chapter array in one set-based pass"""
+    ensure_document_tables(cur)
+    cur.execute("DELETE FROM verse_documents")
+    cur.execute(INSERT_VERSE_DOCUMENTS_SQL.format(study_content=STUDY_CONTENT_JSON, where=""))
+    verse_documents = cur.rowcount
+    cur.execute("DELETE FROM chapter_arrays")
+    cur.execute(UPSERT_CHAPTER_ARRAYS_SQL.format(where=""))
+    return verse_documents, cur.rowcount
+
+
+def refresh_chapter_arrays(cur, chapters):
+    """Rebuild the chapter_arrays rows of (book_num, chapter) pairs in one statement, e.g. after a bulk load"""
+    chapters = sorted(set(chapters))
+    if not chapters:
+        return 0
+    params = ([b for b, _ in chapters], [c for _, c in chapters])
+    cur.execute(UPSERT_CHAPTER_ARRAYS_SQL.format(where=CHAPTERS_FILTER), params)
+    refreshed = cur.rowcount
+    cur.execute(DELETE_EMPTY_CHAPTER_ARRAYS_SQL.format(
+        where="WHERE (a.book_num, a.chapter) IN (SELECT * FROM unnest(%s::int[], %s::int[]))"), params)
+    return refreshed
+
+
+def main():
+    args = configure_from_argv()
+
+    if len(args) not in (0, 2):
+        print("Usage: python3 materialize_documents.py [--docker] [<book_num> <chapter_num>]")
+        sys.exit(1)
+
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        ensure_document_tables(cur)
+
+        if args:
+            book_num, chapter_num = int(args[0]), int(args[1])
+            print(f"🔄 Refreshing documents for book {book_num}, chapter {chapter_num}...")
+            verse_documents = refresh_chapter_documents(cur, book_num, chapter_num)
+            print(f"✅ Refreshed {verse_documents} verse documents")
+        else:
+            print("🔄 Rebuilding all study documents...")
+            verse_documents, chapter_arrays = refresh_all_documents(cur)
+            print(f"✅ Built {verse_documents:,} verse documents and {chapter_arrays:,} chapter arrays")
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error materializing documents: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
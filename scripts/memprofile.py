@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Memory Profile
+Per-stage memory accounting behind the crawl and load tools' --memprofile
+flag. For every stage it records:
+
+- traced Python memory at the start, at the end and at its peak (tracemalloc)
+- the peak RSS of the process, and of its worker processes (the crawl's
+  parser pool), sampled in the background every WOL_MEMPROFILE_INTERVAL
+  seconds (default 0.05)
+- the top allocators: source lines whose live memory grew the most across
+  the stage, from tracemalloc snapshots taken at its start and end
+
+At exit the report is printed and written to WOL_MEMPROFILE_DIR (default
+data/memprofile/) as <script>-<timestamp>.txt. A stage whose end is close to
+its peak holds on to what it built; a streaming stage peaks at about one
+batch above its start. tracemalloc slows Python down, so only the memory
+figures are meaningful in a profiled run, not the timings.
+
+    profiler = MemoryProfiler(args.memprofile)
+    with profiler.stage("crawl"):
+        ...
+    profiler.report()
+"""
+import os
+import sys
+import time
+import resource
+import threading
+import tracemalloc
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORT_DIR = os.environ.get("WOL_MEMPROFILE_DIR", "data/memprofile")
+SAMPLE_INTERVAL = float(os.environ.get("WOL_MEMPROFILE_INTERVAL", "0.05"))
+TRACE_FRAMES = int(os.environ.get("WOL_MEMPROFILE_FRAMES", "1"))
+TOP_ALLOCATORS = 10
+# Lines that grew less than this are noise (regex caches, imports)
+MIN_ALLOCATOR_BYTES = 16 * 1024
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+MIB = 1024 * 1024
+
+# Allocations made by the profiler itself and the import machinery aren't the stage's
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def rss_bytes(pid="self"):
+    """Resident set size of a process (Linux /proc), or the peak so far for this process elsewhere"""
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        if pid != "self":
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def children_rss_bytes():
+    """Combined RSS of this process's multiprocessing workers"""
+    return sum(rss_bytes(child.pid) for child in multiprocessing.active_children())
+
+
+class MemoryProfiler:
+    """Stage-by-stage memory report; every method is a no-op unless enabled"""
+
+    def __init__(self, enabled=False, top=TOP_ALLOCATORS):
+        self.enabled = enabled
+        self.top = top
+        self.stages = []
+        self._lock = threading.Lock()
+        self._peak_rss = 0
+        self._peak_children_rss = 0
+        self._stop = threading.Event()
+        if enabled:
+            tracemalloc.start(TRACE_FRAMES)
+            threading.Thread(target=self._sample, daemon=True, name="memprofile").start()
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            rss, children = rss_bytes(), children_rss_bytes()
+            with self._lock:
+                self._peak_rss = max(self._peak_rss, rss)
+                self._peak_children_rss = max(self._peak_children_rss, children)
+
+    @contextmanager
+    def stage(self, name):
+        """Profile the block as one stage"""
+        if not self.enabled:
+            yield
+            return
+
+        start_snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        tracemalloc.reset_peak()
+        traced_start = tracemalloc.get_traced_memory()[0]
+        rss_start = rss_bytes()
+        with self._lock:
+            self._peak_rss = rss_start
+            self._peak_children_rss = children_rss_bytes()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            traced_end, traced_peak = tracemalloc.get_traced_memory()
+            rss_end = rss_bytes()
+            with self._lock:
+                peak_rss = max(self._peak_rss, rss_end)
+                peak_children_rss = self._peak_children_rss
+            end_snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+            growth = [stat for stat in end_snapshot.compare_to(start_snapshot, "lineno")
+                      if stat.size_diff >= MIN_ALLOCATOR_BYTES]
+
+            self.stages.append({
+                "stage": name,
+                "seconds": elapsed,
+                "traced_start": traced_start,
+                "traced_end": traced_end,
+                "traced_peak": traced_peak,
+                "rss_start": rss_start,
+                "rss_end": rss_end,
+                "rss_peak": peak_rss,
+                "children_rss_peak": peak_children_rss,
+                "top": [(str(stat.traceback), stat.size_diff, stat.count_diff) for stat in growth[:self.top]],
+            })
+
+    def report(self, script=None):
+        """Print the report and write it to REPORT_DIR. Returns the report path, or None."""
+        if not self.enabled:
+            return None
+        self._stop.set()
+
+        lines = ["", f"🧠 Memory profile ({TRACE_FRAMES} frame{'s' if TRACE_FRAMES != 1 else ''} traced)", "-" * 104,
+                 f"{'stage':<22} {'seconds':>8} {'traced MiB':>22} {'peak':>8} {'RSS MiB':>18} {'peak':>8} "
+                 f"{'workers':>8}",
+                 f"{'':<22} {'':>8} {'start -> end':>22} {'':>8} {'start -> end':>18} {'':>8} {'peak':>8}",
+                 "-" * 104]
+        for stage in self.stages:
+            lines.append(
+                f"{stage['stage']:<22} {stage['seconds']:>8.1f} "
+                f"{stage['traced_start'] / MIB:>10.1f} -> {stage['traced_end'] / MIB:>8.1f} {stage['traced_peak'] / MIB:>8.1f} "
+                f"{stage['rss_start'] / MIB:>7.1f} -> {stage['rss_end'] / MIB:>7.1f} {stage['rss_peak'] / MIB:>8.1f} "
+                f"{stage['children_rss_peak'] / MIB:>8.1f}")
+
+        for stage in self.stages:
+            if not stage["top"]:
+                continue
+            lines.append(f"\n📌 Top allocators still holding memory after '{stage['stage']}':")
+            for location, size_diff, count_diff in stage["top"]:
+                lines.append(f"   {size_diff / MIB:>9.2f} MiB {count_diff:>+10,} blocks  {location}")
+
+        text = "\n".join(lines)
+        print(text)
+
+        script = script or os.path.splitext(os.path.basename(sys.argv[0] if sys.argv else ""))[0] or "script"
+        path = os.path.join(REPORT_DIR, f"{script}-{datetime.now():%Y%m%d-%H%M%S}.txt")
+        try:
+            os.makedirs(REPORT_DIR, exist_ok=True)
+            with open(path, "w") as f:
+                f.write(text.lstrip("\n") + "\n")
+        except OSError as e:
+            print(f"⚠️  Could not write the memory profile: {e}")
+            return None
+        print(f"\n💾 Memory profile written to {path}")
+        return path
+
+
+def memprofile_from_argv(argv=None):
+    """Handle a --memprofile flag for scripts that don't use argparse. Returns (profiler, remaining arguments)."""
+    argv = sys.argv[1:] if argv is None else argv
+    return MemoryProfiler("--memprofile" in argv), [arg for arg in argv if arg != "--memprofile"]
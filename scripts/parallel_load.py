@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Parallel Load
+Reloads verses from the corpus files over several pooled connections at once.
+The chapters missing from the database (by the verse manifest) are split into
+partitions, one per book or one per language, and each partition is loaded
+and committed on its own connection. A full recovery then uses the available
+cores, and a failure only costs its own partition.
+
+    load [--docker] [--workers N] [--by book|language] [--languages en,es] [--books 19,43]
+    retry [--docker] [--workers N]      reload only the partitions that failed last time
+
+A failing partition is retried PARTITION_RETRIES times, then recorded in
+data/parallel_load_failed.json for `retry`. Loads only insert verses that
+aren't stored yet, so rerunning a partition is always safe. Afterwards the
+reference indexes (unique book, chapter, verse) are built with CREATE INDEX
+CONCURRENTLY, several at a time: the load doesn't maintain them row by row,
+and readers aren't blocked while they build. auto_setup_db.py loads through
+this module; WOL_LOAD_WORKERS sets its worker count.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import psycopg2
+from psycopg2 import errors, sql
+
+from db_connection import advisory_lock, connect, ensure_pool_size, pooled_connection, use_docker_host
+from db_snapshot import RESTORE_LOCK
+from language_partitions import PARTITION_INDEXES, ensure_language_partition, partition_name
+from verse_data import BOOK_NAMES, find_verses_file, iter_verse_records
+from verse_manifest import find_gaps, finish_reload, insert_missing_verses, load_manifest
+from wol_languages import DEFAULT_LANGUAGE, LANGUAGES
+
+LOAD_WORKERS = int(os.environ.get("WOL_LOAD_WORKERS", str(min(8, os.cpu_count() or 1))))
+PARTITION_RETRIES = 2
+RETRY_BACKOFF = 2.0
+FAILED_PATH = os.environ.get("WOL_LOAD_FAILED_FILE", "data/parallel_load_failed.json")
+
+
+def languages_with_files():
+    """Every language that has a verses file to load from"""
+    return [language for language in LANGUAGES if find_verses_file(language)]
+
+
+def partition_label(key):
+    language, book_num = key
+    return f"{BOOK_NAMES.get(book_num, f'Book {book_num}')} ({language})" if book_num else LANGUAGES[language]["name"]
+
+
+def plan_partitions(languages, by="book", books=None):
+    """Missing chapters grouped into partitions: {(language, book_num or None): [(book_num, chapter), ...]}"""
+    partitions = {}
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        for language in languages:
+            verses_path = find_verses_file(language)
+            if not verses_path:
+                print(f"⚠️  No verses file for {language}; skipping")
+                continue
+            # New partitions get their indexes after the load
+            verses_table = partition_name("verses", language) if language == DEFAULT_LANGUAGE else \
+                ensure_language_partition(cur, language, indexes=False)[0]
+            for book_num, chapter_num, _, _ in find_gaps(cur, load_manifest(verses_path), verses_table):
+                if books and book_num not in books:
+                    continue
+                key = (language, book_num if by == "book" else None)
+                partitions.setdefault(key, []).append((book_num, chapter_num))
+        cur.close()
+    return partitions
+
+
+def partition_records(partitions):
+    """The corpus records of every partition's chapters, reading each language's file once"""
+    records = {key: [] for key in partitions}
+    for language in {language for language, _ in partitions}:
+        owner = {chapter: key for key, chapters in partitions.items() if key[0] == language for chapter in chapters}
+        for record in iter_verse_records(find_verses_file(language)):
+            key = owner.get((record[0], record[2]))
+            if key:
+                records[key].append(record)
+    return records
+
+
+def load_partition(verses_table, records):
+    """Insert one partition's missing verses in its own transaction. Returns the number inserted."""
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            return insert_missing_verses(cur, records, verses_table)
+
+
+def _load_with_retries(key, records):
+    verses_table = partition_name("verses", key[0])
+    for attempt in range(PARTITION_RETRIES + 1):
+        try:
+            return load_partition(verses_table, records)
+        except psycopg2.Error as e:
+            if attempt == PARTITION_RETRIES:
+                raise
+            wait = RETRY_BACKOFF * 2 ** attempt
+            print(f"⚠️  {partition_label(key)} failed ({str(e).strip()}); retrying in {wait:.0f}s")
+            time.sleep(wait)
+
+
+def build_index(table, columns):
+    """CREATE UNIQUE INDEX CONCURRENTLY <table>_reference, replacing an invalid leftover. Returns the outcome."""
+    name = f"{table}_reference"
+    conn = connect()
+    # CONCURRENTLY can't run inside a transaction block
+    conn.autocommit = True
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+        if not cur.fetchone()[0]:
+            return "no table"
+        cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,))
+        row = cur.fetchone()
+        if row and row[0]:
+            return "exists"
+        if row:
+            # A CONCURRENTLY build that failed leaves an invalid index behind
+            cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name)))
+        try:
+            cur.execute(sql.SQL("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} " + columns)
+                        .format(sql.Identifier(name), sql.Identifier(table)))
+        except errors.UniqueViolation:
+            cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name)))
+            return "duplicate rows, not built"
+        return "built"
+    finally:
+        conn.close()
+
+
+def build_reference_indexes(languages, workers=LOAD_WORKERS):
+    """Build the reference indexes of the languages' tables concurrently. Returns {table: outcome}."""
+    tables = [(partition_name("verses", language), PARTITION_INDEXES["verses"]) for language in languages]
+    # English study_content predates the partitions and has never carried a unique index
+    tables += [(partition_name("study_content", language), PARTITION_INDEXES["study_content"])
+               for language in languages if language != DEFAULT_LANGUAGE]
+
+    outcomes = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tables)))) as executor:
+        futures = {executor.submit(build_index, table, columns): table for table, columns in tables}
+        for future in as_completed(futures):
+            try:
+                outcomes[futures[future]] = future.result()
+            except psycopg2.Error as e:
+                outcomes[futures[future]] = f"failed: {str(e).strip()}"
+    return outcomes
+
+
+def save_failed(by, failed):
+    """Record failed partitions for `retry`, or clear the record when nothing failed"""
+    if not failed:
+        if os.path.exists(FAILED_PATH):
+            os.remove(FAILED_PATH)
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(FAILED_PATH)), exist_ok=True)
+    with open(FAILED_PATH, "w") as f:
+        json.dump({"by": by, "partitions": [{"language": language, "book": book_num} for language, book_num in failed]},
+                  f, indent=2)
+
+
+def load_failed():
+    """(by, [partition keys]) recorded by the last load, or (None, [])"""
+    try:
+        with open(FAILED_PATH, "r") as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None, []
+    return record["by"], [(partition["language"], partition["book"]) for partition in record["partitions"]]
+
+
+def load_verses(languages, by="book", workers=LOAD_WORKERS, books=None, only=None):
+    """Load the missing verses of `languages` in parallel partitions, then build the reference indexes.
+
+    `only` restricts the load to those partition keys (for retries). Returns a
+    dict with the partitions loaded, verses inserted, failed partition keys
+    and index outcomes.
+    """
+    workers = max(1, workers)
+    ensure_pool_size(workers)
+
+    partitions = plan_partitions(languages, by, books)
+    if only is not None:
+        partitions = {key: chapters for key, chapters in partitions.items() if key in set(only)}
+
+    inserted, loaded, failed = 0, [], []
+    if partitions:
+        records = partition_records(partitions)
+        chapters = sum(len(chapters) for chapters in partitions.values())
+        print(f"📦 Loading {chapters:,} chapters in {len(partitions)} partitions over {workers} connections...")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_load_with_retries, key, records[key]): key for key in partitions}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    count = future.result()
+                except Exception as e:
+                    failed.append(key)
+                    print(f"❌ {partition_label(key)} failed: {str(e).strip()}")
+                    continue
+                inserted += count
+                loaded.append(key)
+                print(f"   {len(loaded) + len(failed)}/{len(partitions)} {partition_label(key)}: {count:,} verses")
+
+        # Documents, re-scrape queueing and ANALYZE once per language, for the partitions that made it
+        for language in sorted({language for language, _ in loaded}):
+            language_chapters = [chapter for key in loaded if key[0] == language for chapter in partitions[key]]
+            with pooled_connection() as conn:
+                with conn.cursor() as cur:
+                    verses_table, study_table = partition_name("verses", language), partition_name("study_content", language)
+                    finish_reload(cur, language, language_chapters, verses_table, study_table)
+
+    save_failed(by, failed)
+    indexes = build_reference_indexes(languages, workers)
+    return {"partitions": len(loaded), "inserted": inserted, "failed": failed, "indexes": indexes}
+
+
+def print_result(result):
+    for table, outcome in sorted(result["indexes"].items()):
+        print(f"   🗂️  {table}_reference: {outcome}")
+    print(f"{'⚠️ ' if result['failed'] else '✅'} Loaded {result['inserted']:,} verses in {result['partitions']} partitions"
+          + (f"; {len(result['failed'])} failed (rerun with: parallel_load.py retry)" if result["failed"] else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load missing verses over several connections at once")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    load_parser = subcommands.add_parser("load", help="load every missing chapter")
+    load_parser.add_argument("--by", choices=["book", "language"], default="book", help="partition by book or language")
+    load_parser.add_argument("--languages", help="comma-separated language codes (default: every language with a verses file)")
+    load_parser.add_argument("--books", help="comma-separated book numbers (default: all)")
+    retry_parser = subcommands.add_parser("retry", help=f"reload the partitions recorded in {FAILED_PATH}")
+    for subparser in (load_parser, retry_parser):
+        subparser.add_argument("--docker", action="store_true", help="connect to the 'db' host instead of localhost")
+        subparser.add_argument("--workers", type=int, default=LOAD_WORKERS, help="partitions loaded at once")
+    args = parser.parse_args()
+
+    if args.docker:
+        use_docker_host()
+
+    if args.command == "retry":
+        by, only = load_failed()
+        if not only:
+            print("✅ No failed partitions to retry")
+            return
+        languages, books = sorted({language for language, _ in only}), None
+    else:
+        by, only = args.by, None
+        languages = ([language.strip() for language in args.languages.split(",") if language.strip()]
+                     if args.languages else languages_with_files())
+        unknown = [language for language in languages if language not in LANGUAGES]
+        if unknown:
+            print(f"❌ Unknown languages: {', '.join(unknown)}")
+            sys.exit(1)
+        books = {int(book) for book in args.books.split(",")} if args.books else None
+
+    try:
+        with advisory_lock(RESTORE_LOCK) as acquired:
+            if not acquired:
+                print("⏳ Another restore is in progress; try again later")
+                sys.exit(1)
+            result = load_verses(languages, by, args.workers, books, only)
+    except Exception as e:
+        print(f"❌ Error loading verses: {e}")
+        sys.exit(1)
+
+    print_result(result)
+    sys.exit(1 if result["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,12 @@
 import requests
 from bs4 import BeautifulSoup
 import json
-import psycopg2
 from psycopg2.extras import Json
 import sys
 import os
+from change_feed import notify_change
+from db_connection import connect
+from fetch_controller import polite_get
 
 # Embedded StudyContentExtractor class
 class StudyContentExtractor:
@@ -17,7 +19,7 @@ class StudyContentExtractor:
         url = f"https://wol.jw.org/en/wol/b/r1/lp-e/nwtsty/{book_num}/{chapter_num}#study=discover"
         
         try:
-            response = self.session.get(url)
+            response = polite_get(self.session, url)
             if response.status_code != 200:
                 return None
             
@@ -127,13 +129,7 @@ class StudyContentExtractor:
 
 def populate_study_content():
     # Database connection
-    conn = psycopg2.connect(
-        host="localhost",
-        port=5432,
-        database="wol-api",
-        user="postgres",
-        password="postgres"
-    )
+    conn = connect()
     cur = conn.cursor()
     
     extractor = StudyContentExtractor()
@@ -155,6 +151,7 @@ def populate_study_content():
             Json(study_data['study_articles']),
             Json(study_data['cross_references'])
         ))
+        notify_change(cur, "study", 1, 1)
         
         conn.commit()
         print(f"Successfully inserted study content for Genesis 1")
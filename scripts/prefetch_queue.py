@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Prefetch Queue
+A small Postgres-backed queue of chapters to scrape in the background.
+
+Readers move through chapters in order, so when an on-demand scrape handles a
+cache miss it enqueues the neighbouring chapters (N+1, N-1, ... up to
+WOL_PREFETCH_DEPTH). scrape_worker.py drains the queue at a low, separate rate
+so the next page a sequential reader asks for is already stored.
+
+Lower priority values are scraped first. Forward neighbours rank ahead of
+backward ones at the same distance, since readers mostly move forward.
+Entries flagged `refresh` re-scrape a chapter that is already stored (see
+refresh_daemon.py); all others are dropped once the chapter exists.
+"""
+import os
+import sys
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from db_connection import configure_from_argv, connect
+from verse_data import adjacent_chapter
+from wol_languages import DEFAULT_LANGUAGE, DEFAULT_EDITION
+
+PREFETCH_DEPTH = int(os.environ.get("WOL_PREFETCH_DEPTH", "2"))
+
+# Priorities above this are only ever background work (on-demand scrapes never queue)
+PREFETCH_PRIORITY_BASE = 100
+
+SCRAPE_QUEUE_SQL = """
+    CREATE TABLE IF NOT EXISTS scrape_queue (
+        book_num INTEGER NOT NULL,
+        chapter INTEGER NOT NULL,
+        language TEXT NOT NULL DEFAULT 'en',
+        edition TEXT NOT NULL DEFAULT 'nwtsty',
+        priority INTEGER NOT NULL DEFAULT 100,
+        reason TEXT,
+        refresh BOOLEAN NOT NULL DEFAULT false,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        enqueued_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        not_before TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (book_num, chapter, language)
+    );
+
+    CREATE INDEX IF NOT EXISTS scrape_queue_next ON scrape_queue (priority, enqueued_at);
+"""
+
+
+# Claimed entries are hidden for this long; if the worker dies mid-scrape they become due again
+CLAIM_LEASE_SECONDS = 10 * 60
+
+
+def ensure_scrape_queue(cur):
+    """Create the scrape queue table if it doesn't exist"""
+    cur.execute(SCRAPE_QUEUE_SQL)
+    cur.execute("SELECT 1 FROM information_schema.columns WHERE table_name = 'scrape_queue' AND column_name = 'refresh'")
+    if not cur.fetchone():
+        cur.execute("ALTER TABLE scrape_queue ADD COLUMN refresh BOOLEAN NOT NULL DEFAULT false")
+
+
+def neighbor_chapters(book_num, chapter_num, depth=PREFETCH_DEPTH):
+    """Yield (book_num, chapter, priority) for the chapters around a chapter, nearest first"""
+    for distance in range(1, depth + 1):
+        for step, rank in ((distance, 0), (-distance, 1)):
+            neighbor = adjacent_chapter(book_num, chapter_num, step)
+            if neighbor:
+                yield neighbor[0], neighbor[1], PREFETCH_PRIORITY_BASE + distance * 2 + rank
+
+
+def enqueue_chapters(cur, chapters, language=DEFAULT_LANGUAGE, edition=DEFAULT_EDITION,
+                     study_table="study_content", reason=None, refresh=False):
+    """Queue (book_num, chapter, priority) tuples, skipping chapters that are already stored.
+
+    With refresh, stored chapters are queued too and re-scraped when claimed.
+    A chapter that is already queued keeps its place, or moves up if the new
+    priority is more urgent. Runs under a savepoint so a missing queue table
+    never fails the caller's transaction. Returns the number of rows queued.
+    """
+    chapters = list(chapters)
+    if not chapters:
+        return 0
+
+    cur.execute("SAVEPOINT enqueue_chapters")
+    try:
+        query = sql.SQL("""
+            INSERT INTO scrape_queue (book_num, chapter, priority, language, edition, reason, refresh)
+            SELECT c.book_num, c.chapter, c.priority, c.language, c.edition, c.reason, c.refresh
+              FROM (VALUES %s) AS c (book_num, chapter, priority, language, edition, reason, refresh)
+             WHERE c.refresh OR NOT EXISTS (
+                   SELECT 1 FROM {} s WHERE s.book_num = c.book_num AND s.chapter = c.chapter
+             )
+            ON CONFLICT (book_num, chapter, language)
+            DO UPDATE SET priority = LEAST(scrape_queue.priority, EXCLUDED.priority),
+                          refresh = scrape_queue.refresh OR EXCLUDED.refresh
+        """).format(sql.Identifier(study_table)).as_string(cur)
+        execute_values(cur, query, [(book_num, chapter_num, priority, language, edition, reason, refresh)
+                                    for book_num, chapter_num, priority in chapters])
+        queued = cur.rowcount
+        cur.execute("RELEASE SAVEPOINT enqueue_chapters")
+        return queued
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT enqueue_chapters")
+        print(f"Warning: could not queue prefetches - {e}")
+        return 0
+
+
+def enqueue_neighbors(cur, book_num, chapter_num, language=DEFAULT_LANGUAGE, edition=DEFAULT_EDITION,
+                      study_table="study_content", depth=PREFETCH_DEPTH):
+    """Queue background scrapes of the chapters around one that was just scraped on demand"""
+    if depth <= 0:
+        return 0
+    return enqueue_chapters(cur, neighbor_chapters(book_num, chapter_num, depth), language, edition,
+                            study_table, reason=f"neighbor of {book_num}:{chapter_num}")
+
+
+def claim_next(cur, lease_seconds=CLAIM_LEASE_SECONDS):
+    """Lease the most urgent due queue entry, skipping rows other workers are claiming.
+
+    Returns (book_num, chapter, language, edition, refresh, attempts) or None.
+    Commit right after claiming: the lease (not a held row lock) keeps other
+    workers off the entry, so no transaction stays open during the scrape.
+    """
+    cur.execute("""
+        UPDATE scrape_queue q
+           SET not_before = now() + make_interval(secs => %s)
+          FROM (SELECT book_num, chapter, language
+                  FROM scrape_queue
+                 WHERE not_before <= now()
+                 ORDER BY priority, enqueued_at
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED) next
+         WHERE q.book_num = next.book_num AND q.chapter = next.chapter AND q.language = next.language
+     RETURNING q.book_num, q.chapter, q.language, q.edition, q.refresh, q.attempts
+    """, (lease_seconds,))
+    return cur.fetchone()
+
+
+def complete(cur, book_num, chapter_num, language):
+    """Remove a finished entry from the queue"""
+    cur.execute("DELETE FROM scrape_queue WHERE book_num = %s AND chapter = %s AND language = %s",
+                (book_num, chapter_num, language))
+
+
+def retry_later(cur, book_num, chapter_num, language, delay_seconds):
+    """Push a failed entry back and count the attempt"""
+    cur.execute("""
+        UPDATE scrape_queue
+           SET attempts = attempts + 1,
+               not_before = now() + make_interval(secs => %s)
+         WHERE book_num = %s AND chapter = %s AND language = %s
+    """, (delay_seconds, book_num, chapter_num, language))
+
+
+def main():
+    args = configure_from_argv()
+
+    if len(args) not in (0, 2, 3):
+        print("Usage: python3 prefetch_queue.py [--docker] [<book_num> <chapter_num> [<depth>]]")
+        sys.exit(1)
+
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        ensure_scrape_queue(cur)
+
+        if args:
+            book_num, chapter_num = int(args[0]), int(args[1])
+            depth = int(args[2]) if len(args) > 2 else PREFETCH_DEPTH
+            queued = enqueue_neighbors(cur, book_num, chapter_num, depth=depth)
+            print(f"✅ Queued {queued} chapters around book {book_num}, chapter {chapter_num}")
+
+        cur.execute("""
+            SELECT language, count(*), count(*) FILTER (WHERE attempts > 0)
+              FROM scrape_queue GROUP BY language ORDER BY language
+        """)
+        rows = cur.fetchall()
+        if not rows:
+            print("📭 Scrape queue is empty")
+        for language, pending, retrying in rows:
+            print(f"📬 {language}: {pending} queued ({retrying} retrying)")
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error managing scrape queue: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Query Profiler
+Runs the API's query shapes with EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
+across a sample of references, summarizes the plans (timings, sequential
+scans, shared buffer hits vs reads, slowest plans) and diffs them against a
+saved baseline.
+
+Used by db_manager.py (menu option or --profile). Everything runs in one
+transaction that is rolled back, so the study-notes UPDATE shape never
+changes data.
+"""
+import os
+import json
+from datetime import datetime
+
+BASELINE_PATH = os.environ.get("WOL_PROFILE_BASELINE", "data/query_profile_baseline.json")
+
+# The statements the API and the scrapers run on every request, keyed by name
+QUERY_SHAPES = {
+    "verse": (
+        "SELECT * FROM verses WHERE book_num = %s AND chapter = %s AND verse_num = %s",
+        lambda book, chapter, verse: (book, chapter, verse),
+    ),
+    "verse_document": (
+        "SELECT document FROM verse_documents WHERE book_num = %s AND chapter = %s AND verse_num = %s",
+        lambda book, chapter, verse: (book, chapter, verse),
+    ),
+    "verse_range": (
+        "SELECT * FROM verses WHERE book_num = %s AND chapter = %s AND verse_num >= %s AND verse_num <= %s "
+        "ORDER BY verse_num",
+        lambda book, chapter, verse: (book, chapter, verse, verse + 4),
+    ),
+    "verse_range_array": (
+        "SELECT book_name, array_to_string(verse_texts[%s:%s], ' '), "
+        "note_texts[note_offsets[%s] + 1 : note_offsets[%s + 1]] "
+        "FROM chapter_arrays WHERE book_num = %s AND chapter = %s",
+        lambda book, chapter, verse: (verse, verse + 4, verse, verse + 4, book, chapter),
+    ),
+    "study_content": (
+        "SELECT * FROM study_content WHERE book_num = %s AND chapter = %s",
+        lambda book, chapter, verse: (book, chapter),
+    ),
+    "study_notes_update": (
+        "UPDATE verses SET study_notes = study_notes WHERE book_num = %s AND chapter = %s AND verse_num = %s",
+        lambda book, chapter, verse: (book, chapter, verse),
+    ),
+}
+
+# A change is only reported as a regression when it is both relatively and absolutely large
+REGRESSION_RATIO = 1.25
+REGRESSION_MIN_MS = 0.1
+
+
+def sample_references(cur, count):
+    """A deterministic sample of (book, chapter, verse), so runs are comparable with the baseline"""
+    cur.execute("""
+        SELECT book_num, chapter, verse_num
+          FROM verses
+         ORDER BY md5(book_num || ':' || chapter || ':' || verse_num)
+         LIMIT %s
+    """, (count,))
+    return cur.fetchall()
+
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def explain(cur, query, params):
+    """EXPLAIN ANALYZE one statement and return the facts the summary needs"""
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+    result = cur.fetchone()[0]
+    if isinstance(result, str):
+        result = json.loads(result)
+    plan = result[0]
+    root = plan["Plan"]
+    nodes = list(_walk(root))
+
+    return {
+        "execution_ms": plan["Execution Time"],
+        "planning_ms": plan["Planning Time"],
+        # The root node's buffer counts include every child
+        "shared_hit": root.get("Shared Hit Blocks", 0),
+        "shared_read": root.get("Shared Read Blocks", 0),
+        "seq_scans": sorted({n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan"}),
+        "indexes": sorted({n["Index Name"] for n in nodes if "Index Name" in n}),
+        "plan": " -> ".join(n["Node Type"] for n in nodes),
+    }
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def profile(conn, samples=50):
+    """Profile every query shape over `samples` references. Returns the report dict."""
+    cur = conn.cursor()
+    references = sample_references(cur, samples)
+    shapes = {}
+    runs = []
+
+    try:
+        for name, (query, make_params) in QUERY_SHAPES.items():
+            cur.execute("SAVEPOINT profile_shape")
+            try:
+                shape_runs = []
+                for reference in references:
+                    run = explain(cur, query, make_params(*reference))
+                    run["reference"] = "%d:%d:%d" % reference
+                    shape_runs.append(run)
+                cur.execute("RELEASE SAVEPOINT profile_shape")
+            except Exception as e:
+                # e.g. verse_documents not built yet; report it and keep profiling the rest
+                cur.execute("ROLLBACK TO SAVEPOINT profile_shape")
+                shapes[name] = {"error": str(e).strip()}
+                continue
+
+            if not shape_runs:
+                continue
+            timings = [run["execution_ms"] for run in shape_runs]
+            hits = sum(run["shared_hit"] for run in shape_runs)
+            reads = sum(run["shared_read"] for run in shape_runs)
+            shapes[name] = {
+                "runs": len(shape_runs),
+                "mean_ms": sum(timings) / len(timings),
+                "p95_ms": _percentile(timings, 0.95),
+                "max_ms": max(timings),
+                "planning_ms": sum(run["planning_ms"] for run in shape_runs) / len(shape_runs),
+                "shared_hit": hits,
+                "shared_read": reads,
+                "hit_ratio": hits / (hits + reads) if hits + reads else 1.0,
+                "seq_scans": sorted({rel for run in shape_runs for rel in run["seq_scans"]}),
+                "indexes": sorted({idx for run in shape_runs for idx in run["indexes"]}),
+                "plan": max(shape_runs, key=lambda run: run["execution_ms"])["plan"],
+            }
+            runs.extend(dict(run, shape=name) for run in shape_runs)
+    finally:
+        conn.rollback()
+        cur.close()
+
+    slowest = sorted(runs, key=lambda run: run["execution_ms"], reverse=True)[:5]
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "samples": len(references),
+        "shapes": shapes,
+        "slowest": [{key: run[key] for key in ("shape", "reference", "execution_ms", "plan")} for run in slowest],
+    }
+
+
+def print_report(report):
+    """Print the per-shape summary, sequential scans and slowest plans"""
+    print(f"\n📈 Query profile over {report['samples']} sample references")
+    print("-" * 96)
+    print(f"{'shape':<20} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9} {'plan ms':>9} "
+          f"{'hits':>9} {'reads':>9} {'hit %':>7}")
+    print("-" * 96)
+    for name, shape in report["shapes"].items():
+        if "error" in shape:
+            print(f"{name:<20} ❌ {shape['error'].splitlines()[0]}")
+            continue
+        print(f"{name:<20} {shape['mean_ms']:>9.3f} {shape['p95_ms']:>9.3f} {shape['max_ms']:>9.3f} "
+              f"{shape['planning_ms']:>9.3f} {shape['shared_hit']:>9,} {shape['shared_read']:>9,} "
+              f"{shape['hit_ratio'] * 100:>6.1f}%")
+
+    seq_scans = {name: shape["seq_scans"] for name, shape in report["shapes"].items() if shape.get("seq_scans")}
+    if seq_scans:
+        print("\n⚠️  Sequential scans:")
+        for name, relations in seq_scans.items():
+            print(f"   {name}: {', '.join(relations)}")
+    else:
+        print("\n✅ No sequential scans")
+
+    if report["slowest"]:
+        print("\n🐢 Slowest plans:")
+        for run in report["slowest"]:
+            print(f"   {run['execution_ms']:>9.3f} ms  {run['shape']:<20} {run['reference']:<10} {run['plan']}")
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Load a saved profile, or None"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(report, path=BASELINE_PATH):
+    """Save a profile as the baseline future runs are compared with"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def diff_reports(baseline, report):
+    """Compare a profile with the baseline. Returns a list of (shape, message, is_regression)."""
+    changes = []
+    for name, shape in report["shapes"].items():
+        before = baseline["shapes"].get(name)
+        if not before or "error" in before or "error" in shape:
+            continue
+
+        ratio = shape["mean_ms"] / before["mean_ms"] if before["mean_ms"] else 1.0
+        delta_ms = shape["mean_ms"] - before["mean_ms"]
+        regression = ratio >= REGRESSION_RATIO and delta_ms >= REGRESSION_MIN_MS
+        changes.append((name, f"mean {before['mean_ms']:.3f} -> {shape['mean_ms']:.3f} ms ({ratio:.2f}x)", regression))
+
+        new_scans = sorted(set(shape["seq_scans"]) - set(before["seq_scans"]))
+        if new_scans:
+            changes.append((name, f"new sequential scan on {', '.join(new_scans)}", True))
+        lost_indexes = sorted(set(before["indexes"]) - set(shape["indexes"]))
+        if lost_indexes:
+            changes.append((name, f"no longer uses {', '.join(lost_indexes)}", True))
+        if shape["shared_read"] > before["shared_read"] * REGRESSION_RATIO and shape["shared_read"] - before["shared_read"] > 100:
+            changes.append((name, f"disk reads {before['shared_read']:,} -> {shape['shared_read']:,} blocks", False))
+    return changes
+
+
+def print_diff(baseline, report):
+    """Print the comparison with the baseline"""
+    print(f"\n🔁 Compared with baseline from {baseline['created']}:")
+    changes = diff_reports(baseline, report)
+    for name, message, regression in changes:
+        print(f"   {'❌' if regression else '  '} {name:<20} {message}")
+    if not any(regression for _, _, regression in changes):
+        print("✅ No regressions")
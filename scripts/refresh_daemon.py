@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Refresh Daemon
+Stale-while-revalidate for study content. The API always answers from the
+stored copy; this daemon finds chapters whose study content is older than
+WOL_REFRESH_TTL_DAYS (or was written by an older scraper version) and queues
+them for the scrape worker to re-scrape in the background.
+
+Each cycle tops the queue up to at most WOL_REFRESH_BATCH pending refreshes,
+most popular chapters first, so revalidation never crowds out prefetches and
+stays within the worker's request budget. This runs as a background process
+in the backend container; `--once` runs a single cycle and exits.
+"""
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import groupby
+
+from db_connection import connect, use_docker_host
+from chapter_popularity import CURRENT_SCORE_SQL, ensure_chapter_access
+from prefetch_queue import enqueue_chapters, ensure_scrape_queue
+from language_partitions import partition_name
+from scrape_metadata import SCRAPER_VERSION, ensure_scrape_metadata
+
+REFRESH_TTL_DAYS = float(os.environ.get("WOL_REFRESH_TTL_DAYS", "30"))
+REFRESH_BATCH = int(os.environ.get("WOL_REFRESH_BATCH", "20"))
+CHECK_INTERVAL = 15 * 60
+
+# Refreshes rank behind prefetches (100+) and popularity warming (1000+)
+REFRESH_PRIORITY_BASE = 5000
+
+# Popularity is only tracked for English, which is what the API serves
+STALE_CHAPTERS_SQL = f"""
+    SELECT s.language, s.book_num, s.chapter
+      FROM study_content_by_language s
+      LEFT JOIN chapter_access a
+        ON s.language = 'en' AND a.book_num = s.book_num AND a.chapter = s.chapter
+     WHERE (s.scraped_at IS NULL
+            OR s.scraped_at < now() - make_interval(secs => %s)
+            OR s.scraper_version IS DISTINCT FROM %s)
+       AND NOT EXISTS (
+           SELECT 1 FROM scrape_queue q
+            WHERE q.book_num = s.book_num AND q.chapter = s.chapter AND q.language = s.language
+       )
+     ORDER BY COALESCE({CURRENT_SCORE_SQL}, 0) DESC, s.scraped_at NULLS FIRST
+     LIMIT %s
+"""
+
+
+def log(message):
+    """Log with timestamp"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+
+def queue_stale_chapters(cur, ttl_days=REFRESH_TTL_DAYS, batch=REFRESH_BATCH):
+    """Queue the most popular stale chapters, up to `batch` pending refreshes. Returns the number queued."""
+    cur.execute("SELECT count(*) FROM scrape_queue WHERE refresh")
+    room = batch - cur.fetchone()[0]
+    if room <= 0:
+        return 0
+
+    cur.execute(STALE_CHAPTERS_SQL, (ttl_days * 86400, SCRAPER_VERSION, room))
+    stale = cur.fetchall()
+
+    # Priorities follow the popularity order across languages
+    ranked = [(language, book_num, chapter, REFRESH_PRIORITY_BASE + rank)
+              for rank, (language, book_num, chapter) in enumerate(stale)]
+
+    queued = 0
+    for language, chapters in groupby(sorted(ranked), key=lambda row: row[0]):
+        queued += enqueue_chapters(
+            cur,
+            ((book_num, chapter, priority) for _, book_num, chapter, priority in chapters),
+            language=language,
+            study_table=partition_name("study_content", language),
+            reason="stale",
+            refresh=True
+        )
+    return queued
+
+
+def main():
+    """Main refresh loop"""
+    once = "--once" in sys.argv
+    if "--local" not in sys.argv:
+        use_docker_host()
+    log(f"♻️  Starting refresh daemon (TTL {REFRESH_TTL_DAYS:g} days, {REFRESH_BATCH} chapters per cycle)...")
+
+    schema_ready = False
+
+    while True:
+        try:
+            conn = connect()
+            cur = conn.cursor()
+
+            # Once per process: the DDL takes exclusive locks the API would queue behind
+            if not schema_ready:
+                ensure_scrape_queue(cur)
+                ensure_chapter_access(cur)
+                ensure_scrape_metadata(cur)
+                conn.commit()
+                schema_ready = True
+
+            queued = queue_stale_chapters(cur)
+            conn.commit()
+            cur.close()
+            conn.close()
+
+            if queued:
+                log(f"♻️  Queued {queued} stale chapters for refresh")
+            if once:
+                break
+            time.sleep(CHECK_INTERVAL)
+
+        except KeyboardInterrupt:
+            log("👋 Refresh daemon stopped by user")
+            break
+        except Exception as e:
+            log(f"❌ Unexpected error in refresh daemon: {e}")
+            if once:
+                sys.exit(1)
+            time.sleep(CHECK_INTERVAL)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ from bs4 import BeautifulSoup
 import json
 import re
 from tqdm import tqdm
+from fetch_controller import polite_get
 
 class StudyContentExtractor:
     def __init__(self):
@@ -14,7 +15,7 @@ class StudyContentExtractor:
         url = f"https://wol.jw.org/en/wol/b/r1/lp-e/nwtsty/{book_num}/{chapter_num}#study=discover"
         
         try:
-            response = self.session.get(url)
+            response = polite_get(self.session, url)
             if response.status_code != 200:
                 return None
             
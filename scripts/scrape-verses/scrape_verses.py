@@ -1,96 +1,329 @@
-import re
+import os
+import sys
 import json
+import queue
+import argparse
+import threading
 import requests
 
 from tqdm import tqdm
-from bs4 import BeautifulSoup
 from requests import Session
-from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, zip_longest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from change_feed import notify_changes
+from db_connection import connect, use_docker_host
+from fetch_controller import CircuitOpenError, default_controller, polite_get
+from language_partitions import ensure_language_partition
+from materialize_documents import ensure_document_tables, refresh_chapter_arrays
+from memprofile import MemoryProfiler
+from verse_data import BOOK_NAMES, verses_file_name
+from verse_cleaner import extract_chapter_verses
+from verse_manifest import insert_missing_verses
+from wol_languages import DEFAULT_LANGUAGE, DEFAULT_EDITION, LANGUAGES, chapter_url, get_language, pub_media_url
 
 
 def main():
-    extractor = BibleExtractor()
+    parser = argparse.ArgumentParser(description="Scrape Bible verse text into verses.json (one file per language)")
+    parser.add_argument("--languages", default=DEFAULT_LANGUAGE,
+                        help=f"comma-separated language codes ({', '.join(LANGUAGES)})")
+    parser.add_argument("--edition", default=DEFAULT_EDITION)
+    parser.add_argument("--workers", type=int, default=default_controller().max_concurrency,
+                        help="fetcher threads; requests in flight adapt below this to upstream health")
+    parser.add_argument("--parsers", type=int, default=os.cpu_count(),
+                        help="parser processes (default: one per core)")
+    parser.add_argument("--queue-size", type=int, default=64,
+                        help="pages buffered between stages before the earlier stage waits")
+    parser.add_argument("--store", action="store_true",
+                        help="also insert missing verses into the database as chapters are parsed")
+    parser.add_argument("--batch-size", type=int, default=50, help="chapters per database transaction")
+    parser.add_argument("--docker", action="store_true", help="connect to the 'db' host instead of localhost")
+    parser.add_argument("--memprofile", action="store_true",
+                        help="report memory per stage (tracemalloc, peak RSS) and the top allocators")
+    args = parser.parse_args()
+
+    if args.docker:
+        use_docker_host()
+    profiler = MemoryProfiler(args.memprofile)
+
+    languages = [language.strip() for language in args.languages.split(",") if language.strip()]
+    pipeline = CrawlPipeline(args.edition, args.workers, args.parsers, args.queue_size)
+    extractors = {language: BibleExtractor(language, args.edition, pipeline.session) for language in languages}
 
     # list of all possible books
     book_nums = list(range(1, 67))
 
-    # map of books to chapters to verse content
-    data = []
-    urls = []
-
-    # generate a list of URLs for each chapter
-    for book_num in tqdm(book_nums, desc="Generating URLs"):
-        json_data = extractor.get_json_data_for_extra_verse_info(book_num)
-        num_chapters = extractor.get_num_chapters_in_book(json_data)
-
-        for chapter_num in range(1, num_chapters + 1):
-            url = AppSettings.main_verse_url(book_num, chapter_num)
-            urls.append(url)
-
-    def fetch_and_extract(args):
-        url, session = args
-        response = session.get(url)
-
-        if response.status_code == 200:
-            # Extract book_num and chapter_num from the URL
-            book_num, chapter_num = re.findall(r"/(\d+)/(\d+)", url)[0]
-            book_num, chapter_num = int(book_num), int(chapter_num)
-            
-            # Extract verses
-            chapter_data = {}
-            json_data = extractor.get_json_data_for_extra_verse_info(book_num)
-            num_verses = extractor.get_num_verses_in_chapter(chapter_num, json_data)
-            for verse_num in range(1, num_verses + 1):
-                if not response.content:
-                    continue
+    # map of language to chapters to verse content
+    data = {language: [] for language in languages}
+    jobs_by_language = {language: [] for language in languages}
+
+    # generate a list of URLs for each chapter, keeping each book's verse counts
+    with profiler.stage("generate urls"):
+        for language, extractor in extractors.items():
+            for book_num in tqdm(book_nums, desc=f"Generating URLs ({language})"):
+                json_data = extractor.get_json_data_for_extra_verse_info(book_num)
+                num_chapters = extractor.get_num_chapters_in_book(json_data)
+
+                for chapter_num in range(1, num_chapters + 1):
+                    url = AppSettings.main_verse_url(book_num, chapter_num, language, args.edition)
+                    num_verses = extractor.get_num_verses_in_chapter(chapter_num, json_data)
+                    jobs_by_language[language].append((language, book_num, chapter_num, num_verses, url))
+
+    # interleave the languages so they crawl concurrently under the shared request budget
+    jobs = [job for job in chain.from_iterable(zip_longest(*jobs_by_language.values())) if job]
+
+    writer = VerseWriter(args.batch_size) if args.store else None
+
+    with profiler.stage("crawl"), tqdm(total=len(jobs), desc="Scraping") as progress:
+        for language, book_num, chapter_num, chapter_data, markers in pipeline.run(jobs):
+            chapter_entry = {"book": book_num, "chapter": chapter_num, "verses": chapter_data}
+            if markers:
+                chapter_entry["markers"] = markers
+            data[language].append(chapter_entry)
+            if writer:
+                writer.add(language, book_num, chapter_num, chapter_data)
+            progress.update()
+            progress.set_postfix(pipeline.depths())
+
+        if writer:
+            writer.flush()
+    pipeline.session.close()
+    if writer:
+        print(f"Stored {writer.inserted:,} new verses in {writer.batches} batches")
+
+    print(f"Fetch stats: {default_controller().stats} (final concurrency {default_controller().limit:.1f})")
+    pipeline.print_stats()
+
+    with profiler.stage("write verses files"):
+        for language, chapters in data.items():
+            with open(verses_file_name(language), "w") as f:
+                json.dump({"data": chapters}, f)
+    profiler.report()
+
+
+# Parser processes keep one extractor per language
+_extractors = {}
+
+
+def parse_chapter(language, edition, book_num, chapter_num, num_verses, html_content):
+    """Extract a chapter's verses from its raw HTML. Runs in a parser process."""
+    key = (language, edition)
+    if key not in _extractors:
+        _extractors[key] = BibleExtractor(language, edition)
+    chapter_data, markers = _extractors[key].extract_chapter_from_html(book_num, chapter_num, num_verses, html_content)
+    return language, book_num, chapter_num, chapter_data, markers
+
+
+class CrawlPipeline:
+    """Fetch -> parse -> write, with bounded queues between the stages.
+
+    Fetcher threads put raw page bytes on the fetched queue, a dispatcher hands
+    them to a process pool of parsers (so parsing uses every core instead of
+    contending for the GIL), and run() yields parsed chapters to the writer as
+    they complete. A full queue blocks the stage before it, so a slow stage
+    throttles the others instead of piling pages up in memory.
 
+    Queue depths are sampled while the crawl runs: pages piling up in the
+    fetched queue mean parsing is the bottleneck, parsed chapters piling up
+    mean the writer is, and both near empty means the crawl is bound by
+    fetching.
+    """
+
+    DONE = object()
+
+    def __init__(self, edition=DEFAULT_EDITION, fetchers=4, parsers=None, queue_size=64, session=None):
+        self.edition = edition
+        # One session for every fetcher thread (and the book metadata fetches), so connections are reused
+        self.session = session or Session()
+        self.fetchers = max(1, fetchers)
+        self.parsers = max(1, parsers or os.cpu_count() or 1)
+        self.fetched = queue.Queue(maxsize=queue_size)
+        self.parsed = queue.Queue(maxsize=queue_size)
+        self.samples = {"fetched": [], "parsing": [], "parsed": []}
+        self.failed = 0
+        self._failed_lock = threading.Lock()
+
+    def _failure(self):
+        with self._failed_lock:
+            self.failed += 1
+
+    def depths(self):
+        """Current queue depths, also recorded for the end-of-crawl summary.
+
+        The parsed queue holds futures, split here into parses still running
+        and chapters parsed and waiting for the writer.
+        """
+        with self.parsed.mutex:
+            futures = [item for item in self.parsed.queue if item is not self.DONE]
+        waiting = sum(1 for future in futures if future.done())
+        depths = {"fetched": self.fetched.qsize(), "parsing": len(futures) - waiting, "parsed": waiting}
+        for name, depth in depths.items():
+            self.samples[name].append(depth)
+        return depths
+
+    def _fetch(self, jobs, session):
+        while True:
+            try:
+                language, book_num, chapter_num, num_verses, url = jobs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                response = polite_get(session, url)
+            except (requests.exceptions.RequestException, CircuitOpenError) as e:
+                print(f"Error fetching chapter: {language} {book_num} {chapter_num} - {e}")
+                self._failure()
+                continue
+            except Exception as e:
+                # Anything else would end this fetcher thread; count the chapter and keep going
+                print(f"Unexpected error fetching chapter: {language} {book_num} {chapter_num} - {e!r}")
+                self._failure()
+                continue
+            if response.status_code != 200 or not response.content:
+                self._failure()
+                continue
+            self.fetched.put((language, book_num, chapter_num, num_verses, response.content))
+
+    def _fetch_all(self, jobs):
+        pending = queue.Queue()
+        for job in jobs:
+            pending.put(job)
+        try:
+            with ThreadPoolExecutor(max_workers=self.fetchers) as executor:
+                futures = [executor.submit(self._fetch, pending, self.session) for _ in range(self.fetchers)]
+            for future in futures:
                 try:
-                    verse = extractor.extract_verse_from_html(book_num, chapter_num, verse_num, response.content)
-                except AttributeError as e:
-                    print(f"Error extracting verse: {book_num} {chapter_num} {verse_num}")
-                    continue
-                chapter_data[verse_num] = verse
-            
-            return book_num, chapter_num, chapter_data
-        return None
-    
-    with Session() as session:
-        # Scrape each URL and map book to chapters to verses content
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            args = [(url, session) for url in urls]
-            for result in tqdm(executor.map(fetch_and_extract, args), total=len(urls), desc="Scraping"):
-                if result:
-                    book_num, chapter_num, chapter_data = result
-                    data.append({"book": book_num, "chapter": chapter_num, "verses": chapter_data})
-    
-    with open("verses.json", "w") as f:
-        json.dump({"data": data}, f)
+                    future.result()
+                except Exception as e:
+                    print(f"Fetcher thread crashed - {e!r}")
+            # Chapters a crashed fetcher left behind never reached the parsers
+            while not pending.empty():
+                pending.get_nowait()
+                self._failure()
+        finally:
+            # The parsers and the writer wait for this, even if fetching broke down
+            self.fetched.put(self.DONE)
+
+    def _dispatch(self, executor):
+        while True:
+            item = self.fetched.get()
+            if item is self.DONE:
+                self.parsed.put(self.DONE)
+                return
+            language, book_num, chapter_num, num_verses, content = item
+            # Futures wait in the bounded parsed queue, which caps the parses in flight
+            self.parsed.put(executor.submit(parse_chapter, language, self.edition, book_num, chapter_num,
+                                            num_verses, content))
+
+    def run(self, jobs):
+        """Yield (language, book_num, chapter_num, chapter_data, markers) for every chapter fetched and parsed"""
+        with ProcessPoolExecutor(max_workers=self.parsers) as executor:
+            fetcher = threading.Thread(target=self._fetch_all, args=(jobs,), daemon=True)
+            dispatcher = threading.Thread(target=self._dispatch, args=(executor,), daemon=True)
+            fetcher.start()
+            dispatcher.start()
+
+            while True:
+                future = self.parsed.get()
+                if future is self.DONE:
+                    break
+                try:
+                    yield future.result()
+                except Exception as e:
+                    print(f"Error parsing chapter - {e}")
+                    self._failure()
+
+            fetcher.join()
+            dispatcher.join()
+
+    def print_stats(self):
+        print(f"Pipeline: {self.fetchers} fetchers, {self.parsers} parsers, {self.failed} chapters failed")
+        for name, samples in self.samples.items():
+            if samples:
+                print(f"  {name:<8} mean depth {sum(samples) / len(samples):5.1f}, max {max(samples)}")
+
+
+class VerseWriter:
+    """Stores parsed chapters in the language's verses table, a batch of chapters per transaction"""
+
+    def __init__(self, batch_size=50):
+        self.batch_size = batch_size
+        self.batch = []
+        self.batches = 0
+        self.inserted = 0
+        self.conn = connect()
+        with self.conn.cursor() as cur:
+            ensure_document_tables(cur)
+        self.conn.commit()
+
+    def add(self, language, book_num, chapter_num, chapter_data):
+        self.batch.append((language, book_num, chapter_num, chapter_data))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        cur = self.conn.cursor()
+        records_by_language = {}
+        for language, book_num, chapter_num, chapter_data in self.batch:
+            book_name = BOOK_NAMES.get(book_num, f"Book {book_num}")
+            records_by_language.setdefault(language, []).extend(
+                (book_num, book_name, chapter_num, verse_num, verse_text)
+                for verse_num, verse_text in chapter_data.items()
+            )
+        for language, records in records_by_language.items():
+            if language == DEFAULT_LANGUAGE:
+                verses_table = "verses"
+            else:
+                verses_table, _ = ensure_language_partition(cur, language)
+            inserted = insert_missing_verses(cur, records, verses_table)
+            self.inserted += inserted
+            # The API serves English verse ranges from chapter_arrays
+            if inserted and language == DEFAULT_LANGUAGE:
+                refresh_chapter_arrays(cur, {(record[0], record[2]) for record in records})
+            if inserted:
+                notify_changes(cur, "verses", {(record[0], record[2]) for record in records}, language)
+        self.conn.commit()
+        cur.close()
+        self.batches += 1
+        self.batch = []
 
 
 class BibleExtractor:
 
-    def extract_verse_from_html(self, book_num, chapter_num, verse_num, html_content):
-        soup = BeautifulSoup(html_content, 'html.parser')
-        verse_id_string = self.construct_verse_id(book_num, chapter_num, verse_num)
-        verse = soup.select_one(f"#{verse_id_string}").text
-        cleaned_verse = re.sub(r"[0-9+*]", "", verse).strip()
+    def __init__(self, language=DEFAULT_LANGUAGE, edition=DEFAULT_EDITION, session=None):
+        self.language = language
+        self.edition = edition
+        self.session = session or Session()
+        self.langwritten = get_language(language)["langwritten"]
 
-        return cleaned_verse
+    def extract_chapter_from_html(self, book_num, chapter_num, num_verses, html_content):
+        """Cleaned verse text and footnote/cross-reference markers by verse number, from one parse of the page"""
+        verses = extract_chapter_verses(html_content, book_num, chapter_num)
+        chapter_data, markers = {}, {}
+        for verse_num in range(1, num_verses + 1):
+            if verse_num not in verses:
+                print(f"Error extracting verse: {book_num} {chapter_num} {verse_num}")
+                continue
+            verse = verses[verse_num]
+            chapter_data[verse_num] = verse["text"]
+            if verse["footnotes"] or verse["cross_references"]:
+                markers[verse_num] = {"footnotes": verse["footnotes"], "cross_references": verse["cross_references"]}
+        return chapter_data, markers
 
     def get_json_data_for_extra_verse_info(self, book_num):
-        url = f"https://b.jw-cdn.org/apis/pub-media/GETPUBMEDIALINKS?pub=nwt&langwritten=E&txtCMSLang=E&fileformat=mp3&booknum={book_num}"
-        response = requests.get(url)
+        url = pub_media_url(book_num, self.language)
+        response = polite_get(self.session, url)
         return json.loads(response.text)
 
-    def construct_verse_id(self, book_num, chapter_num, verse_num):
-        return f"v{book_num}-{chapter_num}-{verse_num}-1"
-
     def get_num_verses_in_chapter(self, chapter_num, json_data):
-        num_verses = len(json_data["files"]["E"]["MP3"][int(chapter_num) - 1]["markers"]["markers"])
+        num_verses = len(json_data["files"][self.langwritten]["MP3"][int(chapter_num) - 1]["markers"]["markers"])
         return num_verses
 
     def get_num_chapters_in_book(self, json_data):
-        num_chapters = len(json_data["files"]["E"]["MP3"])
+        num_chapters = len(json_data["files"][self.langwritten]["MP3"])
         return num_chapters
 
     def get_book_name(self, json_data):
@@ -99,8 +332,8 @@ class BibleExtractor:
 
 class AppSettings:
     @staticmethod
-    def main_verse_url(book_num, chapter_num):
-        return f"https://wol.jw.org/en/wol/b/r1/lp-e/nwtsty/{book_num}/{chapter_num}#study=discover"
+    def main_verse_url(book_num, chapter_num, language=DEFAULT_LANGUAGE, edition=DEFAULT_EDITION):
+        return chapter_url(book_num, chapter_num, language, edition)
 
 
 if __name__ == "__main__":
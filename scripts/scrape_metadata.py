@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Scrape Metadata
+Freshness columns written by every study content scrape:
+
+    study_content.scraped_at        when the chapter was last fetched from WOL
+    study_content.source_hash       sha256 of the extracted chapter content
+    study_content.scraper_version   SCRAPER_VERSION of the extractor that wrote it
+    verses.study_notes_scraped_at   when the verse's study notes were last fetched
+
+Rows scraped before these columns existed have a NULL scraped_at and count
+as stale. Bump SCRAPER_VERSION whenever extraction changes, so the refresh
+daemon re-scrapes every chapter written by an older extractor.
+"""
+import json
+import hashlib
+from psycopg2 import sql
+
+from language_partitions import ensure_language_partitions
+
+SCRAPER_VERSION = "2"
+
+# Columns are added to the partitioned parents, which propagates them to every language
+METADATA_COLUMNS = {
+    "study_content_by_language": [
+        ("scraped_at", "TIMESTAMPTZ"),
+        ("source_hash", "TEXT"),
+        ("scraper_version", "TEXT"),
+    ],
+    "verses_by_language": [
+        ("study_notes_scraped_at", "TIMESTAMPTZ"),
+    ],
+}
+
+
+def ensure_scrape_metadata(cur):
+    """Add the scrape metadata columns if they don't exist (idempotent).
+
+    Existing rows keep a NULL scraped_at; only rows inserted afterwards
+    default to now(), so old data is never mistaken for fresh.
+    """
+    ensure_language_partitions(cur)
+    for table, columns in METADATA_COLUMNS.items():
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table,))
+        existing = {row[0] for row in cur.fetchall()}
+
+        # ALTER TABLE locks out readers even when the column exists, so only run it when needed
+        for column, column_type in columns:
+            if column in existing:
+                continue
+            cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN {} " + column_type)
+                        .format(sql.Identifier(table), sql.Identifier(column)))
+            if column == "scraped_at":
+                cur.execute(sql.SQL("ALTER TABLE {} ALTER COLUMN scraped_at SET DEFAULT now()")
+                            .format(sql.Identifier(table)))
+
+
+def content_hash(chapter_study_data, verse_study_notes):
+    """Stable hash of everything a chapter scrape extracted"""
+    payload = json.dumps({"study": chapter_study_data, "notes": verse_study_notes},
+                         sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -2,8 +2,10 @@
 import requests
 from bs4 import BeautifulSoup
 import json
-import psycopg2
 from psycopg2.extras import Json
+from change_feed import notify_change
+from db_connection import connect
+from fetch_controller import polite_get
 
 class ResearchGuideExtractor:
     def __init__(self):
@@ -14,7 +16,7 @@ class ResearchGuideExtractor:
         url = f"https://wol.jw.org/en/wol/b/r1/lp-e/nwtsty/{book_num}/{chapter_num}#study=discover"
         
         try:
-            response = self.session.get(url)
+            response = polite_get(self.session, url)
             if response.status_code != 200:
                 return None
             
@@ -104,13 +106,7 @@ class ResearchGuideExtractor:
 
 def update_study_content():
     # Database connection
-    conn = psycopg2.connect(
-        host="localhost",
-        port=5432,
-        database="wol-api",
-        user="postgres",
-        password="postgres"
-    )
+    conn = connect()
     cur = conn.cursor()
     
     extractor = ResearchGuideExtractor()
@@ -134,6 +130,7 @@ def update_study_content():
             Json(study_data['study_articles']),
             Json(study_data['cross_references'])
         ))
+        notify_change(cur, "study", 1, 1)
         
         conn.commit()
         print(f"Successfully updated research guide content for Genesis 1")
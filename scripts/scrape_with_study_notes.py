@@ -5,24 +5,53 @@ Enhanced scraping service that extracts both study content and verse-specific st
 import requests
 from bs4 import BeautifulSoup
 import json
-import psycopg2
 from psycopg2.extras import Json
+from psycopg2 import sql
+import os
 import sys
+from change_feed import notify_change
+from db_connection import pooled_connection
+from materialize_documents import refresh_chapter_documents
+from fetch_controller import polite_get
+from language_partitions import ensure_language_partition
+from prefetch_queue import PREFETCH_DEPTH, enqueue_neighbors
+from scrape_metadata import SCRAPER_VERSION, content_hash
+from study_notes_codec import encode_chapter_notes, ensure_study_notes_codec
+from wol_languages import DEFAULT_LANGUAGE, DEFAULT_EDITION, chapter_url, get_language, validate_edition
 
 class EnhancedStudyExtractor:
-    def __init__(self):
+    def __init__(self, language=DEFAULT_LANGUAGE, edition=DEFAULT_EDITION):
         self.session = requests.Session()
+        get_language(language)
+        self.language = language
+        self.edition = validate_edition(edition)
     
     def extract_chapter_content(self, book_num, chapter_num):
         """Extract study content and study notes for a chapter"""
-        url = f"https://wol.jw.org/en/wol/b/r1/lp-e/nwtsty/{book_num}/{chapter_num}#study=discover"
+        content = self.fetch_chapter(book_num, chapter_num)
+        if content is None:
+            return None, []
+        return self.parse_chapter_content(content, book_num, chapter_num)
+    
+    def fetch_chapter(self, book_num, chapter_num):
+        """Fetch a chapter page. Returns the raw HTML, or None if it couldn't be fetched."""
+        url = chapter_url(book_num, chapter_num, self.language, self.edition)
         
         try:
-            response = self.session.get(url)
+            response = polite_get(self.session, url)
             if response.status_code != 200:
-                return None, []
+                print(f"Error fetching {book_num}:{chapter_num} - HTTP {response.status_code}", file=sys.stderr)
+                return None
+            return response.content
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+        except Exception as e:
+            print(f"Error fetching {book_num}:{chapter_num} - {e}", file=sys.stderr)
+            return None
+    
+    def parse_chapter_content(self, content, book_num, chapter_num):
+        """Extract study content and study notes from a fetched chapter page"""
+        try:
+            soup = BeautifulSoup(content, 'html.parser')
             
             # Find the studyDiscover section for chapter-level content
             study_discover = soup.find(id='studyDiscover')
@@ -179,76 +208,145 @@ class EnhancedStudyExtractor:
         else:
             return 'other'
 
-def scrape_and_store_enhanced_content(book_num, chapter_num):
-    """Scrape and store both study content and verse study notes"""
+def scrape_and_store_enhanced_content(book_num, chapter_num, language=DEFAULT_LANGUAGE, edition=DEFAULT_EDITION,
+                                      prefetch_depth=PREFETCH_DEPTH):
+    """Scrape and store both study content and verse study notes.
+    
+    Queues background prefetches of the prefetch_depth chapters on either side;
+    the scrape worker passes 0 so prefetches don't cascade.
+    """
     try:
-        conn = psycopg2.connect(
-            host="localhost",
-            port=5432,
-            database="wol-api",
-            user="postgres",
-            password="postgres"
-        )
-        cur = conn.cursor()
-        
-        extractor = EnhancedStudyExtractor()
-        
-        print(f"Scraping enhanced content for book {book_num}, chapter {chapter_num}...")
-        chapter_study_data, verse_study_notes = extractor.extract_chapter_content(book_num, chapter_num)
-        
-        # Store chapter-level study content
-        if chapter_study_data:
-            # Check if already exists
-            cur.execute("SELECT id FROM study_content WHERE book_num = %s AND chapter = %s", (book_num, chapter_num))
-            if not cur.fetchone():
-                cur.execute("""
-                    INSERT INTO study_content (book_num, chapter, outline, study_articles, cross_references)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    chapter_study_data['book_num'],
-                    chapter_study_data['chapter_num'],
-                    chapter_study_data['outline'],
-                    Json(chapter_study_data['study_articles']),
-                    Json(chapter_study_data['cross_references'])
-                ))
-        
-        # Store verse-level study notes
-        study_notes_updated = 0
-        for verse_data in verse_study_notes:
-            cur.execute("""
-                UPDATE verses 
-                SET study_notes = %s 
-                WHERE book_num = %s AND chapter = %s AND verse_num = %s
-            """, (
-                Json(verse_data['study_notes']),
-                verse_data['book_num'],
-                verse_data['chapter_num'],
-                verse_data['verse_num']
-            ))
-            study_notes_updated += cur.rowcount
-        
-        conn.commit()
-        
-        print(f"Successfully stored:")
-        if chapter_study_data:
-            print(f"  - Chapter study content: {len(chapter_study_data['study_articles'])} articles")
-        print(f"  - Verse study notes: {study_notes_updated} verses updated")
-        
-        cur.close()
-        conn.close()
+        extractor = EnhancedStudyExtractor(language, edition)
+        
+        # Fetch before borrowing a connection, so a slow page never holds one
+        print(f"Scraping enhanced content for book {book_num}, chapter {chapter_num} ({language})...")
+        content = extractor.fetch_chapter(book_num, chapter_num)
+        if content is None:
+            # Failing (exit status 1) lets the API and the scrape worker back off and retry,
+            # instead of treating an unreachable or circuit-broken upstream as a chapter without content
+            print(f"Could not fetch book {book_num}, chapter {chapter_num}; nothing stored", file=sys.stderr)
+            return False
+        chapter_study_data, verse_study_notes = extractor.parse_chapter_content(content, book_num, chapter_num)
+        
+        with pooled_connection() as conn:
+            cur = conn.cursor()
+            
+            # Each language lives in its own partition; English stays in verses / study_content
+            if language == DEFAULT_LANGUAGE:
+                verses_table, study_table = "verses", "study_content"
+            else:
+                verses_table, study_table = ensure_language_partition(cur, language)
+            
+            # Unchanged content only refreshes the timestamps, so revalidation doesn't rewrite rows
+            source_hash = content_hash(chapter_study_data, verse_study_notes)
+            unchanged = False
+        
+            # Store chapter-level study content
+            if chapter_study_data:
+                cur.execute(sql.SQL("SELECT id, source_hash FROM {} WHERE book_num = %s AND chapter = %s").format(sql.Identifier(study_table)),
+                            (book_num, chapter_num))
+                existing = cur.fetchone()
+                if existing and existing[1] == source_hash:
+                    unchanged = True
+                    cur.execute(sql.SQL("UPDATE {} SET scraped_at = now(), scraper_version = %s WHERE id = %s")
+                                .format(sql.Identifier(study_table)), (SCRAPER_VERSION, existing[0]))
+                elif existing:
+                    cur.execute(sql.SQL("""
+                        UPDATE {}
+                        SET outline = %s, study_articles = %s, cross_references = %s,
+                            scraped_at = now(), source_hash = %s, scraper_version = %s
+                        WHERE id = %s
+                    """).format(sql.Identifier(study_table)), (
+                        chapter_study_data['outline'],
+                        Json(chapter_study_data['study_articles']),
+                        Json(chapter_study_data['cross_references']),
+                        source_hash,
+                        SCRAPER_VERSION,
+                        existing[0]
+                    ))
+                else:
+                    cur.execute(sql.SQL("""
+                        INSERT INTO {} (book_num, chapter, outline, study_articles, cross_references,
+                                        scraped_at, source_hash, scraper_version)
+                        VALUES (%s, %s, %s, %s, %s, now(), %s, %s)
+                    """).format(sql.Identifier(study_table)), (
+                        chapter_study_data['book_num'],
+                        chapter_study_data['chapter_num'],
+                        chapter_study_data['outline'],
+                        Json(chapter_study_data['study_articles']),
+                        Json(chapter_study_data['cross_references']),
+                        source_hash,
+                        SCRAPER_VERSION
+                    ))
+        
+            # Store verse-level study notes
+            study_notes_updated = 0
+            if unchanged:
+                cur.execute(sql.SQL("""
+                    UPDATE {}
+                    SET study_notes_scraped_at = now()
+                    WHERE book_num = %s AND chapter = %s AND study_notes IS NOT NULL
+                """).format(sql.Identifier(verses_table)), (book_num, chapter_num))
+            elif verse_study_notes:
+                # Notes are stored in the compact encoding; readers expand them with expand_study_notes()
+                ensure_study_notes_codec(cur)
+                encoded_notes = encode_chapter_notes(cur, verse_study_notes)
+                for verse_data, notes in zip(verse_study_notes, encoded_notes):
+                    cur.execute(sql.SQL("""
+                        UPDATE {} 
+                        SET study_notes = %s, study_notes_scraped_at = now()
+                        WHERE book_num = %s AND chapter = %s AND verse_num = %s
+                    """).format(sql.Identifier(verses_table)), (
+                        Json(notes),
+                        verse_data['book_num'],
+                        verse_data['chapter_num'],
+                        verse_data['verse_num']
+                    ))
+                    study_notes_updated += cur.rowcount
+        
+            # Rebuild the ready-to-serve documents for this chapter (the API serves English)
+            verse_documents = 0
+            if language == DEFAULT_LANGUAGE:
+                verse_documents = refresh_chapter_documents(cur, book_num, chapter_num)
+        
+            # Change feed listeners (caches, static export) hear about it once this commits
+            if chapter_study_data or verse_study_notes:
+                notify_change(cur, "revalidated" if unchanged else "study", book_num, chapter_num, language)
+        
+            # Sequential readers ask for the next chapter soon; let the scrape worker fetch it ahead of them
+            prefetches_queued = 0
+            if chapter_study_data:
+                prefetches_queued = enqueue_neighbors(cur, book_num, chapter_num, language, edition,
+                                                      study_table, depth=prefetch_depth)
+        
+            conn.commit()
+        
+            print(f"Successfully stored:")
+            if unchanged:
+                print("  - Chapter study content: unchanged since the last scrape")
+            elif chapter_study_data:
+                print(f"  - Chapter study content: {len(chapter_study_data['study_articles'])} articles")
+            print(f"  - Verse study notes: {study_notes_updated} verses updated")
+            print(f"  - Study documents: {verse_documents} verses refreshed")
+            if prefetches_queued:
+                print(f"  - Prefetch: {prefetches_queued} neighboring chapters queued")
+        
+            cur.close()
         return True
         
     except Exception as e:
-        print(f"Error scraping and storing enhanced content: {e}")
+        print(f"Error scraping and storing enhanced content: {e}", file=sys.stderr)
         return False
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python3 scrape_with_study_notes.py <book_num> <chapter_num>")
+    if len(sys.argv) not in (3, 4, 5):
+        print(f"Usage: python3 {os.path.basename(sys.argv[0])} <book_num> <chapter_num> [<language> [<edition>]]")
         sys.exit(1)
     
     book_num = int(sys.argv[1])
     chapter_num = int(sys.argv[2])
+    language = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_LANGUAGE
+    edition = sys.argv[4] if len(sys.argv) > 4 else DEFAULT_EDITION
     
-    success = scrape_and_store_enhanced_content(book_num, chapter_num)
+    success = scrape_and_store_enhanced_content(book_num, chapter_num, language, edition)
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Scrape Worker
+Background process that drains the scrape queue (see prefetch_queue.py), so
+chapters next to the ones readers just opened are stored before they're asked
+for. This runs as a background process in the backend container.
+
+When the queue is empty, the worker queues the most popular chapters that are
+still missing (see chapter_popularity.py), so idle upstream budget backfills
+the chapters readers ask for most.
+
+The worker fetches through the shared fetch controller with its own, smaller
+request budget (WOL_PREFETCH_RATE requests per second), so prefetching never
+takes more than a slice of upstream headroom from on-demand scrapes. It also
+honours the shared circuit breaker and stays idle while it is open.
+"""
+import os
+import time
+from psycopg2 import sql
+from datetime import datetime
+
+from db_connection import close_pool, pooled_connection, use_docker_host
+from fetch_controller import FetchController, RequestBudget, set_default_controller
+from language_partitions import partition_name
+from chapter_popularity import ensure_chapter_access, warm_popular_chapters
+from prefetch_queue import ensure_scrape_queue, claim_next, complete, retry_later
+from scrape_with_study_notes import scrape_and_store_enhanced_content
+
+PREFETCH_RATE = float(os.environ.get("WOL_PREFETCH_RATE", "0.5"))
+POLL_INTERVAL = 5
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 60
+WARM_INTERVAL = 10 * 60
+WARM_BATCH = 10
+
+
+def log(message):
+    """Log with timestamp"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+
+def chapter_scraped_at(cur, book_num, chapter_num, language):
+    """(stored, scraped_at) for a chapter's study content"""
+    study_table = partition_name("study_content", language)
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (study_table,))
+    if not cur.fetchone()[0]:
+        return False, None
+    cur.execute(sql.SQL("SELECT scraped_at FROM {} WHERE book_num = %s AND chapter = %s")
+                .format(sql.Identifier(study_table)), (book_num, chapter_num))
+    row = cur.fetchone()
+    return (True, row[0]) if row else (False, None)
+
+
+def process_next():
+    """Scrape the most urgent queued chapter. Returns False when there was nothing to do.
+
+    The claim connection goes back to the pool before the scrape, which borrows
+    one of its own to store the chapter, so the worker never holds two at once.
+    """
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        job = claim_next(cur)
+        conn.commit()
+        if not job:
+            return False
+
+        book_num, chapter_num, language, edition, refresh, attempts = job
+        stored, scraped_at = chapter_scraped_at(cur, book_num, chapter_num, language)
+
+        # It may have been scraped on demand since it was queued
+        if stored and not refresh:
+            complete(cur, book_num, chapter_num, language)
+            return True
+        cur.close()
+
+    scraped = scrape_and_store_enhanced_content(book_num, chapter_num, language, edition, prefetch_depth=0)
+
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        # A refresh succeeded if it moved scraped_at, whether or not the content changed
+        now_stored, now_scraped_at = chapter_scraped_at(cur, book_num, chapter_num, language)
+        action = "Refreshed" if refresh else "Prefetched"
+
+        if scraped and now_stored and (not stored or now_scraped_at != scraped_at):
+            complete(cur, book_num, chapter_num, language)
+            log(f"✅ {action} book {book_num}, chapter {chapter_num} ({language})")
+        elif attempts + 1 >= MAX_ATTEMPTS:
+            complete(cur, book_num, chapter_num, language)
+            log(f"⚠️  Giving up on book {book_num}, chapter {chapter_num} ({language}) after {MAX_ATTEMPTS} attempts")
+        else:
+            retry_later(cur, book_num, chapter_num, language, RETRY_DELAY * (2 ** attempts))
+            log(f"⚠️  {'Refresh' if refresh else 'Prefetch'} of book {book_num}, chapter {chapter_num} ({language}) failed, will retry")
+        cur.close()
+    return True
+
+
+def main():
+    """Main worker loop"""
+    log(f"📬 Starting scrape worker ({PREFETCH_RATE:g} requests/s)...")
+    controller = set_default_controller(
+        FetchController(budget=RequestBudget(rate=PREFETCH_RATE, burst=1), max_concurrency=1, initial_concurrency=1)
+    )
+    use_docker_host()
+    schema_ready = False
+    last_warm = 0
+
+    while True:
+        try:
+            # The queue and the scraper share a few warm pooled connections instead of reconnecting per chapter
+            if not schema_ready:
+                with pooled_connection() as conn:
+                    cur = conn.cursor()
+                    ensure_scrape_queue(cur)
+                    ensure_chapter_access(cur)
+                    cur.close()
+                schema_ready = True
+
+            if controller.breaker_open():
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            if not process_next():
+                if time.time() - last_warm >= WARM_INTERVAL:
+                    last_warm = time.time()
+                    with pooled_connection() as conn:
+                        cur = conn.cursor()
+                        queued = warm_popular_chapters(cur, WARM_BATCH)
+                        cur.close()
+                    if queued:
+                        log(f"🔥 Queued {queued} popular chapters for backfill")
+                        continue
+                time.sleep(POLL_INTERVAL)
+
+        except KeyboardInterrupt:
+            log("👋 Scrape worker stopped by user")
+            break
+        except Exception as e:
+            log(f"❌ Unexpected error in scrape worker: {e}")
+            time.sleep(POLL_INTERVAL)
+
+    close_pool()
+
+if __name__ == "__main__":
+    main()
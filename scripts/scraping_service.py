@@ -6,9 +6,13 @@ Can be called by the Rust API when study content is missing
 import requests
 from bs4 import BeautifulSoup
 import json
-import psycopg2
 from psycopg2.extras import Json
 import sys
+from change_feed import notify_change
+from db_connection import connect, use_docker_host
+from fetch_controller import polite_get
+from materialize_documents import refresh_chapter_documents
+from prefetch_queue import enqueue_neighbors
 
 class ResearchGuideExtractor:
     def __init__(self):
@@ -19,7 +23,7 @@ class ResearchGuideExtractor:
         url = f"https://wol.jw.org/en/wol/b/r1/lp-e/nwtsty/{book_num}/{chapter_num}#study=discover"
         
         try:
-            response = self.session.get(url)
+            response = polite_get(self.session, url)
             if response.status_code != 200:
                 return None
             
@@ -102,13 +106,7 @@ def scrape_and_store_study_content(book_num, chapter_num):
     """Scrape and store study content for a specific chapter"""
     try:
         # Database connection
-        conn = psycopg2.connect(
-            host="db",
-            port=5432,
-            database="wol-api",
-            user="postgres",
-            password="postgres"
-        )
+        conn = connect()
         cur = conn.cursor()
         
         extractor = ResearchGuideExtractor()
@@ -138,6 +136,13 @@ def scrape_and_store_study_content(book_num, chapter_num):
                 Json(study_data['cross_references'])
             ))
             
+            # Rebuild the ready-to-serve documents for this chapter
+            refresh_chapter_documents(cur, book_num, chapter_num)
+            notify_change(cur, "study", book_num, chapter_num)
+            
+            # Queue the neighboring chapters for the background scrape worker
+            enqueue_neighbors(cur, book_num, chapter_num)
+            
             conn.commit()
             print(f"Successfully stored study content: {len(study_data['study_articles'])} articles")
             cur.close()
@@ -158,6 +163,7 @@ if __name__ == "__main__":
         print("Usage: python3 scraping_service.py <book_num> <chapter_num>")
         sys.exit(1)
     
+    use_docker_host()
     book_num = int(sys.argv[1])
     chapter_num = int(sys.argv[2])
     
@@ -1,17 +1,14 @@
 #!/usr/bin/env python3
 import json
-import psycopg2
 from psycopg2.extras import execute_values
+from change_feed import notify_changes
+from db_connection import connect
+from memprofile import MemoryProfiler, memprofile_from_argv
 
-def setup_database():
+def setup_database(profiler=None):
+    profiler = profiler or MemoryProfiler()
     # Database connection
-    conn = psycopg2.connect(
-        host="localhost",
-        port=5432,
-        database="wol-api",
-        user="postgres",
-        password="postgres"
-    )
+    conn = connect()
     cur = conn.cursor()
     
     # Create tables if they don't exist
@@ -38,7 +35,7 @@ def setup_database():
     """)
     
     # Load verses data
-    with open('../data/verses.json', 'r') as f:
+    with profiler.stage("read verses.json"), open('../data/verses.json', 'r') as f:
         data = json.load(f)
     
     # Prepare data for insertion
@@ -60,28 +57,33 @@ def setup_database():
         61: "2 Peter", 62: "1 John", 63: "2 John", 64: "3 John", 65: "Jude", 66: "Revelation"
     }
     
-    for chapter_data in data['data']:
-        book_num = chapter_data['book']
-        chapter_num = chapter_data['chapter']
-        book_name = book_names.get(book_num, f"Book {book_num}")
-        
-        for verse_num, verse_text in chapter_data['verses'].items():
-            verse_records.append((book_num, book_name, chapter_num, int(verse_num), verse_text))
+    with profiler.stage("build records"):
+        for chapter_data in data['data']:
+            book_num = chapter_data['book']
+            chapter_num = chapter_data['chapter']
+            book_name = book_names.get(book_num, f"Book {book_num}")
+            
+            for verse_num, verse_text in chapter_data['verses'].items():
+                verse_records.append((book_num, book_name, chapter_num, int(verse_num), verse_text))
     
     # Insert data
-    execute_values(
-        cur,
-        "INSERT INTO verses (book_num, book_name, chapter, verse_num, verse_text) VALUES %s",
-        verse_records,
-        template=None,
-        page_size=100
-    )
+    with profiler.stage("insert"):
+        execute_values(
+            cur,
+            "INSERT INTO verses (book_num, book_name, chapter, verse_num, verse_text) VALUES %s",
+            verse_records,
+            template=None,
+            page_size=100
+        )
+    notify_changes(cur, "verses", None)
     
     conn.commit()
     cur.close()
     conn.close()
     
     print(f"Database setup complete! Inserted {len(verse_records)} verses.")
+    profiler.report()
 
 if __name__ == "__main__":
-    setup_database()
\ No newline at end of file
+    # --memprofile reports memory per stage (reading, building records, inserting)
+    setup_database(memprofile_from_argv()[0])
\ No newline at end of file
@@ -1,17 +1,11 @@
 #!/usr/bin/env python3
 import json
-import psycopg2
 from psycopg2.extras import execute_values
+from db_connection import connect
 
 def setup_study_database():
     # Database connection
-    conn = psycopg2.connect(
-        host="localhost",
-        port=5432,
-        database="wol-api",
-        user="postgres",
-        password="postgres"
-    )
+    conn = connect()
     cur = conn.cursor()
     
     # Create study_content table
@@ -23,6 +23,29 @@ MONITOR_PID=$!
 
 echo "📊 Health monitor started (PID: $MONITOR_PID)"
 
+# Start the background scrape worker that prefetches neighboring chapters
+echo "📬 Starting scrape worker..."
+python3 /home/appuser/scripts/scrape_worker.py &
+WORKER_PID=$!
+
+echo "📬 Scrape worker started (PID: $WORKER_PID)"
+
+# Start the refresh daemon that queues stale study content for re-scraping
+echo "♻️  Starting refresh daemon..."
+python3 /home/appuser/scripts/refresh_daemon.py &
+REFRESH_PID=$!
+
+echo "♻️  Refresh daemon started (PID: $REFRESH_PID)"
+
+# Start the change feed listener when something consumes chapter changes
+if [ -n "$WOL_STATIC_EXPORT_DIR" ] || [ -n "$WOL_CHANGE_WEBHOOK" ]; then
+    echo "🔔 Starting change feed listener..."
+    python3 /home/appuser/scripts/change_feed.py listen &
+    CHANGE_FEED_PID=$!
+
+    echo "🔔 Change feed listener started (PID: $CHANGE_FEED_PID)"
+fi
+
 # Wait a moment for the monitor to start
 sleep 2
 
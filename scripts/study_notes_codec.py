@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Study Notes Codec
+Compact storage encoding for verses.study_notes. The scraped shape repeats
+the absolute URL and the link text of every link in every paragraph:
+
+    [{"content": [{"text": "...", "links": [{"text": "...", "url": "https://wol.jw.org/en/wol/..."}]}]}]
+
+The compact shape stores each link target once, in study_note_links, and a
+link as an offset and length into its paragraph's text plus the link's id:
+
+    {"v": 1, "n": [["paragraph without links", ["paragraph", [[offset, length, link_id]]]]]}
+
+A link whose text doesn't occur in the paragraph is stored as [text, link_id].
+Link targets on wol.jw.org are interned as relative paths (/en/wol/...).
+
+The SQL function expand_study_notes(jsonb) turns either shape back into the
+scraped one, so the API, the materialized documents and the exports read
+through it and never see the compact form. Scrapes write the compact form;
+rows written before it still hold the scraped shape until `migrate` runs.
+
+    migrate [--docker] [<language>]   re-encode stored notes still in the scraped shape
+    report [--docker] [<language>]    storage (heap, TOAST, bytes per row) of both shapes
+    benchmark [--docker] [<language>] decode time of both shapes, in SQL and in Python
+"""
+import sys
+import json
+import time
+from psycopg2 import sql
+from psycopg2.extras import Json, execute_values
+
+from db_connection import configure_from_argv, connect
+from language_partitions import partition_name
+from wol_languages import DEFAULT_LANGUAGE, LANGUAGES
+
+ENCODING_VERSION = 1
+WOL_URL_PREFIX = "https://wol.jw.org"
+
+MIGRATE_BATCH = 500
+
+STUDY_NOTE_LINKS_SQL = """
+    CREATE TABLE IF NOT EXISTS study_note_links (
+        id SERIAL PRIMARY KEY,
+        path TEXT NOT NULL UNIQUE
+    )
+"""
+
+# Scraped shape from either encoding; anything that isn't an encoded object is returned as is.
+# A row's link paths are looked up once, then spans read them from that map.
+EXPAND_STUDY_NOTES_SQL = """
+    CREATE OR REPLACE FUNCTION expand_study_notes(notes JSONB) RETURNS JSONB
+    LANGUAGE sql STABLE PARALLEL SAFE AS $$
+        SELECT CASE WHEN jsonb_typeof(notes) = 'object' THEN (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object('content', (
+                       SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                                  'text', p.text,
+                                  'links', (
+                                      SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                                                 'text', CASE WHEN jsonb_typeof(s.span -> 0) = 'string'
+                                                              THEN s.span ->> 0
+                                                              ELSE substr(p.text, (s.span ->> 0)::int + 1,
+                                                                          (s.span ->> 1)::int) END,
+                                                 'url', urls.map -> (s.span ->> -1)
+                                             ) ORDER BY s.ord), '[]'::jsonb)
+                                        FROM jsonb_array_elements(p.spans) WITH ORDINALITY AS s (span, ord)
+                                  )
+                              ) ORDER BY p.ord), '[]'::jsonb)
+                         FROM jsonb_array_elements(n.note) WITH ORDINALITY AS e (paragraph, ord)
+                        CROSS JOIN LATERAL (
+                            SELECT e.ord,
+                                   CASE WHEN jsonb_typeof(e.paragraph) = 'string' THEN e.paragraph #>> '{}'
+                                        ELSE e.paragraph ->> 0 END AS text,
+                                   CASE WHEN jsonb_typeof(e.paragraph) = 'array' THEN e.paragraph -> 1
+                                        ELSE '[]'::jsonb END AS spans
+                        ) p
+                   )) ORDER BY n.ord), '[]'::jsonb)
+              FROM jsonb_array_elements(notes -> 'n') WITH ORDINALITY AS n (note, ord),
+                   (SELECT jsonb_object_agg(l.id, CASE WHEN left(l.path, 1) = '/' THEN 'https://wol.jw.org' || l.path
+                                                       ELSE l.path END) AS map
+                      FROM study_note_links l
+                     WHERE l.id = ANY (SELECT (jsonb_path_query(notes, '$.n[*][*][1][*][last]') #>> '{}')::int)) urls
+        ) ELSE notes END
+    $$
+"""
+
+# Ids for a set of paths, inserting the new ones. Rows another session inserts concurrently
+# aren't visible to this statement's snapshot; intern_links() asks again for those. Known
+# paths are filtered out before the INSERT, since ON CONFLICT still burns a sequence value.
+INTERN_LINKS_SQL = """
+    WITH wanted AS (
+        SELECT DISTINCT unnest(%s::text[]) AS path
+    ), inserted AS (
+        INSERT INTO study_note_links (path)
+        SELECT w.path FROM wanted w
+         WHERE NOT EXISTS (SELECT 1 FROM study_note_links l WHERE l.path = w.path)
+        ON CONFLICT (path) DO NOTHING
+        RETURNING id, path
+    )
+    SELECT id, path FROM inserted
+    UNION ALL
+    SELECT l.id, l.path FROM study_note_links l JOIN wanted USING (path)
+"""
+
+
+def ensure_study_notes_codec(cur):
+    """Create the link table and expand_study_notes() if they don't exist"""
+    cur.execute("SELECT to_regclass('study_note_links') IS NOT NULL, to_regprocedure('expand_study_notes(jsonb)') IS NOT NULL")
+    has_table, has_function = cur.fetchone()
+    if not has_table:
+        cur.execute(STUDY_NOTE_LINKS_SQL)
+    if not has_function:
+        cur.execute(EXPAND_STUDY_NOTES_SQL)
+
+
+def relative_url(url):
+    """wol.jw.org URLs as a site-relative path; other URLs unchanged"""
+    if url.startswith(WOL_URL_PREFIX + "/"):
+        return url[len(WOL_URL_PREFIX):]
+    return url
+
+
+def absolute_url(path):
+    return WOL_URL_PREFIX + path if path.startswith("/") else path
+
+
+def is_encoded(notes):
+    return isinstance(notes, dict) and notes.get("v") == ENCODING_VERSION
+
+
+def _encodable(notes):
+    """Only notes made of exactly the scraped keys round-trip; anything else is stored as is"""
+    if not isinstance(notes, list) or not notes:
+        return False
+    for note in notes:
+        if not isinstance(note, dict) or set(note) != {"content"}:
+            return False
+        for paragraph in note["content"]:
+            if set(paragraph) != {"text", "links"} or not isinstance(paragraph["text"], str):
+                return False
+            for link in paragraph["links"]:
+                if set(link) != {"text", "url"} or not isinstance(link["text"], str) or not isinstance(link["url"], str):
+                    return False
+    return True
+
+
+def link_paths(notes):
+    """Relative paths of every link in scraped-shape notes"""
+    if not _encodable(notes):
+        return set()
+    return {relative_url(link["url"])
+            for note in notes for paragraph in note["content"] for link in paragraph["links"]}
+
+
+def encode_study_notes(notes, link_ids):
+    """The compact form of scraped-shape notes, given ids for their link paths (see intern_links)"""
+    if not _encodable(notes):
+        return notes
+
+    encoded = []
+    for note in notes:
+        paragraphs = []
+        for paragraph in note["content"]:
+            text = paragraph["text"]
+            spans = []
+            position = 0
+            for link in paragraph["links"]:
+                link_id = link_ids[relative_url(link["url"])]
+                # Links usually appear in order; fall back to the first occurrence anywhere
+                offset = text.find(link["text"], position) if link["text"] else -1
+                if offset < 0 and link["text"]:
+                    offset = text.find(link["text"])
+                if offset < 0:
+                    spans.append([link["text"], link_id])
+                else:
+                    spans.append([offset, len(link["text"]), link_id])
+                    position = offset + len(link["text"])
+            paragraphs.append([text, spans] if spans else text)
+        encoded.append(paragraphs)
+    return {"v": ENCODING_VERSION, "n": encoded}
+
+
+def decode_study_notes(notes, paths):
+    """Scraped-shape notes from either form, given a link id -> path mapping (see load_link_paths)"""
+    if not is_encoded(notes):
+        return notes
+
+    decoded = []
+    for paragraphs in notes["n"]:
+        content = []
+        for paragraph in paragraphs:
+            text, spans = (paragraph, []) if isinstance(paragraph, str) else paragraph
+            links = []
+            for span in spans:
+                link_text = span[0] if isinstance(span[0], str) else text[span[0]:span[0] + span[1]]
+                path = paths.get(span[-1])
+                links.append({"text": link_text, "url": absolute_url(path) if path is not None else None})
+            content.append({"text": text, "links": links})
+        decoded.append({"content": content})
+    return decoded
+
+
+def intern_links(cur, paths):
+    """Ids for link paths, inserting the ones not seen before. Returns {path: id}."""
+    wanted = set(paths)
+    link_ids = {}
+    while wanted - set(link_ids):
+        cur.execute(INTERN_LINKS_SQL, (sorted(wanted - set(link_ids)),))
+        link_ids.update((path, link_id) for link_id, path in cur.fetchall())
+    return link_ids
+
+
+def encode_chapter_notes(cur, verse_study_notes):
+    """Encode a chapter's verse study notes with one link lookup. Returns the encoded notes in order."""
+    link_ids = intern_links(cur, set().union(*(link_paths(v['study_notes']) for v in verse_study_notes)))
+    return [encode_study_notes(v['study_notes'], link_ids) for v in verse_study_notes]
+
+
+def load_link_paths(cur):
+    """Every interned link as {id: path}"""
+    cur.execute("SELECT id, path FROM study_note_links")
+    return dict(cur.fetchall())
+
+
+def migrate(conn, verses_table="verses"):
+    """Re-encode every stored note still in the scraped shape, MIGRATE_BATCH rows per transaction.
+
+    Returns the number of rows re-encoded.
+    """
+    cur = conn.cursor()
+    migrated = 0
+    last = (0, 0, 0)
+    while True:
+        cur.execute(sql.SQL("""
+            SELECT book_num, chapter, verse_num, study_notes FROM {}
+             WHERE jsonb_typeof(study_notes) = 'array' AND (book_num, chapter, verse_num) > %s
+             ORDER BY book_num, chapter, verse_num
+             LIMIT %s
+        """).format(sql.Identifier(verses_table)), (last, MIGRATE_BATCH))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        last = tuple(rows[-1][:3])
+
+        link_ids = intern_links(cur, set().union(*(link_paths(notes) for *_, notes in rows)))
+        values = [(book_num, chapter, verse_num, Json(encode_study_notes(notes, link_ids)))
+                  for book_num, chapter, verse_num, notes in rows if _encodable(notes)]
+        if values:
+            execute_values(cur, sql.SQL("""
+                UPDATE {} v
+                   SET study_notes = u.notes
+                  FROM (VALUES %s) AS u (book_num, chapter, verse_num, notes)
+                 WHERE v.book_num = u.book_num AND v.chapter = u.chapter AND v.verse_num = u.verse_num
+            """).format(sql.Identifier(verses_table)).as_string(cur), values, template="(%s, %s, %s, %s::jsonb)")
+            migrated += len(values)
+        conn.commit()
+    cur.close()
+    return migrated
+
+
+def _shape_tables(cur, verses_table):
+    """Temp tables holding every stored note in the scraped and the compact shape"""
+    cur.execute(sql.SQL("""
+        CREATE TEMP TABLE notes_scraped ON COMMIT DROP AS
+        SELECT book_num, chapter, verse_num, expand_study_notes(study_notes) AS notes
+          FROM {} WHERE study_notes IS NOT NULL
+    """).format(sql.Identifier(verses_table)))
+    cur.execute("SELECT book_num, chapter, verse_num, notes FROM notes_scraped")
+    rows = cur.fetchall()
+    link_ids = intern_links(cur, set().union(*(link_paths(notes) for *_, notes in rows)))
+
+    cur.execute("CREATE TEMP TABLE notes_compact (LIKE notes_scraped) ON COMMIT DROP")
+    execute_values(cur, "INSERT INTO notes_compact VALUES %s",
+                   [(b, c, v, Json(encode_study_notes(notes, link_ids))) for b, c, v, notes in rows],
+                   template="(%s, %s, %s, %s::jsonb)", page_size=1000)
+    # The TOAST threshold and compression apply on insert; ANALYZE just makes the sizes settle
+    cur.execute("ANALYZE notes_scraped")
+    cur.execute("ANALYZE notes_compact")
+    return len(rows)
+
+
+def storage_report(conn, verses_table="verses"):
+    """Heap, TOAST and per-row sizes of the scraped and compact shapes. Rolled back, nothing is kept."""
+    cur = conn.cursor()
+    try:
+        rows = _shape_tables(cur, verses_table)
+        report = {"rows": rows}
+        for shape in ("notes_scraped", "notes_compact"):
+            cur.execute(sql.SQL("""
+                SELECT pg_relation_size(c.oid),
+                       COALESCE(pg_relation_size(NULLIF(c.reltoastrelid, 0)), 0),
+                       (SELECT COALESCE(sum(pg_column_size(notes)), 0) FROM {table}),
+                       (SELECT COALESCE(sum(octet_length(notes::text)), 0) FROM {table})
+                  FROM pg_class c
+                 WHERE c.oid = %s::regclass
+            """).format(table=sql.Identifier(shape)), (shape,))
+            heap, toast, stored, text = cur.fetchone()
+            report[shape] = {"heap_bytes": heap, "toast_bytes": toast, "stored_bytes": int(stored), "json_bytes": int(text)}
+        cur.execute("SELECT count(*), COALESCE(sum(octet_length(path)), 0) FROM study_note_links")
+        links, link_bytes = cur.fetchone()
+        report["links"] = {"count": links, "path_bytes": int(link_bytes)}
+        return report
+    finally:
+        conn.rollback()
+        cur.close()
+
+
+def print_storage_report(report):
+    print(f"\n📦 Study notes storage over {report['rows']:,} verses")
+    print(f"{'shape':<10} {'heap':>12} {'TOAST':>12} {'stored':>12} {'per row':>9} {'JSON text':>12}")
+    for label, shape in (("scraped", "notes_scraped"), ("compact", "notes_compact")):
+        sizes = report[shape]
+        per_row = sizes["stored_bytes"] / report["rows"] if report["rows"] else 0
+        print(f"{label:<10} {sizes['heap_bytes']:>12,} {sizes['toast_bytes']:>12,} {sizes['stored_bytes']:>12,} "
+              f"{per_row:>9,.0f} {sizes['json_bytes']:>12,}")
+    before = report["notes_scraped"]["heap_bytes"] + report["notes_scraped"]["toast_bytes"]
+    after = report["notes_compact"]["heap_bytes"] + report["notes_compact"]["toast_bytes"]
+    print(f"🔗 {report['links']['count']:,} interned links ({report['links']['path_bytes']:,} bytes of paths)")
+    if before:
+        print(f"✅ Compact encoding: {after:,} of {before:,} bytes on disk ({after / before * 100:.0f}%)")
+
+
+def decode_benchmark(conn, verses_table="verses", rounds=5):
+    """Best-of-rounds time to read every note in each shape, in SQL and decoded in Python. Rolled back."""
+    cur = conn.cursor()
+    try:
+        rows = _shape_tables(cur, verses_table)
+        paths = load_link_paths(cur)
+        results = {"rows": rows}
+        for label, query in (
+            ("sql scraped", "SELECT notes FROM notes_scraped"),
+            ("sql compact", "SELECT expand_study_notes(notes) FROM notes_compact"),
+        ):
+            timings = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                cur.execute(query)
+                cur.fetchall()
+                timings.append(time.perf_counter() - started)
+            results[label] = min(timings)
+
+        cur.execute("SELECT notes::text FROM notes_compact")
+        compact = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT notes::text FROM notes_scraped")
+        scraped = [row[0] for row in cur.fetchall()]
+        for label, texts, decode in (
+            ("python scraped", scraped, json.loads),
+            ("python compact", compact, lambda text: decode_study_notes(json.loads(text), paths)),
+        ):
+            timings = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                for text in texts:
+                    decode(text)
+                timings.append(time.perf_counter() - started)
+            results[label] = min(timings)
+        return results
+    finally:
+        conn.rollback()
+        cur.close()
+
+
+def print_decode_benchmark(results):
+    print(f"\n⏱️  Decode time over {results['rows']:,} verses (best of several rounds)")
+    for label, seconds in results.items():
+        if label == "rows":
+            continue
+        per_row = seconds / results["rows"] * 1e6 if results["rows"] else 0
+        print(f"   {label:<16} {seconds * 1000:>9.1f} ms  {per_row:>7.1f} µs/verse")
+
+
+def main():
+    args = configure_from_argv()
+    if not args or args[0] not in ("migrate", "report", "benchmark") or len(args) > 2:
+        print("Usage: python3 study_notes_codec.py [--docker] migrate | report | benchmark [<language>]")
+        sys.exit(1)
+
+    command = args[0]
+    language = args[1] if len(args) > 1 else DEFAULT_LANGUAGE
+    if language not in LANGUAGES:
+        print(f"❌ Unknown language {language!r} ({', '.join(LANGUAGES)})")
+        sys.exit(1)
+    verses_table = partition_name("verses", language)
+
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        ensure_study_notes_codec(cur)
+        conn.commit()
+        cur.close()
+
+        if command == "migrate":
+            print(f"🗜️  Re-encoding study notes in {verses_table}...")
+            migrated = migrate(conn, verses_table)
+            print(f"✅ Re-encoded {migrated:,} verses")
+        elif command == "report":
+            print_storage_report(storage_report(conn, verses_table))
+        else:
+            print_decode_benchmark(decode_benchmark(conn, verses_table))
+
+        conn.close()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
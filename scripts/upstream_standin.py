@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Upstream Stand-in
+Serves recorded wol.jw.org chapter pages, so the stack can be load-tested
+without sending a single request upstream. Point the scrapers at it with
+WOL_BASE_URL (docker-compose.loadtest.yml does this for the backend).
+
+    record [--language <lang>] [--edition <edition>] [--pages <dir>] <book>:<chapter> ...
+                                      fetch chapter pages (through the fetch controller) and save them
+    serve [--port 8081] [--pages <dir>] [--latency-ms 300] [--jitter-ms 100] [--error-rate 0.02]
+                                      serve them on /<wol path>/<edition>/<book>/<chapter>
+
+A chapter that wasn't recorded is served from a recorded page of the same
+language and edition, with the book and chapter in its verse ids and
+study-note keys rewritten, so every chapter of the Bible is scrapeable from a
+handful of recordings. --latency-ms, --jitter-ms and --error-rate (503s)
+simulate a slow or struggling upstream.
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from fetch_controller import CircuitOpenError, polite_get
+from verse_data import BOOK_CHAPTER_COUNTS
+from wol_languages import DEFAULT_LANGUAGE, DEFAULT_EDITION, EDITIONS, LANGUAGES, chapter_url
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "upstream_pages")
+DEFAULT_PORT = 8081
+
+CHAPTER_PATH = re.compile(r"^/(?P<wol_path>[^/]+/wol/b/[^/]+/[^/]+)/(?P<edition>[^/]+)/(?P<book>\d+)/(?P<chapter>\d+)$")
+
+
+def page_path(pages_dir, language, edition, book_num, chapter_num):
+    return os.path.join(pages_dir, language, edition, f"{book_num}-{chapter_num}.html")
+
+
+def record(chapters, language=DEFAULT_LANGUAGE, edition=DEFAULT_EDITION, pages_dir=PAGES_DIR):
+    """Fetch and save chapter pages. Returns the number saved."""
+    saved = 0
+    with requests.Session() as session:
+        for book_num, chapter_num in chapters:
+            try:
+                response = polite_get(session, chapter_url(book_num, chapter_num, language, edition))
+            except (requests.exceptions.RequestException, CircuitOpenError) as e:
+                print(f"⚠️  Could not fetch {book_num}:{chapter_num} - {e}")
+                continue
+            if response.status_code != 200:
+                print(f"⚠️  Could not fetch {book_num}:{chapter_num} (HTTP {response.status_code})")
+                continue
+
+            path = page_path(pages_dir, language, edition, book_num, chapter_num)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(response.content)
+            saved += 1
+            print(f"💾 {book_num}:{chapter_num} ({len(response.content):,} bytes)")
+    return saved
+
+
+def rewrite_chapter(page, from_book, from_chapter, book_num, chapter_num):
+    """A recorded page with its verse ids (v1-1-1-1) and study-note keys (1-1-1) moved to another chapter"""
+    old, new = f"{from_book}-{from_chapter}-".encode(), f"{book_num}-{chapter_num}-".encode()
+    return re.sub(rb'(id="v|data-key=")' + re.escape(old), lambda match: match.group(1) + new, page)
+
+
+class RecordedPages:
+    """Recorded pages in memory, keyed by (language, edition, book, chapter)"""
+
+    def __init__(self, pages_dir=PAGES_DIR):
+        self.pages = {}
+        self.templates = {}
+        for language in LANGUAGES:
+            for edition in EDITIONS:
+                directory = os.path.join(pages_dir, language, edition)
+                if not os.path.isdir(directory):
+                    continue
+                for file_name in sorted(os.listdir(directory)):
+                    match = re.match(r"^(\d+)-(\d+)\.html$", file_name)
+                    if not match:
+                        continue
+                    key = (language, edition, int(match.group(1)), int(match.group(2)))
+                    with open(os.path.join(directory, file_name), "rb") as f:
+                        self.pages[key] = f.read()
+                    # The largest recording stands in for unrecorded chapters
+                    template = self.templates.get((language, edition))
+                    if template is None or len(self.pages[key]) > len(self.pages[template]):
+                        self.templates[(language, edition)] = key
+
+        self.languages_by_path = {entry["wol_path"]: code for code, entry in LANGUAGES.items()}
+
+    def __len__(self):
+        return len(self.pages)
+
+    def get(self, wol_path, edition, book_num, chapter_num):
+        """(page, recorded) for a chapter, or (None, False) if there is nothing to serve"""
+        language = self.languages_by_path.get(wol_path)
+        if chapter_num < 1 or chapter_num > BOOK_CHAPTER_COUNTS.get(book_num, 0):
+            return None, False
+        if (language, edition, book_num, chapter_num) in self.pages:
+            return self.pages[(language, edition, book_num, chapter_num)], True
+        template = self.templates.get((language, edition))
+        if template is None:
+            return None, False
+        _, _, from_book, from_chapter = template
+        return rewrite_chapter(self.pages[template], from_book, from_chapter, book_num, chapter_num), False
+
+
+def make_handler(pages, latency_ms=0, jitter_ms=0, error_rate=0.0):
+    stats = Counter()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            delay = max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000 if jitter_ms else latency_ms / 1000
+            if delay:
+                time.sleep(delay)
+
+            match = CHAPTER_PATH.match(self.path.split("?", 1)[0].split("#", 1)[0])
+            if random.random() < error_rate:
+                outcome, status, body = "injected errors", 503, b"Service Unavailable"
+            elif not match:
+                outcome, status, body = "not found", 404, b"Not Found"
+            else:
+                body, recorded = pages.get(match["wol_path"], match["edition"], int(match["book"]), int(match["chapter"]))
+                if body is None:
+                    outcome, status, body = "not found", 404, b"Not Found"
+                else:
+                    outcome, status = ("recorded" if recorded else "rewritten"), 200
+
+            with lock:
+                stats[outcome] += 1
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler, stats
+
+
+def serve(port=DEFAULT_PORT, pages_dir=PAGES_DIR, latency_ms=0, jitter_ms=0, error_rate=0.0):
+    pages = RecordedPages(pages_dir)
+    if not len(pages):
+        print(f"❌ No recorded pages in {pages_dir}; record some first")
+        sys.exit(1)
+
+    handler, stats = make_handler(pages, latency_ms, jitter_ms, error_rate)
+    server = ThreadingHTTPServer(("", port), handler)
+    server.daemon_threads = True
+    print(f"🎭 Serving {len(pages)} recorded pages on port {port} "
+          f"(latency {latency_ms}±{jitter_ms}ms, error rate {error_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"📊 {sum(stats.values()):,} requests: " + ", ".join(f"{count:,} {outcome}" for outcome, count in stats.items()))
+
+
+def parse_chapter(reference):
+    try:
+        book_num, chapter_num = (int(part) for part in reference.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected <book>:<chapter>, got '{reference}'")
+    if chapter_num < 1 or chapter_num > BOOK_CHAPTER_COUNTS.get(book_num, 0):
+        raise argparse.ArgumentTypeError(f"no chapter {reference}")
+    return book_num, chapter_num
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record wol.jw.org chapter pages and serve them as a stand-in upstream")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subcommands.add_parser("record", help="fetch and save chapter pages")
+    record_parser.add_argument("--language", default=DEFAULT_LANGUAGE, choices=sorted(LANGUAGES))
+    record_parser.add_argument("--edition", default=DEFAULT_EDITION, choices=EDITIONS)
+    record_parser.add_argument("--pages", default=PAGES_DIR, help="directory of recorded pages")
+    record_parser.add_argument("chapters", type=parse_chapter, nargs="+", metavar="book:chapter")
+
+    serve_parser = subcommands.add_parser("serve", help="serve the recorded pages")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--pages", default=PAGES_DIR, help="directory of recorded pages")
+    serve_parser.add_argument("--latency-ms", type=float, default=0, help="mean response delay")
+    serve_parser.add_argument("--jitter-ms", type=float, default=0, help="standard deviation of the delay")
+    serve_parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        saved = record(args.chapters, args.language, args.edition, args.pages)
+        print(f"✅ Recorded {saved}/{len(args.chapters)} chapters in {args.pages}")
+        sys.exit(0 if saved == len(args.chapters) else 1)
+
+    serve(args.port, args.pages, args.latency_ms, args.jitter_ms, args.error_rate)
+
+
+if __name__ == "__main__":
+    main()
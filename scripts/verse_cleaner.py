@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Verse Cleaner
+Extracts clean verse text from a wol.jw.org chapter page in one walk over the
+DOM. Verse numbers, chapter numbers and the footnote (*) and cross-reference
+(+) markers are recognised as elements and skipped while the text is
+collected, so numbers that belong to the verse (ages, counts, measurements)
+are kept. The old cleaner took .text and then stripped every digit, + and *
+with a regex, which turned "930 years" into " years".
+
+Footnote and cross-reference anchors come back as side data, with the offset
+in the cleaned text where each marker stood.
+
+    check                                     run the regression corpus (fixtures/numbered_verses.json)
+    reclean [--docker] [--all] [--language <lang>] [<book> [<chapter>]]
+                                              re-extract stored verse_text from the live pages
+
+reclean only fetches chapters whose stored text shows signs of the old
+cleaner (doubled spaces, a space before punctuation) unless --all is given.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import requests
+
+from bs4 import BeautifulSoup
+from bs4.element import Comment, NavigableString
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from change_feed import notify_change
+from db_connection import connect, use_docker_host
+from fetch_controller import CircuitOpenError, polite_get
+from language_partitions import ensure_language_partition
+from materialize_documents import refresh_chapter_documents
+from verse_data import BOOK_CHAPTER_COUNTS
+from wol_languages import DEFAULT_LANGUAGE, DEFAULT_EDITION, chapter_url
+
+# Verse parts are v<book>-<chapter>-<verse>-<part>; poetry and paragraph breaks split a verse into parts
+VERSE_ID = re.compile(r"^v(\d+)-(\d+)-(\d+)-(\d+)$")
+
+VERSE_NUMBER_CLASSES = {"verseNum", "vl", "vx", "vp"}
+CHAPTER_NUMBER_CLASSES = {"chapterNum", "cl"}
+FOOTNOTE_CLASSES = {"fn", "footnoteLink"}
+CROSS_REFERENCE_CLASSES = {"b", "xrefLink"}
+
+# Anchors that are only these characters are markers even without a known class
+FOOTNOTE_MARKER = "*"
+CROSS_REFERENCE_MARKER = "+"
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "numbered_verses.json")
+
+# Stored text the old regex cleaner left behind: a removed number leaves two spaces or a space before punctuation
+SUSPECT_TEXT_PATTERN = r"  | [,.;:!?]"
+
+RECLEAN_BATCH = 20
+
+
+class _TextBuilder:
+    """Collects text nodes with whitespace collapsed as it goes, so marker offsets are final"""
+
+    def __init__(self):
+        self.chunks = []
+        self.length = 0
+        self.space = False
+
+    def add(self, string):
+        if not string:
+            return
+        if string[0].isspace():
+            self.space = True
+        words = string.split()
+        if not words:
+            return
+        text = " ".join(words)
+        if self.space and self.length:
+            text = " " + text
+        self.chunks.append(text)
+        self.length += len(text)
+        self.space = string[-1].isspace()
+
+    def break_word(self):
+        self.space = True
+
+    def text(self):
+        return "".join(self.chunks)
+
+
+def _marker(element, builder):
+    """Side data for a footnote or cross-reference anchor"""
+    marker = {"offset": builder.length}
+    for attribute, key in (("data-fnid", "id"), ("data-bid", "id"), ("href", "href")):
+        if element.get(attribute):
+            marker.setdefault(key, element[attribute])
+    return marker
+
+
+def _walk(node, builder, footnotes, cross_references):
+    for child in node.children:
+        if isinstance(child, NavigableString):
+            if not isinstance(child, Comment):
+                builder.add(str(child))
+            continue
+
+        classes = set(child.get("class") or [])
+        if classes & (VERSE_NUMBER_CLASSES | CHAPTER_NUMBER_CLASSES):
+            builder.break_word()
+            continue
+
+        anchor_text = child.get_text().strip() if child.name == "a" else None
+        if classes & FOOTNOTE_CLASSES or anchor_text == FOOTNOTE_MARKER:
+            footnotes.append(_marker(child, builder))
+            continue
+        if classes & CROSS_REFERENCE_CLASSES or anchor_text == CROSS_REFERENCE_MARKER:
+            cross_references.append(_marker(child, builder))
+            continue
+
+        if child.name == "br":
+            builder.break_word()
+            continue
+        _walk(child, builder, footnotes, cross_references)
+
+
+def clean_verse(parts):
+    """Clean text and markers of a verse from its part elements, in document order.
+
+    Returns {"text": ..., "footnotes": [...], "cross_references": [...]}.
+    """
+    builder = _TextBuilder()
+    footnotes, cross_references = [], []
+    for part in parts:
+        builder.break_word()
+        _walk(part, builder, footnotes, cross_references)
+    return {"text": builder.text(), "footnotes": footnotes, "cross_references": cross_references}
+
+
+def extract_chapter_verses(page, book_num, chapter_num):
+    """Every verse of a chapter page (HTML or a parsed soup), keyed by verse number"""
+    soup = page if isinstance(page, BeautifulSoup) else BeautifulSoup(page, "html.parser")
+    parts = {}
+    for element in soup.find_all(id=VERSE_ID):
+        book, chapter, verse, _ = (int(group) for group in VERSE_ID.match(element["id"]).groups())
+        if book == book_num and chapter == chapter_num:
+            parts.setdefault(verse, []).append(element)
+    return {verse_num: clean_verse(verse_parts) for verse_num, verse_parts in sorted(parts.items())}
+
+
+def _old_clean(html):
+    """The regex cleaner this module replaced, kept for the corpus report"""
+    return re.sub(r"[0-9+*]", "", BeautifulSoup(html, "html.parser").text).strip()
+
+
+def check_corpus(path=CORPUS_PATH):
+    """Run the regression corpus. Returns the number of failing cases."""
+    with open(path, "r") as f:
+        cases = json.load(f)["cases"]
+
+    failures = old_failures = 0
+    for case in cases:
+        verses = extract_chapter_verses(case["html"], case["book_num"], case["chapter"])
+        got = verses.get(case["verse_num"], {"text": None, "footnotes": [], "cross_references": []})
+        problems = [
+            f"{key}: expected {case[key]!r}, got {got[key]!r}"
+            for key in ("text", "footnotes", "cross_references")
+            if key in case and got[key] != case[key]
+        ]
+        if problems:
+            failures += 1
+            print(f"❌ {case['reference']}")
+            for problem in problems:
+                print(f"   {problem}")
+        else:
+            print(f"✅ {case['reference']}: {got['text']}")
+        if _old_clean(case["html"]) != case["text"]:
+            old_failures += 1
+
+    print(f"\n{len(cases) - failures}/{len(cases)} cases pass "
+          f"(the old regex cleaner got {old_failures} of them wrong)")
+    return failures
+
+
+def suspect_chapters(cur, verses_table="verses", book_num=None, chapter_num=None, check_all=False):
+    """(book_num, chapter) pairs to re-clean: all of them in scope with check_all, otherwise those that look mangled"""
+    conditions, params = [], []
+    if not check_all:
+        conditions.append("verse_text ~ %s")
+        params.append(SUSPECT_TEXT_PATTERN)
+    if book_num:
+        conditions.append("book_num = %s")
+        params.append(book_num)
+    if chapter_num:
+        conditions.append("chapter = %s")
+        params.append(chapter_num)
+
+    where = sql.SQL(" WHERE " + " AND ".join(conditions) if conditions else "")
+    cur.execute(sql.SQL("SELECT DISTINCT book_num, chapter FROM {}{} ORDER BY book_num, chapter").format(
+        sql.Identifier(verses_table), where), params)
+    return cur.fetchall()
+
+
+def update_verse_text(cur, rows, verses_table="verses"):
+    """Bulk-update (book_num, chapter, verse_num, verse_text) rows whose text changed. Returns rows updated."""
+    if not rows:
+        return 0
+    execute_values(cur, sql.SQL("""
+        UPDATE {verses} v
+           SET verse_text = u.verse_text
+          FROM (VALUES %s) AS u (book_num, chapter, verse_num, verse_text)
+         WHERE v.book_num = u.book_num AND v.chapter = u.chapter AND v.verse_num = u.verse_num
+           AND v.verse_text IS DISTINCT FROM u.verse_text
+    """).format(verses=sql.Identifier(verses_table)).as_string(cur), rows, page_size=1000)
+    return cur.rowcount
+
+
+def reclean(conn, chapters, language, edition):
+    """Re-fetch chapters and bulk-update their stored verse text, RECLEAN_BATCH chapters per transaction.
+
+    Returns (chapters fetched, verses updated, chapters whose English documents were refreshed).
+    """
+    cur = conn.cursor()
+    verses_table = "verses" if language == DEFAULT_LANGUAGE else ensure_language_partition(cur, language)[0]
+    fetched = updated = refreshed = 0
+
+    with requests.Session() as session:
+        for start in range(0, len(chapters), RECLEAN_BATCH):
+            for book_num, chapter_num in chapters[start:start + RECLEAN_BATCH]:
+                try:
+                    response = polite_get(session, chapter_url(book_num, chapter_num, language, edition))
+                except (requests.exceptions.RequestException, CircuitOpenError) as e:
+                    print(f"⚠️  Could not fetch {book_num}:{chapter_num} - {e}")
+                    continue
+                if response.status_code != 200:
+                    print(f"⚠️  Could not fetch {book_num}:{chapter_num} (HTTP {response.status_code})")
+                    continue
+                fetched += 1
+
+                verses = extract_chapter_verses(response.content, book_num, chapter_num)
+                rows = [(book_num, chapter_num, verse_num, verse["text"]) for verse_num, verse in verses.items()]
+                changed = update_verse_text(cur, rows, verses_table)
+                updated += changed
+                if changed:
+                    notify_change(cur, "verses", book_num, chapter_num, language)
+                if changed and language == DEFAULT_LANGUAGE:
+                    refresh_chapter_documents(cur, book_num, chapter_num)
+                    refreshed += 1
+            conn.commit()
+            print(f"   {min(start + RECLEAN_BATCH, len(chapters))}/{len(chapters)} chapters, {updated:,} verses updated")
+
+    cur.close()
+    return fetched, updated, refreshed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or re-apply the DOM-based verse text cleaner")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("check", help="run the regression corpus of verses with numbers")
+    reclean_parser = subcommands.add_parser("reclean", help="re-extract stored verse_text from the live pages")
+    reclean_parser.add_argument("--docker", action="store_true", help="connect to the 'db' host instead of localhost")
+    reclean_parser.add_argument("--all", action="store_true",
+                                help="re-fetch every chapter in scope, not only those that look mangled")
+    reclean_parser.add_argument("--language", default=DEFAULT_LANGUAGE)
+    reclean_parser.add_argument("--edition", default=DEFAULT_EDITION)
+    reclean_parser.add_argument("book_num", type=int, nargs="?", choices=sorted(BOOK_CHAPTER_COUNTS), metavar="book_num")
+    reclean_parser.add_argument("chapter_num", type=int, nargs="?")
+    args = parser.parse_args()
+
+    if args.command == "check":
+        sys.exit(1 if check_corpus() else 0)
+
+    if args.docker:
+        use_docker_host()
+
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        verses_table = "verses" if args.language == DEFAULT_LANGUAGE else ensure_language_partition(cur, args.language)[0]
+        chapters = suspect_chapters(cur, verses_table, args.book_num, args.chapter_num, args.all)
+        cur.close()
+        conn.commit()
+
+        if not chapters:
+            print("✅ No stored verse text needs re-cleaning")
+            return
+        print(f"🧹 Re-cleaning {len(chapters)} chapters ({args.language})...")
+        fetched, updated, refreshed = reclean(conn, chapters, args.language, args.edition)
+        conn.close()
+    except Exception as e:
+        print(f"❌ Error re-cleaning verses: {e}")
+        sys.exit(1)
+
+    print(f"✅ Re-cleaned {fetched}/{len(chapters)} chapters: {updated:,} verses updated, "
+          f"documents refreshed for {refreshed} chapters")
+    sys.exit(0 if fetched == len(chapters) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Compact Binary Verse Corpus
+Builds a single binary file holding every verse, and reads it back through
+mmap so batch jobs can look up any verse in O(1) without Postgres or a full
+json.load of verses.json.
+
+File layout (all integers little-endian uint32):
+
+    header          magic "WOLVCORP", version, book_count, chapter_count, verse_count
+    book table      book_count x (first_chapter_index, chapter_count)
+    chapter table   chapter_count x (first_verse_ordinal, verse_count)
+    offset table    (verse_count + 1) x byte offset into the text blob
+    text blob       UTF-8 verse texts, concatenated in canonical order
+
+Verses get a dense ordinal in (book, chapter, verse) order computed from the
+per-book chapter counts and per-chapter verse counts, so a lookup is three
+table reads and a range is one contiguous slice of the blob. Verse numbers
+missing from the source (e.g. verses omitted from the translation) keep
+their slot with empty text.
+"""
+import os
+import sys
+import mmap
+import struct
+from array import array
+from typing import Optional
+
+from verse_data import find_verses_file, iter_verse_records
+
+MAGIC = b"WOLVCORP"
+VERSION = 1
+HEADER = struct.Struct("<8sIIII")
+DEFAULT_CORPUS_PATH = os.environ.get("WOL_CORPUS_PATH", "data/verses.corpus")
+
+
+def build_corpus(verses_path, corpus_path):
+    """Write the binary corpus for a verses.json file. Returns the verse slot count."""
+    books = {}
+    for book_num, _book_name, chapter_num, verse_num, verse_text in iter_verse_records(verses_path):
+        books.setdefault(book_num, {}).setdefault(chapter_num, {})[verse_num] = verse_text
+
+    book_count = max(books) if books else 0
+    book_table = array("I")
+    chapter_table = array("I")
+    offsets = array("I", [0])
+    blob = bytearray()
+
+    for book_num in range(1, book_count + 1):
+        chapters = books.get(book_num, {})
+        chapter_count = max(chapters) if chapters else 0
+        book_table.extend((len(chapter_table) // 2, chapter_count))
+
+        for chapter_num in range(1, chapter_count + 1):
+            verses = chapters.get(chapter_num, {})
+            verse_count = max(verses) if verses else 0
+            chapter_table.extend((len(offsets) - 1, verse_count))
+
+            for verse_num in range(1, verse_count + 1):
+                blob += verses.get(verse_num, "").encode("utf-8")
+                offsets.append(len(blob))
+
+    for table in (book_table, chapter_table, offsets):
+        if sys.byteorder != "little":
+            table.byteswap()
+
+    verse_count = len(offsets) - 1
+    with open(corpus_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, book_count, len(chapter_table) // 2, verse_count))
+        f.write(book_table.tobytes())
+        f.write(chapter_table.tobytes())
+        f.write(offsets.tobytes())
+        f.write(blob)
+
+    return verse_count
+
+
+class VerseCorpus:
+    """Read-only, memory-mapped view of a binary verse corpus.
+
+    Nothing is parsed up front: opening maps the file and every lookup reads
+    the tables in place. verse_bytes() and range_bytes() return memoryview
+    slices of the mapping (zero-copy); verse() and verse_range() decode them.
+    """
+
+    def __init__(self, corpus_path=DEFAULT_CORPUS_PATH):
+        self._file = open(corpus_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, version, self.book_count, self.chapter_count, self.verse_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{corpus_path} is not a version {VERSION} verse corpus")
+
+        book_start = HEADER.size
+        chapter_start = book_start + self.book_count * 8
+        offset_start = chapter_start + self.chapter_count * 8
+        self._blob_start = offset_start + (self.verse_count + 1) * 4
+
+        if sys.byteorder == "little":
+            # Zero-copy typed views over the tables
+            self._books = self._view[book_start:chapter_start].cast("I")
+            self._chapters = self._view[chapter_start:offset_start].cast("I")
+            self._offsets = self._view[offset_start:self._blob_start].cast("I")
+        else:
+            self._books = self._read_table(book_start, chapter_start)
+            self._chapters = self._read_table(chapter_start, offset_start)
+            self._offsets = self._read_table(offset_start, self._blob_start)
+
+    def _read_table(self, start, end):
+        table = array("I")
+        table.frombytes(self._view[start:end])
+        table.byteswap()
+        return table
+
+    def close(self):
+        """Release the mapping. Slices handed out earlier must be released first."""
+        for name in ("_books", "_chapters", "_offsets"):
+            table = getattr(self, name, None)
+            if isinstance(table, memoryview):
+                table.release()
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def num_chapters(self, book_num) -> int:
+        """Number of chapters in a book (0 for unknown books)"""
+        if not 1 <= book_num <= self.book_count:
+            return 0
+        return self._books[(book_num - 1) * 2 + 1]
+
+    def num_verses(self, book_num, chapter_num) -> int:
+        """Number of verse slots in a chapter (0 for unknown chapters)"""
+        if not 1 <= chapter_num <= self.num_chapters(book_num):
+            return 0
+        chapter_index = self._books[(book_num - 1) * 2] + chapter_num - 1
+        return self._chapters[chapter_index * 2 + 1]
+
+    def ordinal(self, book_num, chapter_num, verse_num) -> int:
+        """Dense 0-based ordinal of a verse; raises KeyError if it is out of range"""
+        if not 1 <= chapter_num <= self.num_chapters(book_num):
+            raise KeyError((book_num, chapter_num, verse_num))
+
+        chapter_index = self._books[(book_num - 1) * 2] + chapter_num - 1
+        first_verse, verse_count = self._chapters[chapter_index * 2], self._chapters[chapter_index * 2 + 1]
+        if not 1 <= verse_num <= verse_count:
+            raise KeyError((book_num, chapter_num, verse_num))
+
+        return first_verse + verse_num - 1
+
+    def _slice(self, first_ordinal, last_ordinal) -> memoryview:
+        start = self._blob_start + self._offsets[first_ordinal]
+        end = self._blob_start + self._offsets[last_ordinal + 1]
+        return self._view[start:end]
+
+    def verse_bytes(self, book_num, chapter_num, verse_num) -> memoryview:
+        """UTF-8 bytes of a verse as a zero-copy slice of the mapping"""
+        ordinal = self.ordinal(book_num, chapter_num, verse_num)
+        return self._slice(ordinal, ordinal)
+
+    def verse(self, book_num, chapter_num, verse_num) -> str:
+        """Text of a single verse"""
+        return str(self.verse_bytes(book_num, chapter_num, verse_num), "utf-8")
+
+    def range_bytes(self, book_num, chapter_num, start_verse, end_verse) -> memoryview:
+        """Concatenated UTF-8 bytes of a verse range, as one contiguous zero-copy slice"""
+        first = self.ordinal(book_num, chapter_num, start_verse)
+        last = self.ordinal(book_num, chapter_num, end_verse)
+        return self._slice(first, last)
+
+    def verse_range(self, book_num, chapter_num, start_verse, end_verse) -> list:
+        """Texts of a verse range, one string per verse"""
+        first = self.ordinal(book_num, chapter_num, start_verse)
+        last = self.ordinal(book_num, chapter_num, end_verse)
+        return [str(self._slice(ordinal, ordinal), "utf-8") for ordinal in range(first, last + 1)]
+
+    def iter_verses(self):
+        """Yield (book_num, chapter_num, verse_num, text) for every non-empty verse slot"""
+        for book_num in range(1, self.book_count + 1):
+            for chapter_num in range(1, self.num_chapters(book_num) + 1):
+                verse_count = self.num_verses(book_num, chapter_num)
+                if not verse_count:
+                    continue
+
+                first = self.ordinal(book_num, chapter_num, 1)
+                for verse_num in range(1, verse_count + 1):
+                    text = self._slice(first + verse_num - 1, first + verse_num - 1)
+                    if len(text):
+                        yield book_num, chapter_num, verse_num, str(text, "utf-8")
+
+
+def main():
+    usage = ("Usage: python3 verse_corpus.py build [<verses.json> [<corpus_path>]]\n"
+             "       python3 verse_corpus.py get <book_num> <chapter_num> <verse>[-<end_verse>] [<corpus_path>]")
+    args = sys.argv[1:]
+
+    if args and args[0] == "build":
+        verses_path: Optional[str] = args[1] if len(args) > 1 else find_verses_file()
+        corpus_path = args[2] if len(args) > 2 else DEFAULT_CORPUS_PATH
+        if not verses_path:
+            print("❌ Could not find verses.json file.")
+            sys.exit(1)
+
+        print(f"📖 Building verse corpus from {verses_path}...")
+        os.makedirs(os.path.dirname(os.path.abspath(corpus_path)), exist_ok=True)
+        verse_count = build_corpus(verses_path, corpus_path)
+        print(f"✅ Wrote {verse_count:,} verse slots to {corpus_path}")
+
+    elif args and args[0] == "get" and len(args) in (4, 5):
+        book_num, chapter_num = int(args[1]), int(args[2])
+        start_verse, _, end_verse = args[3].partition("-")
+        corpus_path = args[4] if len(args) > 4 else DEFAULT_CORPUS_PATH
+
+        with VerseCorpus(corpus_path) as corpus:
+            try:
+                texts = corpus.verse_range(book_num, chapter_num, int(start_verse), int(end_verse or start_verse))
+            except KeyError:
+                print("❌ Verse not found.")
+                sys.exit(1)
+            # Omitted verses are stored as empty slots; skip them rather than printing a double space
+            print(" ".join(text for text in texts if text))
+
+    else:
+        print(usage)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Verse Data Helpers
+Shared helpers for locating and reading verses.json.
+
+verses.json comes in two shapes: the scraper output
+({"data": [{"book": 1, "chapter": 1, "verses": {"1": "..."}}]}) used by
+db_manager.py, and a flat list of verse rows used by auto_setup_db.py. Both
+are read through iter_verse_records().
+"""
+import os
+import json
+from typing import Iterator, Optional, Tuple
+
+VERSES_FILE_PATHS = [
+    "data/verses.json",
+    "../data/verses.json",
+    "verses.json",
+    "/home/appuser/data/verses.json"
+]
+
+BOOK_NAMES = {
+    1: "Genesis", 2: "Exodus", 3: "Leviticus", 4: "Numbers", 5: "Deuteronomy",
+    6: "Joshua", 7: "Judges", 8: "Ruth", 9: "1 Samuel", 10: "2 Samuel",
+    11: "1 Kings", 12: "2 Kings", 13: "1 Chronicles", 14: "2 Chronicles",
+    15: "Ezra", 16: "Nehemiah", 17: "Esther", 18: "Job", 19: "Psalms",
+    20: "Proverbs", 21: "Ecclesiastes", 22: "Song of Solomon", 23: "Isaiah",
+    24: "Jeremiah", 25: "Lamentations", 26: "Ezekiel", 27: "Daniel",
+    28: "Hosea", 29: "Joel", 30: "Amos", 31: "Obadiah", 32: "Jonah",
+    33: "Micah", 34: "Nahum", 35: "Habakkuk", 36: "Zephaniah", 37: "Haggai",
+    38: "Zechariah", 39: "Malachi", 40: "Matthew", 41: "Mark", 42: "Luke",
+    43: "John", 44: "Acts", 45: "Romans", 46: "1 Corinthians", 47: "2 Corinthians",
+    48: "Galatians", 49: "Ephesians", 50: "Philippians", 51: "Colossians",
+    52: "1 Thessalonians", 53: "2 Thessalonians", 54: "1 Timothy", 55: "2 Timothy",
+    56: "Titus", 57: "Philemon", 58: "Hebrews", 59: "James", 60: "1 Peter",
+    61: "2 Peter", 62: "1 John", 63: "2 John", 64: "3 John", 65: "Jude", 66: "Revelation"
+}
+
+# Number of chapters in each book, used to find a chapter's neighbours
+BOOK_CHAPTER_COUNTS = {
+    1: 50, 2: 40, 3: 27, 4: 36, 5: 34, 6: 24, 7: 21, 8: 4, 9: 31, 10: 24,
+    11: 22, 12: 25, 13: 29, 14: 36, 15: 10, 16: 13, 17: 10, 18: 42, 19: 150,
+    20: 31, 21: 12, 22: 8, 23: 66, 24: 52, 25: 5, 26: 48, 27: 12, 28: 14,
+    29: 3, 30: 9, 31: 1, 32: 4, 33: 7, 34: 3, 35: 3, 36: 3, 37: 2, 38: 14,
+    39: 4, 40: 28, 41: 16, 42: 24, 43: 21, 44: 28, 45: 16, 46: 16, 47: 13,
+    48: 6, 49: 6, 50: 4, 51: 4, 52: 5, 53: 3, 54: 6, 55: 4, 56: 3, 57: 1,
+    58: 13, 59: 5, 60: 5, 61: 3, 62: 5, 63: 1, 64: 1, 65: 1, 66: 22
+}
+
+VerseRecord = Tuple[int, str, int, int, str]
+
+
+def adjacent_chapter(book_num: int, chapter_num: int, step: int) -> Optional[Tuple[int, int]]:
+    """The chapter `step` chapters after (or before, if negative) a chapter, crossing book boundaries"""
+    chapter_num += step
+    while chapter_num > BOOK_CHAPTER_COUNTS.get(book_num, 0):
+        if book_num not in BOOK_CHAPTER_COUNTS:
+            return None
+        chapter_num -= BOOK_CHAPTER_COUNTS[book_num]
+        book_num += 1
+    while chapter_num < 1:
+        book_num -= 1
+        if book_num not in BOOK_CHAPTER_COUNTS:
+            return None
+        chapter_num += BOOK_CHAPTER_COUNTS[book_num]
+    return book_num, chapter_num
+
+
+def verses_file_name(language: str = "en") -> str:
+    """File name the verse scraper writes for a language (verses.json for English)"""
+    return "verses.json" if language == "en" else f"verses.{language}.json"
+
+
+def find_verses_file(language: str = "en") -> Optional[str]:
+    """Find a language's verses file in common locations"""
+    file_name = verses_file_name(language)
+    for path in VERSES_FILE_PATHS:
+        path = os.path.join(os.path.dirname(path), file_name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def iter_verse_records(path: str) -> Iterator[VerseRecord]:
+    """Yield (book_num, book_name, chapter, verse_num, verse_text) for every verse in a verses.json file"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+
+    if isinstance(data, dict):
+        for chapter_data in data['data']:
+            book_num = chapter_data['book']
+            chapter_num = chapter_data['chapter']
+            book_name = BOOK_NAMES.get(book_num, f"Book {book_num}")
+
+            for verse_num, verse_text in chapter_data['verses'].items():
+                yield book_num, book_name, chapter_num, int(verse_num), verse_text
+    else:
+        for verse in data:
+            yield (
+                verse['book_num'],
+                verse['book_name'],
+                verse['chapter'],
+                verse['verse_num'],
+                verse['verse_text']
+            )
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Verse Manifest
+Detects and repairs partial verse loss. The manifest records how many verses
+every chapter should have, taken from the corpus file (verses.json), and is
+cached next to it as verse_manifest.json. find_gaps() compares it with the
+database in one grouped query, and repair_gaps() bulk-loads just the verses
+of the chapters that came up short, so a deleted book or a half-finished load
+is fixed without a full reload.
+
+    build [<language>]     (re)write the manifest from the corpus file
+    verify [<language>]    list missing or incomplete chapters
+    repair [<language>]    reload the missing verses of those chapters
+
+Repairs take the restore advisory lock (db_snapshot.RESTORE_LOCK), which the
+health monitor, auto_restore_db.py and snapshot restores share, so two
+restores never run at once.
+"""
+import os
+import sys
+import json
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from change_feed import notify_changes
+from db_connection import advisory_lock, configure_from_argv, connect
+from db_snapshot import RESTORE_LOCK
+from language_partitions import ensure_language_partition, partition_name
+from materialize_documents import refresh_all_documents, refresh_chapter_documents
+from prefetch_queue import enqueue_chapters
+from verse_data import find_verses_file, iter_verse_records
+from wol_languages import DEFAULT_LANGUAGE, LANGUAGES
+
+# Past this many repaired chapters, one set-based document rebuild beats per-chapter refreshes
+FULL_DOCUMENT_REBUILD = 100
+
+# Repaired chapters that had study notes are re-scraped ahead of popularity warming (1000+)
+REPAIR_PRIORITY = 500
+
+# Chapters whose verse count falls short of the manifest, in one pass over verses
+GAPS_SQL = """
+    SELECT m.book_num, m.chapter, m.expected, count(v.verse_num) AS found
+      FROM unnest(%s::int[], %s::int[], %s::int[]) AS m (book_num, chapter, expected)
+      LEFT JOIN {verses} v ON v.book_num = m.book_num AND v.chapter = m.chapter
+     GROUP BY m.book_num, m.chapter, m.expected
+    HAVING count(v.verse_num) < m.expected
+     ORDER BY m.book_num, m.chapter
+"""
+
+
+def manifest_path(verses_path):
+    """The manifest cached next to a corpus file (verse_manifest.json, verse_manifest.<lang>.json)"""
+    directory, file_name = os.path.split(verses_path)
+    return os.path.join(directory, file_name.replace("verses", "verse_manifest", 1))
+
+
+def build_manifest(verses_path):
+    """Count the verses of every chapter in a corpus file and cache the manifest"""
+    chapters = {}
+    for book_num, _, chapter_num, _, _ in iter_verse_records(verses_path):
+        key = f"{book_num}:{chapter_num}"
+        chapters[key] = chapters.get(key, 0) + 1
+
+    manifest = {"source": os.path.basename(verses_path), "verses": sum(chapters.values()), "chapters": chapters}
+    try:
+        with open(manifest_path(verses_path), "w") as f:
+            json.dump(manifest, f)
+    except OSError as e:
+        print(f"⚠️  Could not cache the verse manifest: {e}")
+    return manifest
+
+
+def load_manifest(verses_path):
+    """The cached manifest, rebuilt when it is missing or older than the corpus file"""
+    path = manifest_path(verses_path)
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(verses_path):
+            with open(path, "r") as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    return build_manifest(verses_path)
+
+
+def find_gaps(cur, manifest, verses_table="verses"):
+    """Return (book_num, chapter, expected, found) for every chapter with missing verses"""
+    books, chapters, expected = [], [], []
+    for key, count in manifest["chapters"].items():
+        book_num, chapter_num = key.split(":")
+        books.append(int(book_num))
+        chapters.append(int(chapter_num))
+        expected.append(count)
+
+    cur.execute(sql.SQL(GAPS_SQL).format(verses=sql.Identifier(verses_table)), (books, chapters, expected))
+    return cur.fetchall()
+
+
+def insert_missing_verses(cur, records, verses_table="verses", page_size=1000):
+    """Bulk-insert (book_num, book_name, chapter, verse_num, verse_text) records that aren't stored yet.
+
+    Verses already in the table keep their row (and study notes). Returns the number inserted.
+    """
+    if not records:
+        return 0
+
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS verse_reload (
+            book_num INTEGER, book_name TEXT, chapter INTEGER, verse_num INTEGER, verse_text TEXT
+        ) ON COMMIT DELETE ROWS
+    """)
+    execute_values(cur, "INSERT INTO verse_reload VALUES %s", records, page_size=page_size)
+    cur.execute(sql.SQL("""
+        INSERT INTO {verses} (book_num, book_name, chapter, verse_num, verse_text)
+        SELECT r.book_num, r.book_name, r.chapter, r.verse_num, r.verse_text
+          FROM verse_reload r
+         WHERE NOT EXISTS (
+               SELECT 1 FROM {verses} v
+                WHERE v.book_num = r.book_num AND v.chapter = r.chapter AND v.verse_num = r.verse_num
+         )
+    """).format(verses=sql.Identifier(verses_table)))
+    inserted = cur.rowcount
+    cur.execute("TRUNCATE verse_reload")
+    return inserted
+
+
+def reload_chapters(cur, verses_path, chapters, verses_table="verses", page_size=1000):
+    """Bulk-insert the verses of `chapters` that are missing from the table. Returns the number inserted."""
+    wanted = set(chapters)
+    records = [record for record in iter_verse_records(verses_path) if (record[0], record[2]) in wanted]
+    return insert_missing_verses(cur, records, verses_table, page_size)
+
+
+def repair_gaps(cur, language=DEFAULT_LANGUAGE, verses_path=None):
+    """Find and reload missing verses for a language. Returns (chapters repaired, verses inserted).
+
+    Repaired chapters that already had study content are queued for a re-scrape,
+    since the reloaded verses come back without their study notes. The caller
+    commits (and should hold the restore lock).
+    """
+    verses_path = verses_path or find_verses_file(language)
+    if not verses_path:
+        print(f"⚠️  No verses file for {language}; can't check for gaps")
+        return 0, 0
+
+    if language == DEFAULT_LANGUAGE:
+        verses_table, study_table = "verses", "study_content"
+    else:
+        verses_table, study_table = ensure_language_partition(cur, language)
+
+    gaps = find_gaps(cur, load_manifest(verses_path), verses_table)
+    if not gaps:
+        return 0, 0
+
+    chapters = [(book_num, chapter_num) for book_num, chapter_num, _, _ in gaps]
+    inserted = reload_chapters(cur, verses_path, chapters, verses_table)
+    finish_reload(cur, language, chapters, verses_table, study_table)
+    return len(chapters), inserted
+
+
+def finish_reload(cur, language, chapters, verses_table, study_table):
+    """Follow-up once chapters' verses are reloaded: rebuild English documents, queue re-scrapes, announce, analyze"""
+    if language == DEFAULT_LANGUAGE:
+        if len(chapters) > FULL_DOCUMENT_REBUILD:
+            refresh_all_documents(cur)
+        else:
+            for book_num, chapter_num in chapters:
+                refresh_chapter_documents(cur, book_num, chapter_num)
+
+    # The reloaded verses have no study notes yet. Forgetting the content hash keeps the re-scrape
+    # from taking the "unchanged" shortcut, which only touches timestamps, so the notes are written back.
+    cur.execute(sql.SQL("""
+        UPDATE {} SET source_hash = NULL
+         WHERE (book_num, chapter) IN (SELECT * FROM unnest(%s::int[], %s::int[]))
+        RETURNING book_num, chapter
+    """).format(sql.Identifier(study_table)), ([b for b, _ in chapters], [c for _, c in chapters]))
+    scraped = sorted(set(cur.fetchall()))
+    if scraped:
+        enqueue_chapters(cur, ((book_num, chapter_num, REPAIR_PRIORITY) for book_num, chapter_num in scraped),
+                         language=language, study_table=study_table, reason="repair", refresh=True)
+
+    notify_changes(cur, "verses", chapters, language)
+    cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(verses_table)))
+
+
+def repair_all_languages(cur):
+    """repair_gaps() for every language with a verses file. Returns [(language, chapters, verses)] for those repaired."""
+    repaired = []
+    for language in LANGUAGES:
+        verses_path = find_verses_file(language)
+        if not verses_path:
+            continue
+        chapters, inserted = repair_gaps(cur, language, verses_path)
+        if chapters:
+            repaired.append((language, chapters, inserted))
+    return repaired
+
+
+def main():
+    args = configure_from_argv()
+    if not args or args[0] not in ("build", "verify", "repair") or len(args) > 2:
+        print("Usage: python3 verse_manifest.py [--docker] build | verify | repair [<language>]")
+        sys.exit(1)
+
+    command = args[0]
+    language = args[1] if len(args) > 1 else DEFAULT_LANGUAGE
+    verses_path = find_verses_file(language)
+    if not verses_path:
+        print(f"❌ No verses file found for {language}")
+        sys.exit(1)
+
+    if command == "build":
+        manifest = build_manifest(verses_path)
+        print(f"✅ Manifest for {verses_path}: {len(manifest['chapters']):,} chapters, {manifest['verses']:,} verses")
+        return
+
+    try:
+        conn = connect()
+        cur = conn.cursor()
+
+        if command == "verify":
+            verses_table = partition_name("verses", language)
+            gaps = find_gaps(cur, load_manifest(verses_path), verses_table)
+            for book_num, chapter_num, expected, found in gaps:
+                print(f"  {book_num}:{chapter_num} has {found} of {expected} verses")
+            print(f"{'⚠️ ' if gaps else '✅'} {len(gaps)} incomplete chapters")
+            sys.exit(1 if gaps else 0)
+
+        with advisory_lock(RESTORE_LOCK) as acquired:
+            if not acquired:
+                print("⏳ Another restore is in progress; try again later")
+                sys.exit(1)
+            chapters, inserted = repair_gaps(cur, language, verses_path)
+            conn.commit()
+        print(f"✅ Repaired {chapters} chapters ({inserted:,} verses reloaded)")
+
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error checking verses: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+WOL Languages
+Registry of the languages and editions the scrapers can crawl, and the URL
+builders every extractor uses instead of hard-coding the English paths.
+
+Each language has its WOL library path (site language, resource and
+language-pack codes) and the single-letter code the pub-media API calls
+"langwritten".
+
+WOL_BASE_URL and WOL_PUB_MEDIA_URL override the upstream hosts, e.g. to point
+the scrapers at the recorded-page stand-in (upstream_standin.py) for a load
+test. Links stored from scraped pages keep the real wol.jw.org host.
+"""
+import os
+
+DEFAULT_LANGUAGE = "en"
+DEFAULT_EDITION = "nwtsty"
+
+WOL_BASE_URL = os.environ.get("WOL_BASE_URL", "https://wol.jw.org").rstrip("/")
+PUB_MEDIA_URL = os.environ.get("WOL_PUB_MEDIA_URL", "https://b.jw-cdn.org/apis/pub-media/GETPUBMEDIALINKS")
+
+LANGUAGES = {
+    "en": {"name": "English", "wol_path": "en/wol/b/r1/lp-e", "langwritten": "E"},
+    "es": {"name": "Spanish", "wol_path": "es/wol/b/r4/lp-s", "langwritten": "S"},
+    "pt": {"name": "Portuguese", "wol_path": "pt/wol/b/r5/lp-t", "langwritten": "T"},
+    "fr": {"name": "French", "wol_path": "fr/wol/b/r30/lp-f", "langwritten": "F"},
+    "de": {"name": "German", "wol_path": "de/wol/b/r10/lp-x", "langwritten": "X"},
+    "it": {"name": "Italian", "wol_path": "it/wol/b/r6/lp-i", "langwritten": "I"},
+}
+
+EDITIONS = ["nwtsty", "nwt"]
+
+
+def get_language(language):
+    """Return the registry entry for a language code, raising ValueError if it is unknown"""
+    if language not in LANGUAGES:
+        raise ValueError(f"Unknown language '{language}' (expected one of: {', '.join(LANGUAGES)})")
+    return LANGUAGES[language]
+
+
+def validate_edition(edition):
+    """Raise ValueError for an unknown Bible edition"""
+    if edition not in EDITIONS:
+        raise ValueError(f"Unknown edition '{edition}' (expected one of: {', '.join(EDITIONS)})")
+    return edition
+
+
+def chapter_url(book_num, chapter_num, language=DEFAULT_LANGUAGE, edition=DEFAULT_EDITION):
+    """URL of a chapter page with its study discover pane"""
+    wol_path = get_language(language)["wol_path"]
+    return f"{WOL_BASE_URL}/{wol_path}/{validate_edition(edition)}/{book_num}/{chapter_num}#study=discover"
+
+
+def pub_media_url(book_num, language=DEFAULT_LANGUAGE):
+    """URL of the pub-media listing used to count a book's chapters and verses"""
+    langwritten = get_language(language)["langwritten"]
+    return (f"{PUB_MEDIA_URL}?pub=nwt&langwritten={langwritten}&txtCMSLang={langwritten}"
+            f"&fileformat=mp3&booknum={book_num}")
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Write Benchmark
+Measures how fast each bulk-write strategy the scripts use (or could use)
+gets verses and study notes into PostgreSQL, and how much WAL it writes, so
+loader defaults come from numbers rather than guesses.
+
+    python3 write_bench.py [--docker] [--rows N] [--repeat 3] [--per-row-limit 2000]
+                           [--only <strategy>] [--json <path>]
+
+Inserts (verse loads):
+    per_row              one INSERT per verse (auto_setup_db.py's old loop)
+    values_<n>           execute_values with page_size n (100 in setup_db.py, 1000 in db_manager.py)
+    copy_text            COPY FROM STDIN, text format
+    copy_binary          COPY FROM STDIN, binary format
+
+Study-note updates, against a loaded table:
+    update_per_row       one UPDATE per verse (the scraper's loop)
+    update_from_values   UPDATE ... FROM (VALUES ...) in pages of 1000
+    temp_merge           COPY into a temp table, then one UPDATE ... FROM it
+
+Every strategy runs against a scratch copy of the real verses table
+(write_bench_verses, dropped afterwards), once without indexes and once with
+the unique (book_num, chapter, verse_num) index the language partitions
+carry. Verse text comes from verses.json; study notes are synthetic, in the
+stored compact encoding. WAL is the pg_current_wal_insert_lsn() distance
+across the run, so it includes full-page images after a checkpoint and any
+other activity on the server; use a quiet database and look at the median.
+The per-row strategies only write --per-row-limit rows, since unindexed
+per-row updates scan the table once per row.
+"""
+import io
+import sys
+import json
+import time
+import random
+import struct
+import argparse
+import statistics
+from psycopg2 import sql
+from psycopg2.extras import Json, execute_values
+
+from db_connection import connect, use_docker_host
+from verse_data import BOOK_NAMES, find_verses_file, iter_verse_records
+
+BENCH_TABLE = "write_bench_verses"
+VALUES_PAGE_SIZES = [100, 1000, 5000]
+UPDATE_PAGE_SIZE = 1000
+
+REFERENCE_INDEX = "(book_num, chapter, verse_num)"
+
+# PostgreSQL's binary COPY header: signature, flags, header extension length
+COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_BINARY_TRAILER = struct.pack("!h", -1)
+JSONB_BINARY_VERSION = b"\x01"
+
+
+def benchmark_rows(limit=None):
+    """(book_num, book_name, chapter, verse_num, verse_text) rows from verses.json, or generated ones without it"""
+    verses_path = find_verses_file()
+    if verses_path:
+        rows = list(iter_verse_records(verses_path))
+    else:
+        print("⚠️  No verses.json; benchmarking generated verses")
+        generator = random.Random(1)
+        words = ["the", "and", "of", "Jehovah", "said", "to", "his", "people", "in", "land", "that", "was"]
+        rows = [(book_num, BOOK_NAMES[book_num], chapter, verse_num,
+                 " ".join(generator.choices(words, k=generator.randint(8, 40))))
+                for book_num in sorted(BOOK_NAMES) for chapter in range(1, 11) for verse_num in range(1, 31)]
+    return rows[:limit] if limit else rows
+
+
+def study_notes_for(rows):
+    """Synthetic study notes in the stored compact encoding, one per row, a few hundred bytes each"""
+    generator = random.Random(2)
+    notes = []
+    for book_num, _, chapter, verse_num, verse_text in rows:
+        paragraphs = [[verse_text[:200], [[0, min(20, len(verse_text)), generator.randint(1, 5000)]]]
+                      for _ in range(generator.randint(1, 3))]
+        notes.append({"v": 1, "n": [paragraphs]})
+    return notes
+
+
+def _copy_text_field(value):
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def copy_text_buffer(rows):
+    """Rows as a COPY text-format stream"""
+    return io.StringIO("".join("\t".join(_copy_text_field(value) for value in row) + "\n" for row in rows))
+
+
+def copy_binary_buffer(rows, types):
+    """Rows as a COPY binary-format stream; types are "int4", "text" or "jsonb" per column"""
+    chunks = [COPY_BINARY_HEADER]
+    field_count = struct.pack("!h", len(types))
+    for row in rows:
+        chunks.append(field_count)
+        for value, column_type in zip(row, types):
+            if column_type == "int4":
+                chunks.append(b"\x00\x00\x00\x04" + struct.pack("!i", value))
+                continue
+            data = value.encode("utf-8") if column_type == "text" else JSONB_BINARY_VERSION + json.dumps(value).encode("utf-8")
+            chunks.append(struct.pack("!i", len(data)) + data)
+    chunks.append(COPY_BINARY_TRAILER)
+    return io.BytesIO(b"".join(chunks))
+
+
+def insert_per_row(cur, table, rows):
+    statement = sql.SQL("INSERT INTO {} (book_num, book_name, chapter, verse_num, verse_text) "
+                        "VALUES (%s, %s, %s, %s, %s)").format(table).as_string(cur)
+    for row in rows:
+        cur.execute(statement, row)
+
+
+def insert_values(page_size):
+    def insert(cur, table, rows):
+        execute_values(cur, sql.SQL("INSERT INTO {} (book_num, book_name, chapter, verse_num, verse_text) VALUES %s")
+                       .format(table).as_string(cur), rows, page_size=page_size)
+    return insert
+
+
+def insert_copy_text(cur, table, rows):
+    cur.copy_expert(sql.SQL("COPY {} (book_num, book_name, chapter, verse_num, verse_text) FROM STDIN")
+                    .format(table).as_string(cur), copy_text_buffer(rows))
+
+
+def insert_copy_binary(cur, table, rows):
+    cur.copy_expert(sql.SQL("COPY {} (book_num, book_name, chapter, verse_num, verse_text) FROM STDIN (FORMAT binary)")
+                    .format(table).as_string(cur),
+                    copy_binary_buffer(rows, ("int4", "text", "int4", "int4", "text")))
+
+
+def update_per_row(cur, table, updates):
+    statement = sql.SQL("UPDATE {} SET study_notes = %s, study_notes_scraped_at = now() "
+                        "WHERE book_num = %s AND chapter = %s AND verse_num = %s").format(table).as_string(cur)
+    for book_num, chapter, verse_num, notes in updates:
+        cur.execute(statement, (Json(notes), book_num, chapter, verse_num))
+
+
+def update_from_values(cur, table, updates):
+    execute_values(cur, sql.SQL("""
+        UPDATE {} v
+           SET study_notes = u.notes, study_notes_scraped_at = now()
+          FROM (VALUES %s) AS u (book_num, chapter, verse_num, notes)
+         WHERE v.book_num = u.book_num AND v.chapter = u.chapter AND v.verse_num = u.verse_num
+    """).format(table).as_string(cur),
+        [(book_num, chapter, verse_num, Json(notes)) for book_num, chapter, verse_num, notes in updates],
+        template="(%s, %s, %s, %s::jsonb)", page_size=UPDATE_PAGE_SIZE)
+
+
+def update_temp_merge(cur, table, updates):
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS write_bench_notes (
+            book_num INTEGER, chapter INTEGER, verse_num INTEGER, notes JSONB
+        ) ON COMMIT DELETE ROWS
+    """)
+    cur.copy_expert("COPY write_bench_notes FROM STDIN (FORMAT binary)",
+                    copy_binary_buffer(updates, ("int4", "int4", "int4", "jsonb")))
+    cur.execute(sql.SQL("""
+        UPDATE {} v
+           SET study_notes = n.notes, study_notes_scraped_at = now()
+          FROM write_bench_notes n
+         WHERE v.book_num = n.book_num AND v.chapter = n.chapter AND v.verse_num = n.verse_num
+    """).format(table))
+
+
+INSERT_STRATEGIES = {"per_row": insert_per_row}
+INSERT_STRATEGIES.update({f"values_{page_size}": insert_values(page_size) for page_size in VALUES_PAGE_SIZES})
+INSERT_STRATEGIES.update({"copy_text": insert_copy_text, "copy_binary": insert_copy_binary})
+
+UPDATE_STRATEGIES = {
+    "update_per_row": update_per_row,
+    "update_from_values": update_from_values,
+    "temp_merge": update_temp_merge,
+}
+
+PER_ROW_STRATEGIES = {"per_row", "update_per_row"}
+
+
+def create_bench_table(conn, indexed):
+    """A fresh, empty copy of the verses table (optionally with the reference index), committed"""
+    cur = conn.cursor()
+    table = sql.Identifier(BENCH_TABLE)
+    cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(table))
+    cur.execute(sql.SQL("CREATE TABLE {} (LIKE verses INCLUDING DEFAULTS)").format(table))
+    if indexed:
+        cur.execute(sql.SQL("CREATE UNIQUE INDEX ON {} " + REFERENCE_INDEX).format(table))
+    conn.commit()
+    cur.close()
+
+
+def wal_insert_lsn(cur):
+    cur.execute("SELECT pg_current_wal_insert_lsn()")
+    return cur.fetchone()[0]
+
+
+def timed_write(conn, write, rows):
+    """Run one write in its own transaction. Returns (seconds, WAL bytes)."""
+    cur = conn.cursor()
+    start_lsn = wal_insert_lsn(cur)
+    started = time.perf_counter()
+    write(cur, sql.Identifier(BENCH_TABLE), rows)
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    cur.execute("SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s)", (start_lsn,))
+    wal_bytes = int(cur.fetchone()[0])
+    conn.commit()
+    cur.close()
+    return elapsed, wal_bytes
+
+
+def run(conn, rows, repeat=3, per_row_limit=2000, only=None):
+    """Benchmark every strategy unindexed and indexed. Returns a list of result dicts."""
+    updates = [(book_num, chapter, verse_num, notes)
+               for (book_num, _, chapter, verse_num, _), notes in zip(rows, study_notes_for(rows))]
+    results = []
+    try:
+        _run_strategies(conn, rows, updates, repeat, per_row_limit, only, results)
+    finally:
+        conn.rollback()
+        cur = conn.cursor()
+        cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(BENCH_TABLE)))
+        conn.commit()
+        cur.close()
+    return results
+
+
+def _run_strategies(conn, rows, updates, repeat, per_row_limit, only, results):
+    for indexed in (False, True):
+        variant = "indexed" if indexed else "unindexed"
+        strategies = [(name, write, False) for name, write in INSERT_STRATEGIES.items()]
+        strategies += [(name, write, True) for name, write in UPDATE_STRATEGIES.items()]
+
+        for name, write, is_update in strategies:
+            if only and name not in only:
+                continue
+            count = min(len(rows), per_row_limit) if name in PER_ROW_STRATEGIES else len(rows)
+            timings = []
+            for _ in range(repeat):
+                create_bench_table(conn, indexed)
+                if is_update:
+                    timed_write(conn, insert_copy_binary, rows)
+                    # Updates land on rows spread over the whole table, as a scrape's would
+                    sample = updates if count == len(updates) else random.Random(3).sample(updates, count)
+                    timings.append(timed_write(conn, write, sample))
+                else:
+                    timings.append(timed_write(conn, write, rows[:count]))
+
+            seconds = statistics.median(elapsed for elapsed, _ in timings)
+            wal_bytes = statistics.median(wal for _, wal in timings)
+            results.append({
+                "strategy": name,
+                "variant": variant,
+                "rows": count,
+                "seconds": round(seconds, 4),
+                "rows_per_second": round(count / seconds) if seconds else None,
+                "wal_bytes": int(wal_bytes),
+                "wal_bytes_per_row": round(wal_bytes / count, 1),
+            })
+            print(f"   {name:<20} {variant:<10} {count / seconds:>12,.0f} rows/s  {wal_bytes / 1024 / 1024:>8.1f} MiB WAL")
+
+
+def print_report(results):
+    """Print every result, then the fastest insert and update strategy per variant"""
+    print("\n📈 Bulk writes")
+    print("-" * 86)
+    print(f"{'strategy':<20} {'variant':<10} {'rows':>8} {'seconds':>9} {'rows/s':>12} {'WAL MiB':>9} {'WAL B/row':>10}")
+    print("-" * 86)
+    for result in results:
+        print(f"{result['strategy']:<20} {result['variant']:<10} {result['rows']:>8,} {result['seconds']:>9.3f} "
+              f"{result['rows_per_second'] or 0:>12,} {result['wal_bytes'] / 1024 / 1024:>9.1f} "
+              f"{result['wal_bytes_per_row']:>10,.1f}")
+
+    print()
+    for variant in ("unindexed", "indexed"):
+        for label, names in (("inserts", INSERT_STRATEGIES), ("study-note updates", UPDATE_STRATEGIES)):
+            candidates = [r for r in results if r["variant"] == variant and r["strategy"] in names and r["rows_per_second"]]
+            if candidates:
+                best = max(candidates, key=lambda r: r["rows_per_second"])
+                print(f"🏆 Fastest {label} ({variant}): {best['strategy']} at {best['rows_per_second']:,} rows/s, "
+                      f"{best['wal_bytes_per_row']:,.0f} WAL bytes/row")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk-write strategies for verses and study notes")
+    parser.add_argument("--docker", action="store_true", help="connect to the 'db' host instead of localhost")
+    parser.add_argument("--rows", type=int, help="verses to write (default: the whole verses file)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per strategy; the median is reported")
+    parser.add_argument("--per-row-limit", type=int, default=2000, help="rows written by the per-row strategies")
+    parser.add_argument("--only", action="append",
+                        choices=sorted(list(INSERT_STRATEGIES) + list(UPDATE_STRATEGIES)),
+                        help="run only this strategy (repeatable)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    if args.docker:
+        use_docker_host()
+
+    rows = benchmark_rows(args.rows)
+    print(f"🏋️  Benchmarking bulk writes of {len(rows):,} verses into {BENCH_TABLE}...")
+    try:
+        conn = connect()
+        results = run(conn, rows, max(1, args.repeat), max(1, args.per_row_limit), args.only)
+        conn.close()
+    except Exception as e:
+        print(f"❌ Benchmark failed: {e}")
+        sys.exit(1)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()